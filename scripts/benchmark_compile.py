@@ -0,0 +1,115 @@
+"""
+Benchmarks training steps/s of the predictors with and without torch.compile and
+bf16 autocast (the --compile and --bf16 options of train.py).
+
+Runs forward, backward and an Adam step on random embeddings, so the numbers
+measure the model and optimizer only, not data loading.
+
+Usage:
+    uv run python scripts/benchmark_compile.py --embedding_size 1024 --batch_size 1024
+"""
+
+import argparse
+import time
+from contextlib import nullcontext
+
+import torch
+
+from src.shared.helpers import bf16_supported, get_device
+from src.training.models import MODEL_CLASSES
+
+
+def benchmark(
+    model_type: str,
+    embedding_size: int,
+    batch_size: int,
+    compile_model: bool,
+    bf16: bool,
+    device: torch.device,
+    warmup_steps: int,
+    steps: int,
+) -> float:
+    """Returns the training steps per second of one configuration."""
+    model = MODEL_CLASSES[model_type](embedding_size=embedding_size).to(device)
+    if compile_model:
+        model.compile()
+    optimizer = model.configure_optimizers()
+    autocast = (
+        torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+        if bf16
+        else nullcontext()
+    )
+
+    batch = (
+        torch.randn(batch_size, embedding_size, device=device),
+        torch.randn(batch_size, embedding_size, device=device),
+        torch.rand(batch_size, device=device),
+    )
+
+    def step():
+        with autocast:
+            loss, _, _ = model._common_step(batch, 0)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+    # Warmup also triggers compilation
+    for _ in range(warmup_steps):
+        step()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark training steps/s with and without torch.compile and bf16."
+    )
+    parser.add_argument(
+        "--model_types",
+        nargs="+",
+        default=list(MODEL_CLASSES),
+        choices=list(MODEL_CLASSES),
+        help="Model types to benchmark (default: all).",
+    )
+    parser.add_argument("--embedding_size", type=int, default=1024)
+    parser.add_argument("--batch_size", type=int, default=1024)
+    parser.add_argument("--warmup_steps", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=100)
+    args = parser.parse_args()
+
+    device = get_device()
+    bf16_options = [False, True] if bf16_supported() else [False]
+    if len(bf16_options) == 1:
+        print("bfloat16 is not supported on this hardware; skipping bf16 runs.")
+
+    print(f"\n{'model':<16}{'compile':<9}{'bf16':<6}{'steps/s':>10}")
+    for model_type in args.model_types:
+        baseline = None
+        for compile_model in [False, True]:
+            for bf16 in bf16_options:
+                steps_per_s = benchmark(
+                    model_type,
+                    args.embedding_size,
+                    args.batch_size,
+                    compile_model,
+                    bf16,
+                    device,
+                    args.warmup_steps,
+                    args.steps,
+                )
+                baseline = baseline or steps_per_s
+                print(
+                    f"{model_type:<16}{str(compile_model):<9}{str(bf16):<6}"
+                    f"{steps_per_s:>10.1f}  ({steps_per_s / baseline:.2f}x)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,13 @@ from pathlib import Path
 import logging
 import warnings
 
+from src.shared.embedding_store import (
+    PACKED_EMBEDDINGS_KEY,
+    PACKED_IDS_KEY,
+    is_packed_store,
+    write_packed_embeddings,
+)
+
 
 def reduce_embeddings_with_pca(
     input_file: Path,
@@ -14,6 +21,7 @@ def reduce_embeddings_with_pca(
     plot_file: Path,
     n_components: int,
     variance_summary_file: Path,
+    packed: bool = False,
 ):
     """
     Reduces embeddings in an HDF5 file using PCA and saves the result.
@@ -22,8 +30,12 @@ def reduce_embeddings_with_pca(
     logging.info(f"Processing {input_file.name}...")
 
     with h5py.File(input_file, "r") as f_in:
-        protein_ids = list(f_in.keys())
-        embeddings = np.array([f_in[pid][:] for pid in protein_ids])
+        if is_packed_store(f_in):
+            protein_ids = f_in[PACKED_IDS_KEY].asstr()[()].tolist()
+            embeddings = f_in[PACKED_EMBEDDINGS_KEY][()]
+        else:
+            protein_ids = list(f_in.keys())
+            embeddings = np.array([f_in[pid][:] for pid in protein_ids])
 
         if embeddings.ndim == 3:
             embeddings = embeddings.squeeze(axis=1)
@@ -105,11 +117,16 @@ def reduce_embeddings_with_pca(
     logging.info("Transformation complete.")
 
     # Save reduced embeddings
-    with h5py.File(output_file, "w") as f_out:
-        for i, protein_id in enumerate(protein_ids):
-            f_out.create_dataset(
-                protein_id, data=reduced_embeddings[i].astype(np.float32)
-            )
+    if packed:
+        write_packed_embeddings(
+            output_file, protein_ids, reduced_embeddings.astype(np.float32)
+        )
+    else:
+        with h5py.File(output_file, "w") as f_out:
+            for i, protein_id in enumerate(protein_ids):
+                f_out.create_dataset(
+                    protein_id, data=reduced_embeddings[i].astype(np.float32)
+                )
     logging.info(f"Saved reduced embeddings to {output_file}")
 
 
@@ -135,6 +152,11 @@ def main():
         default=128,
         help="Number of principal components to keep.",
     )
+    parser.add_argument(
+        "--packed",
+        action="store_true",
+        help="Write the reduced embeddings in the packed layout (one (N, D) dataset plus an ID array).",
+    )
 
     args = parser.parse_args()
 
@@ -172,7 +194,12 @@ def main():
         plot_file = output_plots_dir / f"{input_file.stem}_explained_variance.png"
 
         reduce_embeddings_with_pca(
-            input_file, output_file, plot_file, args.n_components, variance_summary_file
+            input_file,
+            output_file,
+            plot_file,
+            args.n_components,
+            variance_summary_file,
+            packed=args.packed,
         )
 
     logging.info("All files processed.")
@@ -34,6 +34,12 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from src.shared.embedding_store import (
+    PACKED_EMBEDDINGS_KEY,
+    is_packed_store,
+    load_embedding_table,
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -83,16 +89,24 @@ class EmbeddingDistanceComputer:
 
             try:
                 with h5py.File(emb_file, "r") as f:
-                    # Get sample embedding dataset (don't load data into memory)
-                    first_key = next(iter(f))
-                    sample_dataset = f[first_key]
-
-                    # Get shape from dataset metadata (fast - no data loading)
-                    sample_shape = sample_dataset.shape
-                    dimensions = sample_shape[-1]  # Last dimension is embedding size
-
-                    # Get protein count (this is still slow but needed for logging)
-                    protein_count = len(f.keys())
+                    if is_packed_store(f):
+                        # Packed store: shape of the single (N, D) matrix
+                        packed_shape = f[PACKED_EMBEDDINGS_KEY].shape
+                        protein_count, dimensions = packed_shape
+                        sample_shape = packed_shape[1:]
+                    else:
+                        # Get sample embedding dataset (don't load data into memory)
+                        first_key = next(iter(f))
+                        sample_dataset = f[first_key]
+
+                        # Get shape from dataset metadata (fast - no data loading)
+                        sample_shape = sample_dataset.shape
+                        dimensions = sample_shape[
+                            -1
+                        ]  # Last dimension is embedding size
+
+                        # Get protein count (this is still slow but needed for logging)
+                        protein_count = len(f.keys())
 
                     embedding_info[embedding_name] = {
                         "file_path": emb_file,
@@ -127,6 +141,17 @@ class EmbeddingDistanceComputer:
         """
         embeddings = {}
 
+        with h5py.File(embedding_file, "r") as f:
+            packed = is_packed_store(f)
+
+        if packed:
+            # Packed stores hold one protein-level vector per row
+            try:
+                table = load_embedding_table(str(embedding_file), protein_ids)
+            except ValueError:
+                return embeddings
+            return {protein_id: table.get(protein_id) for protein_id in table.ids}
+
         with h5py.File(embedding_file, "r") as f:
             available_proteins = set(f.keys())
             valid_proteins = protein_ids.intersection(available_proteins)
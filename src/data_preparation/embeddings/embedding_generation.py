@@ -33,6 +33,8 @@ from esm.models.esm3 import ESM3
 from esm.models.esmc import ESMC
 from esm.sdk.api import ESMProtein, SamplingConfig, LogitsConfig
 
+from src.shared.embedding_store import convert_to_packed, is_packed_store
+
 
 # --------------------------------------------------------------------------- #
 #                            MODEL CONFIGURATION
@@ -586,9 +588,19 @@ def main():
         default=None,
         help="Optional path to Hugging Face token file for login (primarily for models like native ESM).",
     )
+    parser.add_argument(
+        "--packed",
+        action="store_true",
+        help="After generation, convert the output file to the packed layout (one (N, D) dataset "
+        "plus an ID array). Only valid for per_protein embeddings.",
+    )
 
     args = parser.parse_args()
 
+    if args.packed and args.embedding_type != "per_protein":
+        print("ERROR: --packed requires --embedding_type per_protein.", file=sys.stderr)
+        sys.exit(1)
+
     if not args.fasta_file.is_file():
         print(f"ERROR: FASTA file not found: {args.fasta_file}", file=sys.stderr)
         sys.exit(1)
@@ -615,6 +627,16 @@ def main():
     output_h5_path.parent.mkdir(parents=True, exist_ok=True)
     print(f"ℹ️ Embeddings will be saved to: {output_h5_path}")
 
+    if output_h5_path.is_file():
+        with h5py.File(output_h5_path, "r") as h5_file:
+            if is_packed_store(h5_file):
+                print(
+                    f"ERROR: {output_h5_path} is a packed embedding store and cannot be appended to. "
+                    "Choose another --output_hdf5_file.",
+                    file=sys.stderr,
+                )
+                sys.exit(1)
+
     # Removed NATIVE_ESM_AVAILABLE check for model config here
 
     max_len_to_use = args.max_seq_len
@@ -666,6 +688,12 @@ def main():
     print(f"Total sequences processed/found in HDF5: {num_embedded}")
     print(f"Embeddings saved as datasets in HDF5 file: {output_h5_path}")
 
+    if args.packed:
+        packing_path = output_h5_path.with_name(f"{output_h5_path.stem}.packing.h5")
+        convert_to_packed(output_h5_path, packing_path)
+        os.replace(packing_path, output_h5_path)
+        print(f"✓ Converted {output_h5_path} to the packed layout.")
+
     del model
     del tokenizer
     if torch.cuda.is_available():
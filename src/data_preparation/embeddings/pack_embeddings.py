@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Converts one-dataset-per-protein HDF5 embedding files into the packed layout
+(one chunked (N, D) 'embeddings' dataset plus an 'ids' dataset).
+
+Packed files are detected automatically by the data loaders, the distance
+computation and the evaluation scripts.
+
+Usage:
+    # Convert a single file next to the original
+    uv run python src/data_preparation/embeddings/pack_embeddings.py \
+        data/processed/sprot_pre2024/embeddings/prott5.h5 \
+        --output data/processed/sprot_pre2024/embeddings_packed/prott5.h5
+
+    # Convert all files of an embeddings directory in place
+    uv run python src/data_preparation/embeddings/pack_embeddings.py \
+        data/processed/sprot_pre2024/embeddings/*.h5 --in_place
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import h5py
+
+from src.shared.embedding_store import (
+    DEFAULT_CHUNK_ROWS,
+    convert_to_packed,
+    is_packed_store,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert per-protein HDF5 embedding files into the packed layout."
+    )
+    parser.add_argument(
+        "input_files", type=Path, nargs="+", help="Per-protein HDF5 embedding files."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Output file (single input) or output directory (multiple inputs).",
+    )
+    parser.add_argument(
+        "--in_place",
+        action="store_true",
+        help="Replace each input file with its packed version.",
+    )
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default=None,
+        choices=["float16", "float32"],
+        help="Storage dtype of the packed matrix (default: dtype of the input).",
+    )
+    parser.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help=f"Rows per HDF5 chunk (default: {DEFAULT_CHUNK_ROWS}).",
+    )
+    parser.add_argument(
+        "--contiguous",
+        action="store_true",
+        help="Store the matrix unchunked so that it can be memory-mapped (--mmap_embeddings).",
+    )
+    args = parser.parse_args()
+
+    if args.in_place == (args.output is not None):
+        print("ERROR: Specify exactly one of --output or --in_place.", file=sys.stderr)
+        sys.exit(1)
+
+    for input_file in args.input_files:
+        with h5py.File(input_file, "r") as hdf:
+            if is_packed_store(hdf):
+                print(f"Skipping {input_file}: already packed.")
+                continue
+
+        if args.in_place:
+            output_file = input_file.with_name(f"{input_file.stem}.packing.h5")
+        elif len(args.input_files) > 1 or args.output.is_dir():
+            args.output.mkdir(parents=True, exist_ok=True)
+            output_file = args.output / input_file.name
+        else:
+            output_file = args.output
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+
+        print(f"Converting {input_file} -> {output_file}")
+        convert_to_packed(
+            input_file,
+            output_file,
+            dtype=args.dtype,
+            chunk_rows=args.chunk_rows,
+            contiguous=args.contiguous,
+        )
+        if args.in_place:
+            os.replace(output_file, input_file)
+            print(f"Replaced {input_file} with its packed version.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,14 @@ import h5py
 import numpy as np
 import os
 
+from src.shared.embedding_store import (
+    DEFAULT_CHUNK_ROWS,
+    create_packed_datasets,
+    read_embedding_ids,
+)
 
-def generate_random_embeddings(template_h5_path, output_dir, dimensions):
+
+def generate_random_embeddings(template_h5_path, output_dir, dimensions, packed=False):
     """
     Generates HDF5 files containing random embeddings for protein IDs found
     in a template HDF5 file.
@@ -13,6 +19,8 @@ def generate_random_embeddings(template_h5_path, output_dir, dimensions):
         template_h5_path (str): Path to the template HDF5 embedding file.
         output_dir (str): Directory to save the generated random embedding files.
         dimensions (list[int]): A list of embedding dimensions to generate.
+        packed (bool): Write the packed layout (one (N, D) matrix plus an ID array)
+            instead of one dataset per protein.
     """
     print(f"Using template file: {template_h5_path}")
     print(f"Output directory: {output_dir}")
@@ -21,21 +29,31 @@ def generate_random_embeddings(template_h5_path, output_dir, dimensions):
     os.makedirs(output_dir, exist_ok=True)
 
     try:
-        with h5py.File(template_h5_path, "r") as template_f:
-            protein_ids = list(template_f.keys())
-            print(f"Found {len(protein_ids)} protein IDs in the template.")
+        protein_ids = read_embedding_ids(template_h5_path).tolist()
+        print(f"Found {len(protein_ids)} protein IDs in the template.")
 
-            for dim in dimensions:
-                output_filename = f"random_{dim}.h5"
-                output_path = os.path.join(output_dir, output_filename)
-                print(f"Generating embeddings for dimension {dim} -> {output_path}...")
+        for dim in dimensions:
+            output_filename = f"random_{dim}.h5"
+            output_path = os.path.join(output_dir, output_filename)
+            print(f"Generating embeddings for dimension {dim} -> {output_path}...")
 
-                with h5py.File(output_path, "w") as output_f:
+            with h5py.File(output_path, "w") as output_f:
+                if packed:
+                    dataset = create_packed_datasets(
+                        output_f, protein_ids, dim, np.float16, DEFAULT_CHUNK_ROWS
+                    )
+                    # Fill the matrix block by block to bound memory usage
+                    for start in range(0, len(protein_ids), DEFAULT_CHUNK_ROWS):
+                        end = min(start + DEFAULT_CHUNK_ROWS, len(protein_ids))
+                        dataset[start:end] = np.random.randn(end - start, dim).astype(
+                            np.float16
+                        )
+                else:
                     for protein_id in protein_ids:
                         # Generate random embedding with standard normal distribution
                         random_embedding = np.random.randn(dim).astype(np.float16)
                         output_f.create_dataset(protein_id, data=random_embedding)
-                print(f"Finished generating {output_filename}")
+            print(f"Finished generating {output_filename}")
 
     except FileNotFoundError:
         print(f"Error: Template file not found at {template_h5_path}")
@@ -70,7 +88,14 @@ if __name__ == "__main__":
         default=[512, 1024, 2560],
         help="List of embedding dimensions to generate.",
     )
+    parser.add_argument(
+        "--packed",
+        action="store_true",
+        help="Write the packed layout (one (N, D) dataset plus an ID array) instead of one dataset per protein.",
+    )
 
     args = parser.parse_args()
 
-    generate_random_embeddings(args.template_h5, args.output_dir, args.dimensions)
+    generate_random_embeddings(
+        args.template_h5, args.output_dir, args.dimensions, packed=args.packed
+    )
@@ -0,0 +1,159 @@
+"""
+Distance baselines: the test predictions of the ``euclidean`` model type.
+
+A baseline run needs no training: each test pair is predicted by the distance
+between its two embeddings (euclidean, cosine or L1). ``pair_distances`` computes
+these for all integer-indexed pairs (see IndexedPairs) in one vectorized pass over
+fixed-size chunks of an EmbeddingTable, instead of iterating a DataLoader.
+``compute_distance_baselines`` does so for all baseline runs of one embedding file
+from a single loaded (or memory-mapped, or already loaded) table and writes the
+``predictions_targets`` files that evaluate.py reads back from its cache.
+"""
+
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.shared.datasets import IndexedPairs, load_indexed_pairs
+from src.shared.embedding_store import (
+    EmbeddingTable,
+    load_embedding_table,
+    open_memmap_table,
+    read_embedding_size,
+)
+from src.shared.experiment_manager import ExperimentManager, ExperimentPaths
+
+DISTANCE_METRICS = ["euclidean", "cosine", "l1"]
+# Pairs per chunk: two float32 (chunk, D) blocks stay at a few hundred MiB for D=1024
+DEFAULT_CHUNK_SIZE = 32768
+
+
+def baseline_name(metric: str) -> str:
+    """Checkpoint name of a distance baseline in evaluation file names."""
+    return f"{metric}_baseline"
+
+
+def baseline_hparams(
+    paths: ExperimentPaths, param_name: str, metrics: List[str], **settings
+) -> dict:
+    """Returns the hparams.yaml contents of a distance baseline run."""
+    try:
+        embedding_size = read_embedding_size(paths.embedding_file)
+    except Exception as e:
+        print(f"Warning: Could not get embedding size: {e}")
+        embedding_size = -1
+    return {
+        "model_type": "euclidean",
+        "param_name": param_name,
+        "embedding_file": str(paths.embedding_file),
+        "data_dir": str(paths.data_dir),
+        "embedding_size": embedding_size,
+        "distance_metrics": list(metrics),
+        **settings,
+    }
+
+
+def _distances(query: np.ndarray, target: np.ndarray, metric: str) -> np.ndarray:
+    if metric == "cosine":
+        dots = np.einsum("ij,ij->i", query, target)
+        norms = np.linalg.norm(query, axis=1) * np.linalg.norm(target, axis=1)
+        return 1.0 - dots / np.maximum(norms, np.finfo(np.float32).tiny)
+    difference = query - target
+    if metric == "l1":
+        return np.abs(difference).sum(axis=1)
+    return np.sqrt(np.einsum("ij,ij->i", difference, difference))
+
+
+def pair_distances(
+    pairs: IndexedPairs,
+    embedding_table: EmbeddingTable,
+    metric: str = "euclidean",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> np.ndarray:
+    """
+    Returns the ``metric`` distance between the embeddings of every pair.
+
+    Cosine distances are ``1 - cosine similarity``. Distances are float32 and in
+    pair table order.
+    """
+    if metric not in DISTANCE_METRICS:
+        raise ValueError(
+            f"Unknown distance metric '{metric}'. Choose from: {DISTANCE_METRICS}"
+        )
+    pairs = pairs.for_table(embedding_table)
+    distances = np.empty(len(pairs), dtype=np.float32)
+    for start in range(0, len(pairs), chunk_size):
+        stop = start + chunk_size
+        distances[start:stop] = _distances(
+            embedding_table.gather(pairs.query_rows[start:stop]),
+            embedding_table.gather(pairs.target_rows[start:stop]),
+            metric,
+        )
+    return distances
+
+
+def load_pairs_table(
+    embedding_file: Path,
+    pairs_list: Iterable[IndexedPairs],
+    mmap_embeddings: bool = False,
+    dtype: str = "float32",
+) -> EmbeddingTable:
+    """Loads the embeddings of all proteins of ``pairs_list`` (or memory-maps the file)."""
+    if mmap_embeddings:
+        return open_memmap_table(str(embedding_file))
+    used_ids = np.unique(
+        np.concatenate([pairs.used_protein_ids() for pairs in pairs_list]).astype(str)
+    )
+    return load_embedding_table(str(embedding_file), used_ids, dtype=dtype)
+
+
+def compute_distance_baselines(
+    embedding_file: Path,
+    test_file: Path,
+    runs: List[Tuple[str, Path]],
+    metrics: List[str],
+    use_cache: bool = False,
+    embedding_table: Optional[EmbeddingTable] = None,
+    mmap_embeddings: bool = False,
+) -> EmbeddingTable:
+    """
+    Writes the test predictions of every metric for baseline runs of one embedding file.
+
+    Args:
+        embedding_file: Embedding file shared by all runs.
+        test_file: Test parquet file; its stem names the evaluation files.
+        runs: ``(param_name, experiment_dir)`` of each run.
+        metrics: Distance metrics to compute (see DISTANCE_METRICS).
+        use_cache: Read and write the pair index cache next to the parquet file.
+        embedding_table: Already loaded embeddings covering all test proteins;
+            loaded from ``embedding_file`` if not given.
+        mmap_embeddings: Memory-map the embedding file instead of loading it.
+
+    Returns:
+        The embedding table used, for reuse by later calls.
+    """
+    pairs = {
+        param_name: load_indexed_pairs(
+            str(test_file), str(embedding_file), param_name, use_cache=use_cache
+        )
+        for param_name, _ in runs
+    }
+    if embedding_table is None:
+        embedding_table = load_pairs_table(
+            embedding_file, pairs.values(), mmap_embeddings
+        )
+
+    for param_name, experiment_dir in runs:
+        targets = pairs[param_name].values
+        for metric in metrics:
+            predictions = pair_distances(pairs[param_name], embedding_table, metric)
+            save_path = ExperimentManager.predictions_targets_path(
+                experiment_dir, test_file.stem, baseline_name(metric)
+            )
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(save_path, predictions=predictions, targets=targets)
+            print(
+                f"Saved {metric} distances of {len(targets)} test pairs to: {save_path}"
+            )
+    return embedding_table
@@ -1,32 +1,51 @@
 import argparse
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List
 import numpy as np
 import torch
 from torch.utils.data import DataLoader
 import yaml
 import pytorch_lightning as pl
 from tqdm import tqdm
-import wandb
 
 # Project specific imports
-from src.shared.datasets import create_single_loader
+from src.shared.datasets import (
+    TARGET_PARAMS,
+    IndexedPairs,
+    create_single_loader,
+    load_indexed_pairs,
+    restore_pair_order,
+)
+from src.shared.embedding_store import (
+    TABLE_DTYPES,
+    EmbeddingTable,
+    load_embedding_table,
+    open_memmap_table,
+)
 from src.shared.experiment_manager import ExperimentManager
+from src.evaluation.distance_baseline import baseline_name, pair_distances
 from src.evaluation.metrics import calculate_regression_metrics
-from src.training.models import (
-    FNNPredictor,
-    LinearRegressionPredictor,
-    LinearDistancePredictor,
-)
+from src.training.models import MODEL_CLASSES
 from src.visualization.plot_utils import plot_true_vs_predicted
 from src.shared.helpers import get_device
 
 
 # --- Computation and Caching Helpers ---
 def _compute_and_save_predictions_targets(
-    model_type: str, experiment_dir: Path, test_loader: DataLoader, save_path: Path
+    model_type: str,
+    experiment_dir: Path,
+    test_loader: Optional[DataLoader],
+    save_path: Path,
+    test_pairs: Optional[Tuple[IndexedPairs, EmbeddingTable, int]] = None,
+    distance_metric: str = "euclidean",
 ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
-    """Computes predictions/targets via inference or baseline and saves them."""
+    """
+    Computes predictions/targets via inference or baseline and saves them.
+
+    With ``test_pairs`` (pairs, embedding table, batch size) instead of a loader,
+    models are evaluated with two-stage inference (run_encoded_inference) and
+    distance baselines with ``pair_distances``.
+    """
     print("Computing predictions and targets...")
     predictions: Optional[np.ndarray] = None
     targets: Optional[np.ndarray] = None
@@ -45,26 +64,27 @@ def _compute_and_save_predictions_targets(
             return None
 
         best_checkpoint_path = best_ckpt_files[0]
-        model_class_map = {
-            "fnn": FNNPredictor,
-            "linear": LinearRegressionPredictor,
-            "linear_distance": LinearDistancePredictor,
-        }
-        ModelClass = model_class_map.get(model_type)
+        ModelClass = MODEL_CLASSES.get(model_type)
         if not ModelClass:
             print(f"Error: Unknown model type '{model_type}' for loading.")
             return None
         try:
             model = load_model_from_checkpoint(best_checkpoint_path, ModelClass)
-            predictions, targets = run_inference(model, test_loader)
+            if test_pairs is not None:
+                predictions, targets = run_encoded_inference(model, *test_pairs)
+            else:
+                predictions, targets = run_inference(model, test_loader)
         except Exception as e:
             print(f"Error during model loading or inference: {e}")
             return None
     elif model_type == "euclidean":
         try:
-            predictions, targets = run_euclidean_distance(test_loader)
+            pairs, embedding_table, _ = test_pairs
+            print(f"Calculating {distance_metric} distances...")
+            predictions = pair_distances(pairs, embedding_table, distance_metric)
+            targets = pairs.values
         except Exception as e:
-            print(f"Error during Euclidean distance calculation: {e}")
+            print(f"Error during {distance_metric} distance calculation: {e}")
             return None
     else:
         print(
@@ -73,6 +93,9 @@ def _compute_and_save_predictions_targets(
         return None
 
     if predictions is not None and targets is not None:
+        # Keep the saved arrays in parquet row order, whatever the loader order was
+        predictions = restore_pair_order(predictions, test_loader)
+        targets = restore_pair_order(targets, test_loader)
         try:
             # Ensure parent directory exists before saving
             save_path.parent.mkdir(parents=True, exist_ok=True)
@@ -96,6 +119,7 @@ def _get_predictions_targets(
     experiment_dir: Path,
     hparams: Dict[str, Any],  # Needed for DataLoader if recomputing
     test_data_path: Path,  # Needed for DataLoader if recomputing
+    per_pair_inference: bool = False,
 ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
     """Gets predictions and targets, using cache or computing/saving as needed."""
     if not force_recompute and preds_targets_path.is_file():
@@ -117,6 +141,23 @@ def _get_predictions_targets(
             )
 
     # If cache doesn't exist, is invalid, or force_recompute is True
+    if model_type == "euclidean" or (model_type == "fnn" and not per_pair_inference):
+        # Distances are computed from the pair indices in one vectorized pass, and
+        # FNN models encode every test protein once instead of both sides of every pair
+        try:
+            test_pairs = _prepare_encoded_pairs(hparams, test_data_path)
+        except Exception as e:
+            print(f"Error preparing test pairs for computation: {e}")
+            return None
+        return _compute_and_save_predictions_targets(
+            model_type,
+            experiment_dir,
+            None,
+            preds_targets_path,
+            test_pairs,
+            distance_metric=hparams.get("distance_metric", "euclidean"),
+        )
+
     # Prepare DataLoader ONLY if computation is required
     try:
         test_loader = _prepare_dataloader(hparams, test_data_path)
@@ -232,17 +273,55 @@ def _prepare_dataloader(hparams: Dict[str, Any], test_data_path: Path) -> DataLo
     if not embeddings_file.is_file():
         raise FileNotFoundError(f"Embeddings file not found: {embeddings_file}")
 
+    # Reduced-precision tables need an in-memory loader
+    embedding_dtype = hparams.get("embedding_dtype", "float32")
+    loader_mode = hparams.get("loader_mode", "h5")
+    if embedding_dtype != "float32" and loader_mode == "h5":
+        loader_mode = "memory"
+
     test_loader = create_single_loader(
         parquet_file=str(test_data_path),
         hdf_file=str(embeddings_file),
         param_name=hparams["param_name"],
         batch_size=hparams["batch_size"],
         shuffle=False,
+        loader_mode=loader_mode,
+        mmap_embeddings=hparams.get("mmap_embeddings", False)
+        and embedding_dtype == "float32",
+        cache_pair_index=hparams.get("cache_pair_index", False),
+        embedding_dtype=embedding_dtype,
+        locality_order=hparams.get("locality_order", False),
+        embedding_cache_size=hparams.get("embedding_cache_size", 0),
     )
     print(f"Prepared test data loader with {len(test_loader)} batches.")
     return test_loader
 
 
+def _prepare_encoded_pairs(
+    hparams: Dict[str, Any], test_data_path: Path
+) -> Tuple[IndexedPairs, EmbeddingTable, int]:
+    """Loads the indexed test pairs and the embeddings of their proteins."""
+    embeddings_file = hparams["embedding_file"]
+    if not embeddings_file.is_file():
+        raise FileNotFoundError(f"Embeddings file not found: {embeddings_file}")
+
+    pairs = load_indexed_pairs(
+        str(test_data_path),
+        str(embeddings_file),
+        hparams["param_name"],
+        use_cache=hparams.get("cache_pair_index", False),
+    )
+    embedding_dtype = hparams.get("embedding_dtype", "float32")
+    if hparams.get("mmap_embeddings", False) and embedding_dtype == "float32":
+        embedding_table = open_memmap_table(str(embeddings_file))
+    else:
+        embedding_table = load_embedding_table(
+            str(embeddings_file), pairs.used_protein_ids(), dtype=embedding_dtype
+        )
+    print(f"Prepared {len(pairs)} test pairs over {len(embedding_table)} proteins.")
+    return pairs, embedding_table, hparams["batch_size"]
+
+
 def load_model_from_checkpoint(
     checkpoint_path: Path, model_class: type
 ) -> pl.LightningModule:
@@ -333,7 +412,9 @@ def load_hparams_from_local(experiment_dir: Path) -> Dict[str, Any]:
 
 
 def load_hparams(experiment_dir: Path) -> Dict[str, Any]:
-    """Load hyperparameters from wandb config files."""
+    """Load hyperparameters from the local hparams.yaml, or from older runs' wandb config."""
+    if (experiment_dir / "hparams.yaml").is_file():
+        return load_hparams_from_local(experiment_dir)
     try:
         return load_hparams_from_wandb(experiment_dir)
     except FileNotFoundError as e:
@@ -377,23 +458,72 @@ def run_inference(
                 torch.cuda.empty_cache()
 
     print("Inference complete.")
-    return torch.cat(preds).numpy().flatten(), torch.cat(tgts).numpy().flatten()
+    predictions = torch.cat(preds).numpy()
+    targets = torch.cat(tgts).numpy()
+    if targets.ndim > 1:
+        # Multi-target models keep one column per parameter
+        return predictions.reshape(targets.shape), targets
+    return predictions.flatten(), targets.flatten()
+
+
+def run_encoded_inference(
+    model: pl.LightningModule,
+    pairs: IndexedPairs,
+    embedding_table: EmbeddingTable,
+    batch_size: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Two-stage inference for models with ``encode``/``score`` (FNNPredictor).
+
+    Every protein of the test pairs is projected through the per-protein layers
+    once, and pairs are then scored from the cached hidden vectors, so the cost
+    grows with the number of proteins plus the number of pairs instead of with
+    two embedding projections per pair. Predictions are in pair table order.
+    """
+    print("Running two-stage inference...")
+    device = get_device()
+    model.to(device)
+    model.eval()
 
+    pairs = pairs.for_table(embedding_table)
+    used_rows, inverse = np.unique(
+        np.concatenate([pairs.query_rows, pairs.target_rows]), return_inverse=True
+    )
+    query_index = torch.from_numpy(inverse[: len(pairs)]).to(device)
+    target_index = torch.from_numpy(inverse[len(pairs) :]).to(device)
 
-def run_euclidean_distance(test_loader: DataLoader) -> Tuple[np.ndarray, np.ndarray]:
-    """Calculate Euclidean distance baseline."""
-    print("Calculating Euclidean distances...")
-    dists, tgts = [], []
+    preds = []
     with torch.no_grad():
-        for batch in test_loader:
-            if len(batch) != 3:
-                raise ValueError("Unexpected batch structure")
-            q_emb, t_emb, val = batch
-            d = np.linalg.norm(q_emb - t_emb, axis=1)
-            dists.append(d)
-            tgts.append(val)
-    print("Euclidean distance calculation complete.")
-    return np.concatenate(dists), np.concatenate(tgts)
+        hidden = torch.cat(
+            [
+                model.encode(
+                    torch.from_numpy(
+                        embedding_table.gather(used_rows[start : start + batch_size])
+                    ).to(device)
+                )
+                for start in tqdm(
+                    range(0, len(used_rows), batch_size),
+                    desc="Encoding proteins",
+                    unit="batch",
+                )
+            ]
+        )
+        for start in tqdm(
+            range(0, len(pairs), batch_size), desc="Scoring pairs", unit="batch"
+        ):
+            stop = start + batch_size
+            pred = model.score(
+                hidden[query_index[start:stop]], hidden[target_index[start:stop]]
+            )
+            preds.append(pred.cpu())
+
+    print("Inference complete.")
+    predictions = torch.cat(preds).numpy()
+    targets = pairs.values.copy()
+    if targets.ndim > 1:
+        # Multi-target models keep one column per parameter
+        return predictions.reshape(targets.shape), targets
+    return predictions.flatten(), targets.flatten()
 
 
 def log_evaluation_to_wandb(
@@ -404,6 +534,8 @@ def log_evaluation_to_wandb(
     test_set_name: str,
 ):
     """Logs evaluation metrics and plots to a resumed wandb run."""
+    import wandb
+
     wandb_run_id_file = experiment_dir / "wandb_run_id.txt"
     if not wandb_run_id_file.exists():
         print("Warning: wandb_run_id.txt not found. Cannot log to wandb.")
@@ -443,11 +575,175 @@ def log_evaluation_to_wandb(
             wandb.finish()
 
 
+def _report_precision_delta(
+    metrics: Dict[str, Any],
+    reference_metrics: Dict[str, Any],
+    embedding_dtype: str,
+    save_path: Path,
+) -> Dict[str, float]:
+    """Prints and saves the metric changes of a reduced-precision evaluation vs. float32."""
+    deltas = {
+        metric: float(value) - float(reference_metrics[metric])
+        for metric, value in metrics.items()
+        if isinstance(value, (int, float, np.floating))
+        and isinstance(reference_metrics.get(metric), (int, float, np.floating))
+    }
+    print(f"\nMetric changes with {embedding_dtype} embeddings (vs. float32):")
+    for metric, delta in deltas.items():
+        print(f"{metric}: {delta:+.4e}")
+    try:
+        with open(save_path, "w") as f:
+            f.write(f"# Metric deltas: {embedding_dtype} minus float32 embeddings\n")
+            for metric, delta in deltas.items():
+                f.write(f"{metric}: {delta}\n")
+        print(f"Saved metric deltas to: {save_path}")
+    except Exception as e:
+        print(f"Warning: Could not save metric deltas to {save_path}: {e}")
+    return deltas
+
+
+def _evaluation_targets(
+    hparams: Dict[str, Any], targets: np.ndarray
+) -> List[Tuple[str, Optional[int]]]:
+    """Returns (parameter name, target column) pairs; the column is None for single-target runs."""
+    if targets.ndim == 1:
+        return [(hparams["param_name"], None)]
+    return list(zip(TARGET_PARAMS, range(targets.shape[1])))
+
+
+def _select_target(
+    predictions: np.ndarray, targets: np.ndarray, column: Optional[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Selects one target column and drops its missing (NaN) pairs."""
+    if column is None:
+        return predictions, targets
+    target_values = targets[:, column]
+    # Baselines such as the Euclidean distance have a single prediction per pair
+    target_predictions = predictions[:, column] if predictions.ndim > 1 else predictions
+    mask = ~np.isnan(target_values)
+    return target_predictions[mask], target_values[mask]
+
+
+def _evaluate_checkpoint(
+    args,
+    hparams: Dict[str, Any],
+    checkpoint_name: str,
+    test_data_path: Path,
+):
+    """Computes (or loads) predictions, metrics and plots of one checkpoint or baseline."""
+    experiment_dir = args.experiment_dir
+    model_type = hparams["model_type"]
+    embedding_dtype = hparams.get("embedding_dtype", "float32")
+    test_set_name = test_data_path.stem
+
+    # 3. Determine Artifact Paths
+    eval_dir = experiment_dir / "evaluation_results"
+    eval_dir.mkdir(exist_ok=True)
+    reference_filename = f"test_{test_set_name}_{checkpoint_name}"
+    base_filename = reference_filename
+    if embedding_dtype != "float32":
+        base_filename = f"{reference_filename}_{embedding_dtype}"
+    preds_targets_path = ExperimentManager.predictions_targets_path(
+        experiment_dir, test_set_name, checkpoint_name, embedding_dtype
+    )
+
+    # 4. Get Predictions & Targets (handles cache check or compute/save)
+    preds_targets_tuple = _get_predictions_targets(
+        preds_targets_path,
+        args.force_recompute,
+        model_type,
+        experiment_dir,
+        hparams,
+        test_data_path,  # Pass needed info for potential recompute
+        args.per_pair_inference,
+    )
+    if preds_targets_tuple is None:
+        raise RuntimeError("Failed to obtain predictions/targets")
+    predictions, targets = preds_targets_tuple
+
+    reference_tuple = None
+    if embedding_dtype != "float32":
+        print("\nEvaluating with float32 embeddings for comparison...")
+        reference_tuple = _get_predictions_targets(
+            eval_dir / f"{reference_filename}_predictions_targets.npz",
+            args.force_recompute,
+            model_type,
+            experiment_dir,
+            {**hparams, "embedding_dtype": "float32"},
+            test_data_path,
+            args.per_pair_inference,
+        )
+        if reference_tuple is None:
+            print("Warning: Could not evaluate the float32 reference.")
+
+    # Multi-target runs are evaluated per parameter on its non-missing pairs
+    for target_name, column in _evaluation_targets(hparams, targets):
+        suffix = f"_{target_name}" if column is not None else ""
+        target_set_name = f"{test_set_name}{suffix}"
+        target_predictions, target_targets = _select_target(
+            predictions, targets, column
+        )
+
+        # 5. Get Metrics (handles cache check or compute/save)
+        metrics = _get_metrics(
+            eval_dir / f"{base_filename}{suffix}_metrics.txt",
+            args.force_recompute,
+            target_predictions,
+            target_targets,
+            args.n_bootstrap,
+            checkpoint_name,
+            target_set_name,
+        )
+        if metrics is None:
+            raise RuntimeError("Failed to obtain metrics")
+
+        # 5b. Compare reduced-precision embeddings against float32
+        if reference_tuple is not None:
+            reference_metrics = _get_metrics(
+                eval_dir / f"{reference_filename}{suffix}_metrics.txt",
+                args.force_recompute,
+                *_select_target(*reference_tuple, column),
+                args.n_bootstrap,
+                checkpoint_name,
+                target_set_name,
+            )
+            if reference_metrics is not None:
+                _report_precision_delta(
+                    metrics,
+                    reference_metrics,
+                    embedding_dtype,
+                    eval_dir / f"{base_filename}{suffix}_vs_float32.txt",
+                )
+
+        # 6. Generate Plot (always)
+        print("Generating evaluation plot...")
+        plot_path = eval_dir / f"{base_filename}{suffix}_results.png"
+        plot_title = f"Evaluation on '{target_set_name}' ({checkpoint_name})"
+        plot_true_vs_predicted(
+            target_targets,
+            target_predictions,
+            plot_path,
+            metrics=metrics,
+            title=plot_title,
+        )
+        print(f"Saved evaluation plot to: {plot_path}")
+
+        # 7. Log to WandB (only runs trained with --logger wandb have a run ID)
+        if model_type != "euclidean" and (experiment_dir / "wandb_run_id.txt").exists():
+            log_evaluation_to_wandb(
+                experiment_dir,
+                hparams,
+                metrics,
+                plot_path,
+                target_set_name,
+            )
+
+
 # --- Main Orchestration ---
 
 
-def main(args):
-    """Main workflow orchestrator for evaluation."""
+def main(args) -> bool:
+    """Main workflow orchestrator for evaluation. Returns whether it succeeded."""
     try:
         # Compute project root for models_base_dir
         project_root = Path(__file__).parent.parent.parent
@@ -455,6 +751,12 @@ def main(args):
 
         hparams = load_hparams(args.experiment_dir)
         model_type = hparams["model_type"]
+        if args.embedding_dtype:
+            hparams["embedding_dtype"] = args.embedding_dtype
+        if args.locality_order:
+            hparams["locality_order"] = True
+        if args.embedding_cache_size is not None:
+            hparams["embedding_cache_size"] = args.embedding_cache_size
 
         # 1. Resolve Test Data Path (parquet only)
         original_data_dir = hparams["data_dir"]
@@ -474,75 +776,32 @@ def main(args):
 
         if not test_data_path.is_file():
             raise FileNotFoundError(f"Test data file not found: {test_data_path}")
-        test_set_name = test_data_path.stem
 
         # 2. Determine Checkpoint/Identifier using ExperimentManager
-        checkpoint_name: str
         if model_type in ["fnn", "linear", "linear_distance"]:
             # Create a minimal ExperimentManager for checkpoint finding
             exp_manager = ExperimentManager.from_hparams(hparams, models_base_dir)
             ckpt_path = exp_manager.find_best_checkpoint(args.experiment_dir)
             if not ckpt_path:
                 raise FileNotFoundError("No checkpoint found")
-            checkpoint_name = ckpt_path.stem
+            checkpoints = [(ckpt_path.stem, hparams)]
         elif model_type == "euclidean":
-            checkpoint_name = "euclidean_baseline"
+            # One baseline per distance metric of the run
+            checkpoints = [
+                (baseline_name(metric), {**hparams, "distance_metric": metric})
+                for metric in hparams.get("distance_metrics", ["euclidean"])
+            ]
         else:
             raise ValueError(f"Unknown model type '{model_type}' in hparams")
 
-        # 3. Determine Artifact Paths
-        eval_dir = args.experiment_dir / "evaluation_results"
-        eval_dir.mkdir(exist_ok=True)
-        base_filename = f"test_{test_set_name}_{checkpoint_name}"
-        preds_targets_path = eval_dir / f"{base_filename}_predictions_targets.npz"
-        metrics_path = eval_dir / f"{base_filename}_metrics.txt"
-        plot_path = eval_dir / f"{base_filename}_results.png"
-
-        # 4. Get Predictions & Targets (handles cache check or compute/save)
-        preds_targets_tuple = _get_predictions_targets(
-            preds_targets_path,
-            args.force_recompute,
-            model_type,
-            args.experiment_dir,
-            hparams,
-            test_data_path,  # Pass needed info for potential recompute
-        )
-        if preds_targets_tuple is None:
-            raise RuntimeError("Failed to obtain predictions/targets")
-        predictions, targets = preds_targets_tuple
-
-        # 5. Get Metrics (handles cache check or compute/save)
-        metrics = _get_metrics(
-            metrics_path,
-            args.force_recompute,
-            predictions,
-            targets,
-            args.n_bootstrap,
-            checkpoint_name,
-            test_set_name,
-        )
-        if metrics is None:
-            raise RuntimeError("Failed to obtain metrics")
-
-        # 6. Generate Plot (always)
-        print("Generating evaluation plot...")
-        plot_title = f"Evaluation on '{test_set_name}' ({checkpoint_name})"
-        plot_true_vs_predicted(
-            targets, predictions, plot_path, metrics=metrics, title=plot_title
-        )
-        print(f"Saved evaluation plot to: {plot_path}")
-
-        # 7. Log to WandB
-        if model_type != "euclidean":
-            log_evaluation_to_wandb(
-                args.experiment_dir,
-                hparams,
-                metrics,
-                plot_path,
-                test_set_name,
+        # 3.-7. Predictions, metrics, plots and logging of each checkpoint
+        for checkpoint_name, checkpoint_hparams in checkpoints:
+            _evaluate_checkpoint(
+                args, checkpoint_hparams, checkpoint_name, test_data_path
             )
 
         print("\nEvaluation process complete.")
+        return True
 
     except Exception as e:
         print("\n--- EVALUATION FAILED --- ")
@@ -551,9 +810,11 @@ def main(args):
 
         traceback.print_exc()
         print("-------------------------")
+        return False
 
 
-if __name__ == "__main__":
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parses the evaluate.py command line (``argv`` defaults to sys.argv[1:])."""
     parser = argparse.ArgumentParser(
         description="Evaluate a trained model or Euclidean baseline, using caching."
     )
@@ -584,5 +845,38 @@ if __name__ == "__main__":
         help="Force re-computation of predictions and metrics, ignoring cache.",
     )
 
-    cli_args = parser.parse_args()
-    main(cli_args)
+    parser.add_argument(
+        "--embedding_dtype",
+        type=str,
+        default=None,
+        choices=TABLE_DTYPES,
+        help="In-memory storage dtype of the test embeddings (default: the one used for "
+        "training). For reduced precisions, metric changes against float32 are reported.",
+    )
+
+    parser.add_argument(
+        "--locality_order",
+        action="store_true",
+        help="Read test pairs sorted by query and target protein (default: as in training). "
+        "Saved predictions keep the parquet row order.",
+    )
+    parser.add_argument(
+        "--embedding_cache_size",
+        type=int,
+        default=None,
+        help="LRU cache size for embeddings read from HDF5 (default: as in training).",
+    )
+
+    parser.add_argument(
+        "--per_pair_inference",
+        action="store_true",
+        help="Run the full model on every test pair. By default FNN models encode each test "
+        "protein once and score pairs from the cached encodings (same predictions).",
+    )
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Exit non-zero on failure so that runners can count failed evaluations
+    raise SystemExit(0 if main(parse_args()) else 1)
@@ -3,6 +3,9 @@ from pathlib import Path
 import subprocess
 import os
 
+from src.evaluation.shared_inference import precompute_predictions
+from src.shared.in_process import EVALUATE_SCRIPT, run_in_process
+
 # Maximum depth to search for run directories from the input_path.
 # Example: models/sprot_train (0) / fnn (1) / fident (2) / prott5 (3) / timestamp (4)
 MAX_SEARCH_DEPTH_FROM_INPUT = (
@@ -11,11 +14,12 @@ MAX_SEARCH_DEPTH_FROM_INPUT = (
 
 
 def is_valid_run_dir(path: Path) -> bool:
-    """Checks if a directory is a valid run directory (contains tensorboard/hparams.yaml)."""
+    """Checks if a directory is a valid run directory (contains (tensorboard/)hparams.yaml)."""
     if not path.is_dir():
         return False
-    hparams_file = path / "tensorboard" / "hparams.yaml"
-    return hparams_file.is_file()
+    return (path / "hparams.yaml").is_file() or (
+        path / "tensorboard" / "hparams.yaml"
+    ).is_file()
 
 
 def collect_run_dirs_recursive(
@@ -63,7 +67,7 @@ def main():
         description=(
             "Flexibly finds and re-evaluates model runs to update plots and metrics. "
             "Takes an input path and intelligently finds all individual run directories "
-            "(containing tensorboard/hparams.yaml) beneath it, then calls "
+            "(containing hparams.yaml or tensorboard/hparams.yaml) beneath it, then calls "
             "src/evaluation/evaluate.py for each."
         )
     )
@@ -81,6 +85,25 @@ def main():
         default=Path("src/evaluation/evaluate.py"),
         help="Path to the evaluate.py script (default: src/evaluation/evaluate.py).",
     )
+    parser.add_argument(
+        "--in_process",
+        action="store_true",
+        help="Call evaluate.py's main in this process for every run instead of starting "
+        "a 'uv run python' subprocess per run (torch and the project are imported once).",
+    )
+    parser.add_argument(
+        "--shared_inference",
+        action="store_true",
+        help="Compute the test predictions of all found runs first, loading the test pairs "
+        "and embeddings once per dataset and embedding file; evaluate.py then reads them "
+        "from its cache.",
+    )
+    parser.add_argument(
+        "--per_pair_inference",
+        action="store_true",
+        help="Run FNN models on every test pair instead of encoding each test protein once "
+        "(passed to evaluate.py and used by --shared_inference).",
+    )
     parser.add_argument(
         "--dry_run",
         action="store_true",
@@ -126,19 +149,36 @@ def main():
     for rd in actual_run_dirs:
         print(f"  {rd}")
 
+    if args.shared_inference and not args.dry_run:
+        project_root = Path(__file__).parent.parent.parent
+        written = precompute_predictions(
+            actual_run_dirs,
+            project_root / "models",
+            per_pair_inference=args.per_pair_inference,
+        )
+        print(f"\nShared inference wrote {written} prediction file(s).")
+
     for run_dir in actual_run_dirs:
+        # run_dir is already resolved from the collection
+        eval_args = ["--run_dir", str(run_dir.resolve())]
+        if args.per_pair_inference:
+            eval_args.append("--per_pair_inference")
         command = [
             "uv",
             "run",
             "python",
             str(args.evaluate_script_path.resolve()),
-            "--run_dir",
-            str(run_dir.resolve()),  # run_dir is already resolved from the collection
+            *eval_args,
         ]
 
         print(f"\nExecuting: {' '.join(command)}")
         if args.dry_run:
             print("(Dry run - command not executed)")
+        elif args.in_process:
+            if run_in_process(EVALUATE_SCRIPT, eval_args):
+                print(f"Successfully evaluated {run_dir}")
+            else:
+                print(f"Error running evaluation for {run_dir}.")
         else:
             try:
                 process = subprocess.run(
@@ -0,0 +1,257 @@
+"""
+Shared test-set inference for all runs of a dataset and embedding file.
+
+evaluate.py prepares the test data of every run on its own, so evaluating all
+model types and parameters of a sweep refilters each test parquet file and rereads
+its embeddings once per run. ``precompute_predictions`` instead groups run
+directories by (test file, embedding file, embedding dtype), loads the indexed test
+pairs of each parameter and a single embedding table per group, and runs every
+best checkpoint of the group on them: FNN models with two-stage inference
+(run_encoded_inference), the linear models together on the same in-memory
+minibatches, and distance baselines with ``pair_distances``. Predictions are
+written to the usual ``predictions_targets`` files, which evaluate.py then loads
+from its cache instead of recomputing them.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pytorch_lightning as pl
+import torch
+from tqdm import tqdm
+
+from src.evaluation.distance_baseline import (
+    baseline_name,
+    compute_distance_baselines,
+    load_pairs_table,
+)
+from src.evaluation.evaluate import (
+    MODEL_CLASSES,
+    load_hparams,
+    load_model_from_checkpoint,
+    run_encoded_inference,
+)
+from src.shared.datasets import IndexedPairs, load_indexed_pairs
+from src.shared.embedding_store import EmbeddingTable
+from src.shared.experiment_manager import ExperimentManager
+from src.shared.helpers import get_device
+
+
+@dataclass
+class InferenceRun:
+    """A run directory with its hparams and the test file it is evaluated on."""
+
+    run_dir: Path
+    hparams: Dict[str, Any]
+    test_file: Path
+
+    @property
+    def model_type(self) -> str:
+        return self.hparams["model_type"]
+
+    @property
+    def param_name(self) -> str:
+        return self.hparams["param_name"]
+
+
+def group_runs(
+    run_dirs: List[Path],
+) -> Dict[Tuple[Path, Path, str], List[InferenceRun]]:
+    """Groups run directories by test file, embedding file and embedding dtype."""
+    groups: Dict[Tuple[Path, Path, str], List[InferenceRun]] = {}
+    for run_dir in run_dirs:
+        try:
+            hparams = load_hparams(run_dir)
+        except Exception as e:
+            print(f"Skipping {run_dir} in shared inference: {e}")
+            continue
+        test_file = (Path(hparams["data_dir"]) / "test.parquet").resolve()
+        if not test_file.is_file():
+            print(f"Skipping {run_dir} in shared inference: {test_file} not found")
+            continue
+        key = (
+            test_file,
+            Path(hparams["embedding_file"]).resolve(),
+            hparams.get("embedding_dtype", "float32"),
+        )
+        groups.setdefault(key, []).append(InferenceRun(run_dir, hparams, test_file))
+    return groups
+
+
+def run_shared_inference(
+    models: List[pl.LightningModule],
+    pairs: IndexedPairs,
+    embedding_table: EmbeddingTable,
+    batch_size: int,
+) -> List[np.ndarray]:
+    """
+    Runs several models on the same minibatches gathered from an EmbeddingTable.
+
+    Each minibatch of pair embeddings is gathered and moved to the device once for
+    all models. Returns the predictions of each model in pair table order, shaped
+    like the pair values.
+    """
+    device = get_device()
+    for model in models:
+        model.to(device)
+        model.eval()
+
+    pairs = pairs.for_table(embedding_table)
+    preds = [[] for _ in models]
+    with torch.no_grad():
+        for start in tqdm(
+            range(0, len(pairs), batch_size), desc="Shared inference", unit="batch"
+        ):
+            stop = start + batch_size
+            query_embs = torch.from_numpy(
+                embedding_table.gather(pairs.query_rows[start:stop])
+            ).to(device)
+            target_embs = torch.from_numpy(
+                embedding_table.gather(pairs.target_rows[start:stop])
+            ).to(device)
+            for model_preds, model in zip(preds, models):
+                model_preds.append(model(query_embs, target_embs).cpu())
+
+    if pairs.values.ndim > 1:
+        # Multi-target models keep one column per parameter
+        return [torch.cat(p).numpy().reshape(pairs.values.shape) for p in preds]
+    return [torch.cat(p).numpy().flatten() for p in preds]
+
+
+def _save_predictions(save_path: Path, predictions: np.ndarray, targets: np.ndarray):
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(save_path, predictions=predictions, targets=targets)
+    print(f"Saved predictions and targets to: {save_path}")
+
+
+def _precompute_group(
+    test_file: Path,
+    embedding_file: Path,
+    embedding_dtype: str,
+    runs: List[InferenceRun],
+    models_base_dir: Path,
+    force_recompute: bool,
+    per_pair_inference: bool,
+) -> int:
+    """Writes the missing predictions of one group of runs; returns how many."""
+    test_set_name = test_file.stem
+    # Pending work: (run, metrics) of baselines and (run, checkpoint, file) of models
+    baselines, checkpoints = [], []
+    for run in runs:
+        if run.model_type == "euclidean":
+            metrics = [
+                metric
+                for metric in run.hparams.get("distance_metrics", ["euclidean"])
+                if force_recompute
+                or not ExperimentManager.predictions_targets_path(
+                    run.run_dir, test_set_name, baseline_name(metric)
+                ).is_file()
+            ]
+            if metrics:
+                baselines.append((run, metrics))
+        elif run.model_type in MODEL_CLASSES:
+            exp_manager = ExperimentManager.from_hparams(run.hparams, models_base_dir)
+            ckpt_path = exp_manager.find_best_checkpoint(run.run_dir)
+            if ckpt_path is None:
+                print(
+                    f"Skipping {run.run_dir} in shared inference: no checkpoint found"
+                )
+                continue
+            save_path = ExperimentManager.predictions_targets_path(
+                run.run_dir, test_set_name, ckpt_path.stem, embedding_dtype
+            )
+            if force_recompute or not save_path.is_file():
+                checkpoints.append((run, ckpt_path, save_path))
+    if not baselines and not checkpoints:
+        return 0
+
+    print(
+        f"\nShared inference on {test_file} with {embedding_file.name} "
+        f"({len(baselines)} baseline and {len(checkpoints)} model runs)"
+    )
+    param_names = sorted({run.param_name for run, *_ in baselines + checkpoints})
+    pairs = {
+        param_name: load_indexed_pairs(
+            str(test_file),
+            str(embedding_file),
+            param_name,
+            use_cache=any(run.hparams.get("cache_pair_index", False) for run in runs),
+        )
+        for param_name in param_names
+    }
+    embedding_table = load_pairs_table(
+        embedding_file, pairs.values(), dtype=embedding_dtype
+    )
+    written = 0
+
+    for run, metrics in baselines:
+        compute_distance_baselines(
+            embedding_file,
+            test_file,
+            [(run.param_name, run.run_dir)],
+            metrics,
+            embedding_table=embedding_table,
+        )
+        written += len(metrics)
+
+    batch_size = max(int(run.hparams["batch_size"]) for run in runs)
+    for param_name, param_pairs in pairs.items():
+        shared = []
+        for run, ckpt_path, save_path in checkpoints:
+            if run.param_name != param_name:
+                continue
+            model = load_model_from_checkpoint(ckpt_path, MODEL_CLASSES[run.model_type])
+            if run.model_type == "fnn" and not per_pair_inference:
+                # Encoding every test protein once beats sharing pair batches
+                predictions, targets = run_encoded_inference(
+                    model, param_pairs, embedding_table, batch_size
+                )
+                _save_predictions(save_path, predictions, targets)
+                written += 1
+            else:
+                shared.append((model, save_path))
+        if shared:
+            all_predictions = run_shared_inference(
+                [model for model, _ in shared], param_pairs, embedding_table, batch_size
+            )
+            for (_, save_path), predictions in zip(shared, all_predictions):
+                _save_predictions(save_path, predictions, param_pairs.values.copy())
+                written += 1
+    return written
+
+
+def precompute_predictions(
+    run_dirs: List[Path],
+    models_base_dir: Path,
+    force_recompute: bool = False,
+    per_pair_inference: bool = False,
+) -> int:
+    """
+    Writes the test predictions of all run directories with shared test data.
+
+    Runs whose predictions file already exists are skipped unless
+    ``force_recompute``. FNN models encode every test protein once unless
+    ``per_pair_inference`` (evaluate.py's --per_pair_inference). Errors are reported per group; evaluate.py computes the
+    predictions of failed groups itself. Returns the number of files written.
+    """
+    written = 0
+    for (test_file, embedding_file, embedding_dtype), runs in group_runs(
+        run_dirs
+    ).items():
+        try:
+            written += _precompute_group(
+                test_file,
+                embedding_file,
+                embedding_dtype,
+                runs,
+                models_base_dir,
+                force_recompute,
+                per_pair_inference,
+            )
+        except Exception as e:
+            print(
+                f"Error in shared inference for {embedding_file.name} on {test_file}: {e}"
+            )
+    return written
@@ -1,30 +1,176 @@
+import hashlib
+import os
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
 import h5py
 import numpy as np
 import polars as pl
-from torch.utils.data import Dataset, DataLoader
+import torch
+from torch.utils.data import Dataset, DataLoader, Sampler
+from tqdm import tqdm
+
+from src.shared.embedding_store import (
+    PACKED_EMBEDDINGS_KEY,
+    EmbeddingTable,
+    is_packed_store,
+    load_embedding_table,
+    open_memmap_table,
+    read_embedding_ids,
+    read_embedding_size,
+)
+from src.shared.helpers import get_device
+
+# Supported DataLoader modes:
+# - "h5": every sample reads its two embeddings from the HDF5 file
+# - "memory": embeddings are preloaded into one contiguous matrix (EmbeddingTable)
+# - "batched": like "memory", but whole minibatches are gathered at once
+# - "device": matrix and pair indices live on the training device (DevicePairLoader)
+# The table of the in-memory modes can also be memory-mapped from a contiguous
+# packed store (mmap_embeddings=True).
+LOADER_MODES = ["h5", "memory", "batched", "device"]
+
+# Target parameters of the pair tables. With param_name=MULTI_PARAM all of them are
+# loaded at once as a (N, len(TARGET_PARAMS)) target matrix, with NaN where a
+# parameter is missing for a pair.
+TARGET_PARAMS = ["fident", "alntmscore", "hfsp"]
+MULTI_PARAM = "multi"
+
+# Storage dtypes of precomputed pair feature matrices (create_feature_loader)
+FEATURE_DTYPES = ["float32", "float16"]
+
+# In-process memos of embedding IDs and indexed pair tables, keyed on file versions
+_MEMO_SIZE = 8
+_EMBEDDING_IDS_MEMO: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_PAIR_INDEX_MEMO: "OrderedDict[str, IndexedPairs]" = OrderedDict()
+# Embedding matrices already uploaded for the "device" loader mode, per table and device
+_DEVICE_EMBEDDINGS: "weakref.WeakKeyDictionary[EmbeddingTable, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@dataclass
+class IndexedPairs:
+    """
+    Pair table with proteins stored as int32 row indices instead of string IDs.
+
+    Rows refer to ``protein_ids``, the ID of every row of the embedding file (or of
+    an EmbeddingTable after ``for_table``). This keeps datasets small and avoids
+    pickling object arrays of strings into every DataLoader worker.
+    """
+
+    query_rows: np.ndarray
+    target_rows: np.ndarray
+    values: np.ndarray
+    protein_ids: np.ndarray
+
+    def __len__(self):
+        return len(self.values)
+
+    def used_protein_ids(self) -> np.ndarray:
+        """Returns the IDs of all proteins referenced by at least one pair."""
+        used_rows = np.unique(np.concatenate([self.query_rows, self.target_rows]))
+        return self.protein_ids[used_rows]
+
+    def for_table(self, embedding_table: EmbeddingTable) -> "IndexedPairs":
+        """Re-indexes the pairs against the rows of an EmbeddingTable."""
+        if len(embedding_table) == len(self.protein_ids) and np.array_equal(
+            embedding_table.ids, self.protein_ids
+        ):
+            return self
+        used_rows, inverse = np.unique(
+            np.concatenate([self.query_rows, self.target_rows]), return_inverse=True
+        )
+        table_rows = embedding_table.rows(self.protein_ids[used_rows]).astype(np.int32)
+        remapped = table_rows[inverse]
+        return IndexedPairs(
+            query_rows=remapped[: len(self)],
+            target_rows=remapped[len(self) :],
+            values=self.values,
+            protein_ids=embedding_table.ids,
+        )
+
+    def take(self, order: np.ndarray) -> "IndexedPairs":
+        """Returns the pairs at the given positions, in that order."""
+        return IndexedPairs(
+            query_rows=self.query_rows[order],
+            target_rows=self.target_rows[order],
+            values=self.values[order],
+            protein_ids=self.protein_ids,
+        )
+
+    def stratified_subset(self, size: int, seed: int = 0) -> np.ndarray:
+        """
+        Returns the sorted positions of a fixed random subset of ``size`` pairs.
+
+        The subset is stratified on the target value (the mean over the available
+        targets of multi-target pairs): pairs are sorted by value, split into
+        ``size`` equally large consecutive strata and one random pair is drawn from
+        each, so the subset follows the value distribution of the full table.
+        """
+        if size >= len(self):
+            return np.arange(len(self))
+        values = self.values if self.values.ndim == 1 else np.nanmean(self.values, 1)
+        order = np.argsort(values, kind="stable")
+        bounds = np.linspace(0, len(self), size + 1).astype(np.int64)
+        offsets = np.random.default_rng(seed).random(size) * np.diff(bounds)
+        return np.sort(order[bounds[:-1] + offsets.astype(np.int64)])
+
+    def locality_order(self) -> np.ndarray:
+        """
+        Returns the permutation that sorts pairs by query and then target row.
+
+        Consecutive pairs then share their query embedding, and rows are visited in
+        file order instead of jumping randomly across the embedding file.
+        """
+        return np.lexsort((self.target_rows, self.query_rows))
 
 
 class H5PyDataset(Dataset):
     def __init__(
         self,
-        data: pl.DataFrame,
+        pairs: IndexedPairs,
         file_path: str,
         param_name: str,
+        embedding_table: Optional[EmbeddingTable] = None,
+        embedding_cache_size: int = 0,
     ):
         self.param_name = param_name
         self.file_path = file_path
         self.file = None
+        # LRU cache of embeddings read from the HDF5 file, keyed on protein row
+        # (one row per protein ID). Each worker process fills its own cache.
+        self.embedding_cache_size = embedding_cache_size
+        self.embedding_cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        # Whether the opened file uses the packed layout (rows are read directly)
+        self.packed = False
+        # When an embedding table is given, samples are served from memory and the
+        # HDF5 file is never opened. Forked DataLoader workers share the matrix
+        # copy-on-write, since it is never written to after loading.
+        self.embedding_table = embedding_table
+        if embedding_table is not None:
+            pairs = pairs.for_table(embedding_table)
 
-        self.queries = data.select("query").to_series().to_numpy()
-        self.targets = data.select("target").to_series().to_numpy()
-        self.param_values = (
-            data.select(param_name).to_series().to_numpy().astype(np.float32)
-        )
+        self.query_rows = pairs.query_rows
+        self.target_rows = pairs.target_rows
+        self.param_values = pairs.values
+        # Protein IDs are only needed to look up datasets in per-protein HDF5 files
+        self.protein_ids = pairs.protein_ids if embedding_table is None else None
 
     def __len__(self):
-        return len(self.queries)
+        return len(self.query_rows)
 
     def __getitem__(self, idx):
+        if self.embedding_table is not None:
+            return (
+                self.embedding_table.gather(self.query_rows[idx]),
+                self.embedding_table.gather(self.target_rows[idx]),
+                self.param_values[idx],
+            )
+
         if self.file is None:
             # Optimized HDF5 file opening with larger cache
             self.file = h5py.File(
@@ -32,40 +178,461 @@ class H5PyDataset(Dataset):
                 "r",
                 swmr=True,
             )
+            self.packed = is_packed_store(self.file)
 
-        query_id = self.queries[idx]
-        target_id = self.targets[idx]
+        query_row = self.query_rows[idx]
+        target_row = self.target_rows[idx]
         param_value = self.param_values[idx]
 
         # Get embeddings with optional caching
-        query_emb_np = self._get_embedding(query_id)
-        target_emb_np = self._get_embedding(target_id)
+        query_emb_np = self._get_embedding(query_row)
+        target_emb_np = self._get_embedding(target_row)
 
         return query_emb_np, target_emb_np, param_value
 
-    def _get_embedding(self, protein_id: str) -> np.ndarray:
+    def _get_embedding(self, row: int) -> np.ndarray:
         """Get embedding"""
+        if self.embedding_cache_size > 0:
+            embedding = self.embedding_cache.get(row)
+            if embedding is not None:
+                self.embedding_cache.move_to_end(row)
+                return embedding
+
         # Load from HDF5
-        embedding = self.file[protein_id][:].flatten().astype(np.float32)
+        if self.packed:
+            embedding = self.file[PACKED_EMBEDDINGS_KEY][row].astype(np.float32)
+        else:
+            embedding = self.file[self.protein_ids[row]][:].flatten().astype(np.float32)
 
+        if self.embedding_cache_size > 0:
+            self.embedding_cache[row] = embedding
+            if len(self.embedding_cache) > self.embedding_cache_size:
+                self.embedding_cache.popitem(last=False)
         return embedding
 
     def close(self):
         if self.file is not None:
             self.file.close()
             self.file = None
+        self.embedding_cache.clear()
+
+
+class BatchedPairDataset(Dataset):
+    """
+    Pair dataset that serves whole minibatches from an in-memory EmbeddingTable.
+
+    ``__getitem__`` receives an array of pair indices (see PairBatchSampler) and
+    returns ``(B, D)`` query and target tensors built with one vectorized gather,
+    so there is no per-sample Python work and no default collation. Use it with
+    ``DataLoader(batch_size=None, sampler=PairBatchSampler(...))``.
+    """
+
+    def __init__(
+        self,
+        pairs: IndexedPairs,
+        param_name: str,
+        embedding_table: EmbeddingTable,
+    ):
+        self.param_name = param_name
+        self.embedding_table = embedding_table
+
+        pairs = pairs.for_table(embedding_table)
+        self.query_rows = pairs.query_rows
+        self.target_rows = pairs.target_rows
+        self.param_values = pairs.values
+
+    def __len__(self):
+        return len(self.param_values)
+
+    def __getitem__(self, indices):
+        indices = np.asarray(indices)
+        query_emb = self.embedding_table.gather(self.query_rows[indices])
+        target_emb = self.embedding_table.gather(self.target_rows[indices])
+        return (
+            torch.from_numpy(query_emb),
+            torch.from_numpy(target_emb),
+            torch.from_numpy(self.param_values[indices]),
+        )
+
+
+class ProteinBatchDataset(Dataset):
+    """
+    Builds training minibatches from a minibatch of proteins instead of pairs.
+
+    ``__getitem__`` receives an array of protein indices (see
+    ProteinNeighbourhoodSampler) and returns a dict with the ``(P, D)`` embeddings of
+    those proteins (each gathered once), and the ``query_index``/``target_index``
+    positions and ``values`` of every labelled pair among them. The pairs are found
+    through a CSR index of the pair table by query row, so building a batch costs
+    O(pairs of the P proteins) rather than a scan of the pair table.
+    """
+
+    def __init__(
+        self,
+        pairs: IndexedPairs,
+        param_name: str,
+        embedding_table: EmbeddingTable,
+    ):
+        self.param_name = param_name
+        self.embedding_table = embedding_table
+
+        pairs = pairs.for_table(embedding_table)
+        self.query_rows = pairs.query_rows
+        self.target_rows = pairs.target_rows
+        self.param_values = pairs.values
+        self.protein_rows = np.unique(
+            np.concatenate([pairs.query_rows, pairs.target_rows])
+        )
+
+        # CSR index: pairs of query row r are pair_order[indptr[r]:indptr[r + 1]]
+        self.pair_order = np.argsort(pairs.query_rows, kind="stable")
+        self.indptr = np.searchsorted(
+            pairs.query_rows[self.pair_order], np.arange(len(embedding_table) + 1)
+        )
+
+    @property
+    def num_proteins(self) -> int:
+        return len(self.protein_rows)
+
+    def pair_proteins(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the protein indices (into ``protein_rows``) of every pair."""
+        return (
+            np.searchsorted(self.protein_rows, self.query_rows),
+            np.searchsorted(self.protein_rows, self.target_rows),
+        )
+
+    def __len__(self):
+        return self.num_proteins
+
+    def __getitem__(self, indices):
+        rows = np.sort(self.protein_rows[np.asarray(indices)])
+
+        # Candidate pairs: all pairs whose query is in the batch
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        candidates = self.pair_order[offsets + np.arange(counts.sum())]
+
+        # Keep those whose target is in the batch as well
+        target_rows = self.target_rows[candidates]
+        target_index = np.minimum(np.searchsorted(rows, target_rows), len(rows) - 1)
+        keep = rows[target_index] == target_rows
+        pair_indices = candidates[keep]
+        query_index = np.searchsorted(rows, self.query_rows[pair_indices])
+
+        return {
+            "embeddings": torch.from_numpy(self.embedding_table.gather(rows)),
+            "query_index": torch.from_numpy(query_index),
+            "target_index": torch.from_numpy(target_index[keep]),
+            "values": torch.from_numpy(self.param_values[pair_indices]),
+        }
+
+
+class PairFeatureDataset(Dataset):
+    """
+    Serves whole minibatches of precomputed pair features (see precompute_pair_features).
+
+    Like BatchedPairDataset, ``__getitem__`` receives an array of pair indices and
+    returns ``(features, values)`` with the features upcast to float32. The
+    feature matrix is memory-mapped, so workers share the page cache.
+    """
+
+    def __init__(self, feature_file: Path, values: np.ndarray):
+        self.feature_file = Path(feature_file)
+        self.param_values = values
+        self._features = None
+
+    @property
+    def features(self) -> np.ndarray:
+        if self._features is None:
+            self._features = np.load(self.feature_file, mmap_mode="r")
+        return self._features
+
+    def __getstate__(self):
+        # Workers re-map the file instead of pickling the mapping
+        state = self.__dict__.copy()
+        state["_features"] = None
+        return state
+
+    def __len__(self):
+        return len(self.param_values)
+
+    def __getitem__(self, indices):
+        indices = np.asarray(indices)
+        # Sorted reads are friendlier to the page cache; restore the batch order after
+        order = np.argsort(indices, kind="stable")
+        features = np.empty((len(indices), self.features.shape[1]), dtype=np.float32)
+        features[order] = self.features[indices[order]]
+        return (
+            torch.from_numpy(features),
+            torch.from_numpy(self.param_values[indices]),
+        )
+
+
+def _device_embeddings(
+    embedding_table: EmbeddingTable, device: torch.device
+) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+    """
+    Uploads the matrix (and int8 scales) of a table once per device in its storage
+    dtype, so train and val loaders share it.
+    """
+    uploaded = _DEVICE_EMBEDDINGS.setdefault(embedding_table, {})
+    if device not in uploaded:
+        embeddings = np.asarray(embedding_table.embeddings)
+        if embedding_table.storage_dtype == "bfloat16":
+            matrix = torch.from_numpy(embeddings.view(np.int16)).view(torch.bfloat16)
+        else:
+            matrix = torch.from_numpy(embeddings)
+        scales = embedding_table.scales
+        uploaded[device] = (
+            matrix.to(device),
+            torch.from_numpy(scales).to(device) if scales is not None else None,
+        )
+    return uploaded[device]
+
+
+class DevicePairLoader:
+    """
+    Minibatch iterator with embeddings and pair indices resident on one device.
+
+    The embedding matrix and the int pair indices are uploaded once. Each epoch
+    slices a (shuffled) permutation on the device and gathers the batch with
+    ``index_select``, so there are no DataLoader workers, no pinned memory and no
+    per-batch host-to-device copies. On CPU this is plain torch tensor indexing.
+    Intended for embedding sets that fit into device memory.
+    """
+
+    def __init__(
+        self,
+        pairs: IndexedPairs,
+        embedding_table: EmbeddingTable,
+        batch_size: int,
+        shuffle: bool = False,
+        device: Optional[torch.device] = None,
+    ):
+        self.device = torch.device(device) if device is not None else get_device()
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+        pairs = pairs.for_table(embedding_table)
+        self.embeddings, self.scales = _device_embeddings(embedding_table, self.device)
+        self.query_rows = torch.as_tensor(
+            pairs.query_rows, dtype=torch.long, device=self.device
+        )
+        self.target_rows = torch.as_tensor(
+            pairs.target_rows, dtype=torch.long, device=self.device
+        )
+        self.param_values = torch.tensor(pairs.values, device=self.device)
+        self.num_samples = len(pairs)
+        # Set by create_single_loader when pairs are served in locality order
+        self.row_order = None
+
+    def __len__(self):
+        return (self.num_samples + self.batch_size - 1) // self.batch_size
+
+    def _gather(self, rows: torch.Tensor) -> torch.Tensor:
+        """Gathers rows and upcasts them from the table storage dtype to float32."""
+        embeddings = self.embeddings.index_select(0, rows).float()
+        if self.scales is not None:
+            embeddings *= self.scales.index_select(0, rows).unsqueeze(1)
+        return embeddings
+
+    def __iter__(self):
+        if self.shuffle:
+            # Uses torch's global RNG so runs are reproducible via seed_everything
+            order = torch.randperm(self.num_samples, device=self.device)
+        else:
+            order = torch.arange(self.num_samples, device=self.device)
+        for start in range(0, self.num_samples, self.batch_size):
+            indices = order[start : start + self.batch_size]
+            yield (
+                self._gather(self.query_rows[indices]),
+                self._gather(self.target_rows[indices]),
+                self.param_values[indices],
+            )
+
+
+class PairBatchSampler(Sampler):
+    """
+    Yields index arrays of whole minibatches, optionally over a shuffled permutation.
+
+    With a ``seed``, the permutation of each epoch is drawn from a generator seeded
+    with ``seed + epoch`` (see ``set_epoch``) instead of torch's global RNG. Under
+    DDP, Lightning wraps the sampler in a DistributedSampler that hands every
+    process a disjoint share of the batches, which requires all processes to
+    draw the same permutation.
+    """
+
+    def __init__(
+        self,
+        num_samples: int,
+        batch_size: int,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+    ):
+        self.num_samples = num_samples
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def __len__(self):
+        return (self.num_samples + self.batch_size - 1) // self.batch_size
+
+    def set_epoch(self, epoch: int):
+        """Called by Lightning at the start of every epoch."""
+        self.epoch = epoch
+
+    def __iter__(self):
+        if self.shuffle and self.seed is not None:
+            generator = torch.Generator().manual_seed(self.seed + self.epoch)
+            order = torch.randperm(self.num_samples, generator=generator).numpy()
+        elif self.shuffle:
+            # Uses torch's global RNG so runs are reproducible via seed_everything
+            order = torch.randperm(self.num_samples).numpy()
+        else:
+            order = np.arange(self.num_samples)
+        for start in range(0, self.num_samples, self.batch_size):
+            yield order[start : start + self.batch_size]
+
+
+class ProteinNeighbourhoodSampler(Sampler):
+    """
+    Yields protein index arrays of minibatches built from pair-graph neighbourhoods.
+
+    Uniformly sampled protein minibatches cover only about P/N of the pairs per
+    epoch, as both proteins of a pair must land in the same batch of P out of N.
+    Instead, every protein is taken once per epoch, in random order, as a seed
+    followed by up to ``batch_size - 1`` of its partners (in random order), and
+    this stream of neighbourhoods is cut into batches of ``batch_size`` entries.
+    All pairs of a seed with fewer than ``batch_size`` partners are thus covered,
+    unless its neighbourhood is split at a batch boundary, where the partner's own
+    neighbourhood usually covers the pair. An epoch has
+    ``ceil(sum(min(1 + partners, batch_size)) / batch_size)`` batches, roughly
+    (proteins + 2 * pairs) / batch_size, of at most ``batch_size`` distinct proteins.
+    """
+
+    def __init__(
+        self,
+        query_index: np.ndarray,
+        target_index: np.ndarray,
+        num_proteins: int,
+        batch_size: int,
+        shuffle: bool = True,
+    ):
+        self.num_proteins = num_proteins
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+        # CSR adjacency of the undirected pair graph: the partners of protein i are
+        # partners[indptr[i]:indptr[i + 1]]
+        heads = np.concatenate([query_index, target_index])
+        order = np.argsort(heads, kind="stable")
+        self.heads = heads[order]
+        self.partners = np.concatenate([target_index, query_index])[order]
+        self.indptr = np.searchsorted(self.heads, np.arange(num_proteins + 1))
+        self.sizes = np.minimum(1 + np.diff(self.indptr), batch_size)
+        self.stream_length = int(self.sizes.sum())
+
+    def __len__(self):
+        return (self.stream_length + self.batch_size - 1) // self.batch_size
+
+    def _stream(self) -> np.ndarray:
+        """Returns the seeds of this epoch, each followed by its sampled partners."""
+        if self.shuffle:
+            # Uses torch's global RNG so runs are reproducible via seed_everything
+            seeds = torch.randperm(self.num_proteins).numpy()
+            keys = torch.rand(len(self.partners)).numpy()
+            partners = self.partners[np.lexsort((keys, self.heads))]
+        else:
+            seeds = np.arange(self.num_proteins)
+            partners = self.partners
+
+        sizes = self.sizes[seeds]
+        counts = sizes - 1
+        is_seed = np.zeros(self.stream_length, dtype=bool)
+        is_seed[np.cumsum(sizes) - sizes] = True
+        offsets = np.repeat(self.indptr[seeds] - np.cumsum(counts) + counts, counts)
+
+        stream = np.empty(self.stream_length, dtype=np.int64)
+        stream[is_seed] = seeds
+        stream[~is_seed] = partners[offsets + np.arange(counts.sum())]
+        return stream
+
+    def __iter__(self):
+        stream = self._stream()
+        for start in range(0, self.stream_length, self.batch_size):
+            yield np.unique(stream[start : start + self.batch_size])
+
+
+def set_pair_sampler_epoch(dataloader, epoch: int) -> bool:
+    """
+    Calls ``set_epoch`` on the PairBatchSampler of a DataLoader, also when Lightning
+    has wrapped it in a DistributedSamplerWrapper for DDP.
+
+    Lightning only calls ``set_epoch`` on the wrapper, which older releases do not
+    forward to the wrapped sampler. Returns whether a PairBatchSampler was found.
+    """
+    sampler = getattr(dataloader, "sampler", None)
+    # DistributedSamplerWrapper keeps the original sampler in a dataset adapter
+    wrapped = getattr(getattr(sampler, "dataset", None), "_sampler", None)
+    for candidate in (sampler, wrapped):
+        if isinstance(candidate, PairBatchSampler):
+            candidate.set_epoch(epoch)
+            return True
+    return False
+
+
+def target_columns(param_name: str) -> list:
+    """Returns the parquet target columns of a param name (all of them for 'multi')."""
+    return list(TARGET_PARAMS) if param_name == MULTI_PARAM else [param_name]
+
+
+def target_statistics(parquet_file: str) -> Tuple[List[float], List[float]]:
+    """
+    Returns the mean and standard deviation of every TARGET_PARAMS column.
+
+    Missing values are ignored. Multi-target models standardise their targets with
+    these train-set statistics; a column without spread gets a standard deviation of 1.
+    """
+    columns = [pl.col(c).cast(pl.Float64).fill_nan(None) for c in TARGET_PARAMS]
+    stats = (
+        pl.scan_parquet(parquet_file)
+        .select(
+            [c.mean().name.suffix("_mean") for c in columns]
+            + [c.std().name.suffix("_std") for c in columns]
+        )
+        .collect()
+        .row(0)
+    )
+    n = len(TARGET_PARAMS)
+    means = [float(m) if m is not None else 0.0 for m in stats[:n]]
+    stds = [float(s) if s else 1.0 for s in stats[n:]]
+    return means, stds
 
 
 def get_embedding_size(hdf_file: str) -> int:
-    """Reads the shape of the first dataset in the HDF5 file and returns its total size as an int."""
-    with h5py.File(hdf_file, "r", rdcc_nbytes=32 * 1024 * 1024) as hdf:
-        first_key = next(iter(hdf))
-        embedding_shape = hdf[first_key].shape
-        return int(np.prod(embedding_shape))
+    """Returns the embedding size of an HDF5 embedding file (per-protein or packed layout)."""
+    return read_embedding_size(hdf_file)
+
+
+def restore_pair_order(values: np.ndarray, loader) -> np.ndarray:
+    """
+    Maps per-pair outputs collected in loader order back to the parquet row order.
+
+    Only loaders created with ``locality_order=True`` reorder pairs; for all other
+    loaders ``values`` is returned unchanged.
+    """
+    row_order = getattr(loader, "row_order", None)
+    if row_order is None:
+        return values
+    restored = np.empty_like(values)
+    restored[row_order] = values
+    return restored
 
 
 # --- Helper function for loading and filtering data --- #
-def _load_and_filter_data(file_path, hdf_file, param_name):
+def _load_and_filter_data(file_path, hdf_file, param_name, protein_ids=None):
     """Loads a parquet file, keeps necessary columns, removes NaNs, and filters based on HDF5 keys."""
     print(f"Loading and filtering data from: {file_path}")
 
@@ -73,31 +640,42 @@ def _load_and_filter_data(file_path, hdf_file, param_name):
     if not file_path.endswith(".parquet"):
         raise ValueError(f"Only parquet files are supported. Got: {file_path}")
 
+    columns = target_columns(param_name)
     try:
-        df = pl.read_parquet(file_path, columns=["query", "target", param_name])
+        df = pl.read_parquet(file_path, columns=["query", "target", *columns])
     except Exception as e:
         raise ValueError(
             f"Error reading {file_path}. Ensure 'query', 'target', and '{param_name}' columns exist. Original error: {e}"
         )
 
     initial_rows = df.height
-    df = df.drop_nulls(subset=[param_name])
-    if df.height < initial_rows:
-        print(
-            f"Dropped {initial_rows - df.height} rows with null values in '{param_name}' column."
-        )
+    if param_name == MULTI_PARAM:
+        # Keep pairs with at least one target; missing ones become NaN (masked in the loss)
+        df = df.filter(pl.any_horizontal(pl.col(columns).is_not_null()))
+        if df.height < initial_rows:
+            print(
+                f"Dropped {initial_rows - df.height} rows without any of the targets {columns}."
+            )
+    else:
+        df = df.drop_nulls(subset=[param_name])
+        if df.height < initial_rows:
+            print(
+                f"Dropped {initial_rows - df.height} rows with null values in '{param_name}' column."
+            )
 
     # Filter valid proteins based on keys present in the HDF5 file
     try:
-        with h5py.File(hdf_file, "r") as hdf:
-            valid_keys = set(hdf.keys())
+        if protein_ids is None:
+            protein_ids = read_embedding_ids(hdf_file)
+        valid_keys = pl.Series(protein_ids, dtype=pl.Utf8)
     except Exception as e:
         raise IOError(
             f"Error opening or reading HDF5 file {hdf_file}. Original error: {e}"
         )
 
     filtered_df = df.filter(
-        pl.col("query").is_in(valid_keys) & pl.col("target").is_in(valid_keys)
+        pl.col("query").is_in(valid_keys.implode())
+        & pl.col("target").is_in(valid_keys.implode())
     )
     if filtered_df.height < df.height:
         print(
@@ -110,6 +688,283 @@ def _load_and_filter_data(file_path, hdf_file, param_name):
     return filtered_df
 
 
+def index_pairs(
+    data: pl.DataFrame, protein_ids: np.ndarray, param_name: str
+) -> IndexedPairs:
+    """
+    Converts the string IDs of a filtered pair table into int32 rows of ``protein_ids``.
+
+    For ``param_name="multi"`` the values are a ``(N, len(TARGET_PARAMS))`` matrix
+    with NaN for missing targets.
+    """
+    ids = pl.Series(protein_ids, dtype=pl.Utf8)
+    rows = pl.Series(np.arange(len(protein_ids), dtype=np.int32))
+    indexed = data.select(
+        pl.col("query").replace_strict(ids, rows, return_dtype=pl.Int32),
+        pl.col("target").replace_strict(ids, rows, return_dtype=pl.Int32),
+    )
+    return IndexedPairs(
+        query_rows=indexed["query"].to_numpy(),
+        target_rows=indexed["target"].to_numpy(),
+        values=_target_values(data, param_name),
+        protein_ids=np.asarray(protein_ids, dtype=object),
+    )
+
+
+def _target_values(data: pl.DataFrame, param_name: str) -> np.ndarray:
+    """Returns the float32 target vector (or NaN-masked matrix for 'multi') of a pair table."""
+    if param_name != MULTI_PARAM:
+        return data[param_name].to_numpy().astype(np.float32)
+    return (
+        data.select(pl.col(TARGET_PARAMS).cast(pl.Float32).fill_null(float("nan")))
+        .to_numpy()
+        .astype(np.float32)
+    )
+
+
+def _file_fingerprint(path) -> str:
+    """Identifies a file version by its resolved path, size and modification time."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _embedding_cache_key(hdf_file: str) -> str:
+    """
+    Names an embedding file version in cache file names: its stem and a short hash
+    of its fingerprint, so that embedding files with the same name in different
+    directories do not share (and keep overwriting) one cache file.
+    """
+    digest = hashlib.sha1(_file_fingerprint(hdf_file).encode()).hexdigest()[:10]
+    return f"{Path(hdf_file).stem}-{digest}"
+
+
+def _pair_index_cache_path(parquet_file: str, hdf_file: str, param_name: str) -> Path:
+    """Cache file of an indexed pair table, stored next to the parquet file."""
+    parquet_path = Path(parquet_file)
+    return parquet_path.with_name(
+        f"{parquet_path.stem}.{_embedding_cache_key(hdf_file)}.{param_name}.pairs.npz"
+    )
+
+
+def _read_pair_index_cache(
+    cache_path: Path, fingerprint: str
+) -> Optional[IndexedPairs]:
+    """Returns the cached indexed pairs, or None if the cache is missing or outdated."""
+    if not cache_path.is_file():
+        return None
+    try:
+        with np.load(cache_path) as cached:
+            if str(cached["fingerprint"]) != fingerprint:
+                print(f"Pair index cache {cache_path} is outdated. Rebuilding.")
+                return None
+            print(f"Loaded cached pair index from: {cache_path}")
+            return IndexedPairs(
+                query_rows=cached["query_rows"],
+                target_rows=cached["target_rows"],
+                values=cached["values"],
+                protein_ids=cached["protein_ids"].astype(object),
+            )
+    except Exception as e:
+        print(f"Warning: Could not read pair index cache {cache_path}: {e}")
+        return None
+
+
+def _write_pair_index_cache(
+    cache_path: Path, fingerprint: str, pairs: IndexedPairs
+) -> None:
+    """Atomically writes indexed pairs to ``cache_path``."""
+    try:
+        # Per-process name: concurrent runs may write the same cache
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                fingerprint=np.array(fingerprint),
+                query_rows=pairs.query_rows,
+                target_rows=pairs.target_rows,
+                values=pairs.values,
+                protein_ids=pairs.protein_ids.astype(str),
+            )
+        os.replace(tmp_path, cache_path)
+        print(f"Saved pair index cache to: {cache_path}")
+    except Exception as e:
+        print(f"Warning: Could not save pair index cache {cache_path}: {e}")
+
+
+def _memoize(memo: OrderedDict, key: str, value):
+    """Stores ``value`` in a bounded in-process LRU memo and returns it."""
+    memo[key] = value
+    memo.move_to_end(key)
+    while len(memo) > _MEMO_SIZE:
+        memo.popitem(last=False)
+    return value
+
+
+def clear_memos(keep: int = 0):
+    """
+    Drops all but the ``keep`` most recently used entries of the in-process memos.
+
+    Long-lived processes running many runs (see src.shared.in_process) call this
+    between runs, so that pair indexes of earlier runs do not pin memory.
+    """
+    for memo in [_EMBEDDING_IDS_MEMO, _PAIR_INDEX_MEMO]:
+        while len(memo) > keep:
+            memo.popitem(last=False)
+
+
+def _embedding_ids(hdf_file: str) -> np.ndarray:
+    """``read_embedding_ids`` memoized per embedding file version."""
+    fingerprint = _file_fingerprint(hdf_file)
+    if fingerprint in _EMBEDDING_IDS_MEMO:
+        _EMBEDDING_IDS_MEMO.move_to_end(fingerprint)
+        return _EMBEDDING_IDS_MEMO[fingerprint]
+    return _memoize(_EMBEDDING_IDS_MEMO, fingerprint, read_embedding_ids(hdf_file))
+
+
+def load_indexed_pairs(
+    parquet_file: str, hdf_file: str, param_name: str, use_cache: bool = False
+) -> IndexedPairs:
+    """
+    Loads, filters and integer-indexes a pair table against an embedding file.
+
+    Results are memoized per (parquet file, embedding file, param) version within
+    the process, so building the loaders of several runs in one process reads and
+    filters each pair table only once. With ``use_cache=True`` the result is also
+    stored as an ``.npz`` file next to the parquet file and reused by later
+    processes as long as neither file changed (size and modification time).
+    """
+    fingerprint = "|".join(
+        [_file_fingerprint(parquet_file), _file_fingerprint(hdf_file), param_name]
+    )
+    if fingerprint in _PAIR_INDEX_MEMO:
+        _PAIR_INDEX_MEMO.move_to_end(fingerprint)
+        print(f"Reusing pair index of {parquet_file} from this process.")
+        return _PAIR_INDEX_MEMO[fingerprint]
+
+    cache_path = _pair_index_cache_path(parquet_file, hdf_file, param_name)
+    pairs = _read_pair_index_cache(cache_path, fingerprint) if use_cache else None
+    if pairs is None:
+        protein_ids = _embedding_ids(hdf_file)
+        data = _load_and_filter_data(parquet_file, hdf_file, param_name, protein_ids)
+        pairs = index_pairs(data, protein_ids, param_name)
+        if use_cache:
+            _write_pair_index_cache(cache_path, fingerprint, pairs)
+
+    return _memoize(_PAIR_INDEX_MEMO, fingerprint, pairs)
+
+
+def _pair_feature_cache_path(
+    parquet_file: str, hdf_file: str, param_name: str, dtype: str
+) -> Path:
+    """Feature matrix of a pair table, stored next to the parquet file."""
+    parquet_path = Path(parquet_file)
+    return parquet_path.with_name(
+        f"{parquet_path.stem}.{_embedding_cache_key(hdf_file)}.{param_name}"
+        f".sqdiff.{dtype}.npy"
+    )
+
+
+def precompute_pair_features(
+    pairs: IndexedPairs,
+    embedding_table: EmbeddingTable,
+    output_file: Path,
+    dtype: str = "float32",
+    block_rows: int = 65536,
+) -> None:
+    """
+    Writes the element-wise squared difference of every pair to a ``.npy`` file.
+
+    The ``(N, D)`` matrix is written block by block into a memory-mapped file, so
+    it never has to fit into memory. ``dtype`` may be ``float16`` to halve its size.
+    """
+    pairs = pairs.for_table(embedding_table)
+    tmp_file = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+    features = np.lib.format.open_memmap(
+        tmp_file,
+        mode="w+",
+        dtype=np.dtype(dtype),
+        shape=(len(pairs), embedding_table.embedding_size),
+    )
+    for start in tqdm(
+        range(0, len(pairs), block_rows),
+        desc="Precomputing pair features",
+        unit="block",
+    ):
+        stop = min(start + block_rows, len(pairs))
+        diff = embedding_table.gather(pairs.query_rows[start:stop])
+        diff -= embedding_table.gather(pairs.target_rows[start:stop])
+        features[start:stop] = np.square(diff, out=diff)
+    features.flush()
+    del features
+    os.replace(tmp_file, output_file)
+
+
+def create_feature_loader(
+    parquet_file: str,
+    hdf_file: str,
+    param_name: str,
+    batch_size: int = 128,
+    shuffle: bool = False,
+    num_workers: int = 4,
+    feature_dtype: str = "float32",
+    embedding_table: Optional[EmbeddingTable] = None,
+    cache_pair_index: bool = False,
+) -> DataLoader:
+    """
+    Creates a DataLoader over precomputed squared-difference pair features.
+
+    The features are computed once per (parquet file, embedding file, param,
+    dtype) and stored next to the parquet file; they are recomputed when either
+    file changes. Batches are ``(features, values)`` tuples, which models consume
+    through ``forward_features`` (see LinearDistancePredictor).
+    """
+    if feature_dtype not in FEATURE_DTYPES:
+        raise ValueError(
+            f"Unknown feature_dtype '{feature_dtype}'. Choose from: {FEATURE_DTYPES}"
+        )
+    pairs = load_indexed_pairs(
+        parquet_file, hdf_file, param_name, use_cache=cache_pair_index
+    )
+
+    feature_file = _pair_feature_cache_path(
+        parquet_file, hdf_file, param_name, feature_dtype
+    )
+    fingerprint_file = feature_file.with_name(f"{feature_file.name}.fingerprint")
+    fingerprint = "|".join(
+        [_file_fingerprint(parquet_file), _file_fingerprint(hdf_file), param_name]
+    )
+    if (
+        feature_file.is_file()
+        and fingerprint_file.is_file()
+        and fingerprint_file.read_text() == fingerprint
+    ):
+        print(f"Using precomputed pair features from: {feature_file}")
+    else:
+        if embedding_table is None:
+            embedding_table = load_embedding_table(hdf_file, pairs.used_protein_ids())
+        print(f"Precomputing pair features to: {feature_file}")
+        precompute_pair_features(pairs, embedding_table, feature_file, feature_dtype)
+        fingerprint_file.write_text(fingerprint)
+
+    dataset = PairFeatureDataset(feature_file, pairs.values)
+    sampler = PairBatchSampler(len(dataset), batch_size, shuffle=shuffle)
+    loader = DataLoader(
+        dataset,
+        batch_size=None,  # Batches are built by the dataset itself
+        sampler=sampler,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        pin_memory=True,
+        prefetch_factor=4 if num_workers > 0 else None,
+    )
+    print(
+        f"Pair feature DataLoader initialized with {len(sampler)} batches of up to "
+        f"{batch_size} pairs ({num_workers} workers)."
+    )
+    return loader
+
+
 # ------------------------------------------------------ #
 
 
@@ -120,20 +975,124 @@ def create_single_loader(
     batch_size: int = 128,
     shuffle: bool = False,
     num_workers: int = 4,
-) -> DataLoader:
-    """Creates an optimized DataLoader for a single parquet dataset."""
-    data = _load_and_filter_data(parquet_file, hdf_file, param_name)
+    loader_mode: str = "h5",
+    embedding_table: Optional[EmbeddingTable] = None,
+    mmap_embeddings: bool = False,
+    cache_pair_index: bool = False,
+    device: Optional[torch.device] = None,
+    embedding_dtype: str = "float32",
+    locality_order: bool = False,
+    embedding_cache_size: int = 0,
+    subset_size: int = 0,
+    shuffle_seed: Optional[int] = None,
+) -> Union[DataLoader, DevicePairLoader]:
+    """
+    Creates an optimized DataLoader for a single parquet dataset.
+
+    With ``loader_mode="memory"`` the embeddings are served from an in-memory
+    EmbeddingTable. A table shared between several loaders (e.g. train and val) can
+    be passed via ``embedding_table``; otherwise only the proteins referenced by
+    this dataset are loaded. ``loader_mode="batched"`` additionally gathers whole
+    minibatches at once through BatchedPairDataset. ``loader_mode="device"``
+    returns a DevicePairLoader that keeps everything on ``device`` (default: the
+    device picked by ``get_device``) and ignores ``num_workers``.
+
+    With ``mmap_embeddings=True`` the table memory-maps a contiguous packed store
+    instead of loading it, so all worker processes share one page-cache copy.
+    Otherwise ``embedding_dtype`` selects the in-memory storage dtype of the table
+    (float16, bfloat16 or per-row-scaled int8); rows are upcast to float32 when a
+    batch is gathered.
+
+    Pairs are held as int32 row indices (see IndexedPairs); ``cache_pair_index``
+    stores them next to the parquet file for reuse by later runs.
+
+    For unshuffled loaders, ``locality_order=True`` serves pairs sorted by query
+    and target protein. The loader then has a ``row_order`` attribute; use
+    ``restore_pair_order`` to map its outputs back to the parquet row order. In
+    "h5" mode, ``embedding_cache_size`` > 0 keeps that many recently read
+    embeddings per worker in an LRU cache, so each embedding of a sorted block
+    is read only once.
+
+    ``subset_size`` > 0 keeps only a fixed random subset of that many pairs,
+    stratified on the target value (see ``IndexedPairs.stratified_subset``).
+
+    ``shuffle_seed`` makes the shuffled order of the "batched" loader depend only
+    on the seed and epoch (see PairBatchSampler), as needed for DDP training.
+    """
+    if loader_mode not in LOADER_MODES:
+        raise ValueError(
+            f"Unknown loader_mode '{loader_mode}'. Choose from: {LOADER_MODES}"
+        )
+    if mmap_embeddings and loader_mode == "h5":
+        raise ValueError(
+            "mmap_embeddings requires loader_mode 'memory', 'batched' or 'device'."
+        )
+    if embedding_dtype != "float32" and (loader_mode == "h5" or mmap_embeddings):
+        raise ValueError(
+            "embedding_dtype requires a loaded table (loader_mode 'memory', 'batched' or "
+            "'device' without mmap_embeddings)."
+        )
+
+    if locality_order and shuffle:
+        raise ValueError("locality_order is only supported for unshuffled loaders.")
+
+    pairs = load_indexed_pairs(
+        parquet_file, hdf_file, param_name, use_cache=cache_pair_index
+    )
+    if subset_size > 0:
+        pairs = pairs.take(pairs.stratified_subset(subset_size))
+        print(f"Using a stratified subset of {len(pairs)} pairs of {parquet_file}.")
+    row_order = None
+    if locality_order:
+        row_order = pairs.locality_order()
+        pairs = pairs.take(row_order)
+
+    if loader_mode != "h5" and embedding_table is None:
+        if mmap_embeddings:
+            embedding_table = open_memmap_table(hdf_file)
+        else:
+            embedding_table = load_embedding_table(
+                hdf_file, pairs.used_protein_ids(), dtype=embedding_dtype
+            )
+
+    if loader_mode == "device":
+        loader = DevicePairLoader(
+            pairs, embedding_table, batch_size, shuffle=shuffle, device=device
+        )
+        print(
+            f"Device-resident loader initialized on {loader.device} with {len(loader)} "
+            f"batches of up to {batch_size} pairs."
+        )
+        loader.row_order = row_order
+        return loader
+
+    if loader_mode == "batched":
+        loader = _create_batched_loader(
+            pairs,
+            param_name,
+            embedding_table,
+            batch_size,
+            shuffle,
+            num_workers,
+            shuffle_seed=shuffle_seed,
+        )
+        loader.row_order = row_order
+        return loader
 
     dataset = H5PyDataset(
-        data,
+        pairs,
         hdf_file,
         param_name,
+        embedding_table=embedding_table if loader_mode == "memory" else None,
+        embedding_cache_size=embedding_cache_size if loader_mode == "h5" else 0,
     )
 
     persistent_workers = num_workers > 0
 
-    # Calculate optimal prefetch factor
-    prefetch_factor = max(2, min(6, batch_size // 1024 + 2)) if num_workers > 0 else 2
+    # Calculate optimal prefetch factor (only valid when using worker processes)
+    prefetch_factor = (
+        max(2, min(6, batch_size // 1024 + 2)) if num_workers > 0 else None
+    )
 
     if persistent_workers:
         print(
@@ -151,5 +1110,171 @@ def create_single_loader(
         pin_memory=True,
         prefetch_factor=prefetch_factor,
     )
+    loader.row_order = row_order
     print("Optimized DataLoader initialized with pin_memory=True.")
     return loader
+
+
+def _create_batched_loader(
+    pairs: IndexedPairs,
+    param_name: str,
+    embedding_table: EmbeddingTable,
+    batch_size: int,
+    shuffle: bool,
+    num_workers: int,
+    shuffle_seed: Optional[int] = None,
+) -> DataLoader:
+    """Creates a DataLoader over BatchedPairDataset with automatic batching disabled."""
+    dataset = BatchedPairDataset(pairs, param_name, embedding_table)
+    sampler = PairBatchSampler(
+        len(dataset), batch_size, shuffle=shuffle, seed=shuffle_seed
+    )
+
+    loader = DataLoader(
+        dataset,
+        batch_size=None,  # Batches are built by the dataset itself
+        sampler=sampler,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        pin_memory=True,
+        prefetch_factor=4 if num_workers > 0 else None,
+    )
+    print(
+        f"Batched DataLoader initialized with {len(sampler)} batches of up to {batch_size} pairs "
+        f"({num_workers} workers)."
+    )
+    return loader
+
+
+class MultiTablePairDataset(Dataset):
+    """
+    Serves the same minibatch of pairs from K embedding tables at once.
+
+    Used to train one model per embedding file on a shared pair stream:
+    ``__getitem__`` receives an array of pair indices (see PairBatchSampler) and
+    returns ``(query_embs, target_embs, values)`` where ``query_embs`` and
+    ``target_embs`` are tuples with one ``(B, D_k)`` tensor per table.
+    """
+
+    def __init__(
+        self,
+        pairs: IndexedPairs,
+        param_name: str,
+        embedding_tables: List[EmbeddingTable],
+    ):
+        self.datasets = [
+            BatchedPairDataset(pairs, param_name, table) for table in embedding_tables
+        ]
+        self.param_values = pairs.values
+
+    def __len__(self):
+        return len(self.param_values)
+
+    def __getitem__(self, indices):
+        indices = np.asarray(indices)
+        batches = [dataset[indices] for dataset in self.datasets]
+        return (
+            tuple(query_emb for query_emb, _, _ in batches),
+            tuple(target_emb for _, target_emb, _ in batches),
+            torch.from_numpy(self.param_values[indices]),
+        )
+
+
+def common_pairs(
+    pairs: IndexedPairs, embedding_tables: List[EmbeddingTable]
+) -> IndexedPairs:
+    """Keeps only the pairs whose proteins are present in every embedding table."""
+    present = np.ones(len(pairs.protein_ids), dtype=bool)
+    for table in embedding_tables:
+        present &= np.isin(pairs.protein_ids, table.ids)
+    keep = present[pairs.query_rows] & present[pairs.target_rows]
+    if keep.all():
+        return pairs
+    print(
+        f"Dropping {int((~keep).sum())} pairs with proteins missing from at least one "
+        "embedding file."
+    )
+    return pairs.take(np.flatnonzero(keep))
+
+
+def create_multi_table_loader(
+    parquet_file: str,
+    hdf_files: List[str],
+    embedding_tables: List[EmbeddingTable],
+    param_name: str,
+    batch_size: int = 128,
+    shuffle: bool = False,
+    num_workers: int = 4,
+    cache_pair_index: bool = False,
+) -> DataLoader:
+    """
+    Creates one DataLoader that yields each minibatch from all ``embedding_tables``.
+
+    The pair table is loaded and indexed once (against the first embedding file)
+    and restricted to pairs covered by every table, so all K models see exactly the
+    same pairs in the same order.
+    """
+    pairs = load_indexed_pairs(
+        parquet_file, hdf_files[0], param_name, use_cache=cache_pair_index
+    )
+    pairs = common_pairs(pairs, embedding_tables)
+    dataset = MultiTablePairDataset(pairs, param_name, embedding_tables)
+    sampler = PairBatchSampler(len(dataset), batch_size, shuffle=shuffle)
+
+    loader = DataLoader(
+        dataset,
+        batch_size=None,  # Batches are built by the dataset itself
+        sampler=sampler,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        pin_memory=True,
+        prefetch_factor=4 if num_workers > 0 else None,
+    )
+    loader.row_order = None
+    print(
+        f"Multi-table DataLoader initialized with {len(sampler)} batches of up to "
+        f"{batch_size} pairs from {len(embedding_tables)} embedding files."
+    )
+    return loader
+
+
+def create_protein_batch_loader(
+    parquet_file: str,
+    hdf_file: str,
+    param_name: str,
+    embedding_table: EmbeddingTable,
+    proteins_per_batch: int,
+    num_workers: int = 4,
+    cache_pair_index: bool = False,
+) -> DataLoader:
+    """
+    Creates a shuffled training DataLoader over ProteinBatchDataset.
+
+    Batches of up to ``proteins_per_batch`` proteins are built from pair-graph
+    neighbourhoods (see ProteinNeighbourhoodSampler), so that one epoch covers
+    nearly every labelled pair; each step trains on all labelled pairs within the
+    batch's proteins.
+    """
+    pairs = load_indexed_pairs(
+        parquet_file, hdf_file, param_name, use_cache=cache_pair_index
+    )
+    dataset = ProteinBatchDataset(pairs, param_name, embedding_table)
+    sampler = ProteinNeighbourhoodSampler(
+        *dataset.pair_proteins(), dataset.num_proteins, proteins_per_batch
+    )
+
+    loader = DataLoader(
+        dataset,
+        batch_size=None,  # Batches are built by the dataset itself
+        sampler=sampler,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        pin_memory=True,
+        prefetch_factor=4 if num_workers > 0 else None,
+    )
+    loader.row_order = None
+    print(
+        f"Protein-batch DataLoader initialized with {len(sampler)} batches of up to "
+        f"{proteins_per_batch} proteins ({len(pairs)} pairs, {num_workers} workers)."
+    )
+    return loader
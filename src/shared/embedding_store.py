@@ -0,0 +1,483 @@
+"""
+Embedding storage utilities shared by training, evaluation and data preparation.
+
+Two HDF5 layouts are supported and detected automatically:
+
+- per-protein: one top-level dataset per protein ID (as written by the embedding
+  generation scripts).
+- packed: a single chunked ``embeddings`` dataset of shape ``(N, D)`` plus an
+  ``ids`` dataset with the protein ID of every row, marked by the file attribute
+  ``layout="packed"``. Opening a packed file and listing its IDs does not walk a
+  B-tree with one entry per protein, so it takes milliseconds even for Swiss-Prot.
+  Packed files written with ``contiguous=True`` (no chunking or compression) can
+  additionally be memory-mapped, see ``open_memmap_table``.
+
+Provides an in-memory embedding table (one contiguous matrix plus a protein ID ->
+row index) that replaces per-sample HDF5 dataset lookups. Tables can be held in
+reduced precision (float16, bfloat16 or per-row-scaled int8, see TABLE_DTYPES);
+rows are upcast to float32 when they are gathered.
+"""
+
+from pathlib import Path
+from typing import Iterable, Optional, Sequence, Union
+
+import h5py
+import numpy as np
+import polars as pl
+from tqdm import tqdm
+
+PACKED_LAYOUT = "packed"
+PACKED_EMBEDDINGS_KEY = "embeddings"
+PACKED_IDS_KEY = "ids"
+# Rows per HDF5 chunk (and per read/write block) of the packed layout
+DEFAULT_CHUNK_ROWS = 1024
+# Upper bound on the float32 bytes of one block read from a packed store
+READ_BLOCK_BYTES = 64 * 1024**2
+
+# In-memory storage dtypes of an EmbeddingTable. numpy has no bfloat16, so bfloat16
+# rows are stored as the upper 16 bits of their float32 values (uint16), and int8
+# rows are stored together with one float32 scale per row.
+TABLE_DTYPES = ["float32", "float16", "bfloat16", "int8"]
+_STORAGE_DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "bfloat16": np.uint16,
+    "int8": np.int8,
+}
+
+
+def encode_embeddings(embeddings: np.ndarray, dtype: str):
+    """
+    Converts float32 rows to a table storage dtype.
+
+    Returns:
+        Tuple of the encoded ``(N, D)`` matrix and the per-row float32 scales
+        (int8 only, otherwise None).
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dtype in ("float32", "float16"):
+        return embeddings.astype(_STORAGE_DTYPES[dtype], copy=False), None
+    if dtype == "bfloat16":
+        # Round to nearest even on the 16 dropped mantissa bits
+        bits = embeddings.view(np.uint32)
+        rounding = np.uint32(0x7FFF) + ((bits >> 16) & np.uint32(1))
+        return ((bits + rounding) >> 16).astype(np.uint16), None
+    if dtype == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(embeddings / scales[:, None])
+        return np.clip(quantized, -127, 127).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Unknown embedding dtype '{dtype}'. Choose from: {TABLE_DTYPES}")
+
+
+def decode_embeddings(
+    stored: np.ndarray, scales: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Upcasts rows of any table storage dtype to float32."""
+    if stored.dtype == np.uint16:
+        return (stored.astype(np.uint32) << 16).view(np.float32)
+    if stored.dtype == np.int8:
+        return stored.astype(np.float32) * scales[..., None]
+    return np.asarray(stored, dtype=np.float32)
+
+
+class EmbeddingTable:
+    """
+    A contiguous ``(N, D)`` embedding matrix with a protein ID -> row index.
+
+    The matrix may be stored in any of TABLE_DTYPES (int8 tables need ``scales``);
+    ``get`` and ``gather`` always return float32.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        ids: Sequence[str],
+        scales: Optional[np.ndarray] = None,
+    ):
+        if embeddings.ndim != 2:
+            raise ValueError(
+                f"Expected a 2D embedding matrix, got shape {embeddings.shape}"
+            )
+        if len(ids) != embeddings.shape[0]:
+            raise ValueError(
+                f"Number of IDs ({len(ids)}) does not match number of rows ({embeddings.shape[0]})"
+            )
+        if (embeddings.dtype == np.int8) != (scales is not None):
+            raise ValueError(
+                "Per-row scales are required for (and only for) int8 tables"
+            )
+        self.embeddings = embeddings
+        self.scales = scales
+        self._set_ids(ids)
+
+    def _set_ids(self, ids: Sequence[str]):
+        self.ids = np.asarray(ids, dtype=object)
+        self.index = {protein_id: row for row, protein_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def __contains__(self, protein_id: str) -> bool:
+        return protein_id in self.index
+
+    @property
+    def embedding_size(self) -> int:
+        return int(self.embeddings.shape[1])
+
+    @property
+    def storage_dtype(self) -> str:
+        """Name of the storage dtype of the matrix (one of TABLE_DTYPES)."""
+        if self.embeddings.dtype == np.uint16:
+            return "bfloat16"
+        return str(self.embeddings.dtype)
+
+    @property
+    def nbytes(self) -> int:
+        scales_nbytes = self.scales.nbytes if self.scales is not None else 0
+        return self.embeddings.nbytes + scales_nbytes
+
+    def row(self, protein_id: str) -> int:
+        """Returns the row index of a protein ID."""
+        return self.index[protein_id]
+
+    def get(self, protein_id: str) -> np.ndarray:
+        """Returns the float32 embedding vector of a protein ID."""
+        return self.gather(self.index[protein_id])
+
+    def rows(self, protein_ids: Sequence[str]) -> np.ndarray:
+        """Maps a sequence of protein IDs to their row indices."""
+        return np.fromiter(
+            (self.index[protein_id] for protein_id in protein_ids),
+            dtype=np.int64,
+            count=len(protein_ids),
+        )
+
+    def gather(self, rows: Union[int, np.ndarray]) -> np.ndarray:
+        """Returns the float32 embeddings of a row, or ``(len(rows), D)`` for a row array."""
+        scales = self.scales[rows] if self.scales is not None else None
+        return decode_embeddings(self.embeddings[rows], scales)
+
+    def astype(self, dtype: str) -> "EmbeddingTable":
+        """Returns a copy of the table stored in ``dtype`` (see TABLE_DTYPES)."""
+        embeddings, scales = encode_embeddings(self.gather(np.arange(len(self))), dtype)
+        return EmbeddingTable(embeddings, self.ids, scales)
+
+
+class MemmapEmbeddingTable(EmbeddingTable):
+    """
+    EmbeddingTable backed by a read-only ``numpy.memmap`` of a contiguous packed store.
+
+    The matrix is mapped lazily in every process and the mapping is dropped when the
+    table is pickled, so DataLoader workers map the file themselves instead of
+    copying the matrix or opening their own h5py handles. All processes then share
+    a single page-cache copy of the embeddings.
+    """
+
+    def __init__(
+        self,
+        file_path: Union[str, Path],
+        offset: int,
+        shape: Sequence[int],
+        dtype: np.dtype,
+        ids: Sequence[str],
+    ):
+        if len(ids) != shape[0]:
+            raise ValueError(
+                f"Number of IDs ({len(ids)}) does not match number of rows ({shape[0]})"
+            )
+        self.file_path = str(file_path)
+        self.offset = offset
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.scales = None
+        self._embeddings = None
+        self._set_ids(ids)
+
+    @property
+    def embeddings(self) -> np.memmap:
+        if self._embeddings is None:
+            self._embeddings = np.memmap(
+                self.file_path,
+                mode="r",
+                dtype=self.dtype,
+                offset=self.offset,
+                shape=self.shape,
+            )
+        return self._embeddings
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_embeddings"] = None  # Re-mapped lazily in the receiving process
+        return state
+
+
+def is_packed_store(hdf: h5py.File) -> bool:
+    """Returns True if an open HDF5 file uses the packed layout."""
+    return hdf.attrs.get("layout") == PACKED_LAYOUT
+
+
+def read_embedding_ids(hdf_file: Union[str, Path]) -> np.ndarray:
+    """Returns the protein IDs stored in an embedding file, in row/key order."""
+    with h5py.File(hdf_file, "r") as hdf:
+        if is_packed_store(hdf):
+            return hdf[PACKED_IDS_KEY].asstr()[()]
+        return np.asarray(list(hdf.keys()), dtype=object)
+
+
+def read_embedding_size(hdf_file: Union[str, Path]) -> int:
+    """Returns the (flattened) embedding size of an embedding file."""
+    with h5py.File(hdf_file, "r") as hdf:
+        if is_packed_store(hdf):
+            return int(hdf[PACKED_EMBEDDINGS_KEY].shape[1])
+        first_key = next(iter(hdf))
+        return int(np.prod(hdf[first_key].shape))
+
+
+def write_packed_embeddings(
+    output_file: Union[str, Path],
+    ids: Sequence[str],
+    embeddings: np.ndarray,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    contiguous: bool = False,
+):
+    """Writes an ``(N, D)`` embedding matrix and its protein IDs as a packed store."""
+    with h5py.File(output_file, "w") as hdf:
+        dataset = create_packed_datasets(
+            hdf, ids, embeddings.shape[1], embeddings.dtype, chunk_rows, contiguous
+        )
+        dataset[...] = embeddings
+
+
+def convert_to_packed(
+    input_file: Union[str, Path],
+    output_file: Union[str, Path],
+    dtype: Optional[np.dtype] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    contiguous: bool = False,
+):
+    """
+    Converts a one-dataset-per-protein HDF5 file into the packed layout.
+
+    Proteins are copied block by block, so the full matrix is never held in memory.
+
+    Args:
+        input_file: Per-protein HDF5 embedding file.
+        output_file: Path of the packed file to write.
+        dtype: Storage dtype of the packed matrix (default: dtype of the input).
+        chunk_rows: Number of rows per HDF5 chunk (and per copied block).
+        contiguous: Store the matrix unchunked so it can be memory-mapped.
+    """
+    with h5py.File(input_file, "r") as hdf_in:
+        if is_packed_store(hdf_in):
+            raise ValueError(f"{input_file} is already a packed embedding store")
+        ids = list(hdf_in.keys())
+        if not ids:
+            raise ValueError(f"No embeddings found in {input_file}")
+        first = hdf_in[ids[0]]
+        embedding_size = int(np.prod(first.shape))
+        dtype = np.dtype(dtype or first.dtype)
+
+        with h5py.File(output_file, "w") as hdf_out:
+            dataset = create_packed_datasets(
+                hdf_out, ids, embedding_size, dtype, chunk_rows, contiguous
+            )
+            block = np.empty((chunk_rows, embedding_size), dtype=dtype)
+            with tqdm(
+                total=len(ids), desc="Packing embeddings", unit="protein"
+            ) as pbar:
+                for start in range(0, len(ids), chunk_rows):
+                    block_ids = ids[start : start + chunk_rows]
+                    for offset, protein_id in enumerate(block_ids):
+                        block[offset] = hdf_in[protein_id][()].reshape(-1)
+                    dataset[start : start + len(block_ids)] = block[: len(block_ids)]
+                    pbar.update(len(block_ids))
+
+    print(
+        f"Packed {len(ids)} embeddings of size {embedding_size} ({dtype}) into {output_file}"
+    )
+
+
+def create_packed_datasets(
+    hdf: h5py.File,
+    ids: Sequence[str],
+    embedding_size: int,
+    dtype: np.dtype,
+    chunk_rows: int,
+    contiguous: bool = False,
+) -> h5py.Dataset:
+    """
+    Creates the ID and (empty) embedding datasets of a packed store.
+
+    With ``contiguous=True`` the matrix is stored unchunked and uncompressed, which
+    allows memory-mapping it (see ``open_memmap_table``).
+    """
+    if len(set(ids)) != len(ids):
+        raise ValueError("Protein IDs of a packed store must be unique")
+    hdf.attrs["layout"] = PACKED_LAYOUT
+    hdf.create_dataset(
+        PACKED_IDS_KEY,
+        data=np.asarray(ids, dtype=object),
+        dtype=h5py.string_dtype(),
+    )
+    return hdf.create_dataset(
+        PACKED_EMBEDDINGS_KEY,
+        shape=(len(ids), embedding_size),
+        dtype=dtype,
+        chunks=(
+            None if contiguous else (max(1, min(chunk_rows, len(ids))), embedding_size)
+        ),
+    )
+
+
+def load_embedding_table(
+    hdf_file: str,
+    protein_ids: Optional[Iterable[str]] = None,
+    dtype: str = "float32",
+) -> EmbeddingTable:
+    """
+    Loads embeddings from an HDF5 embedding file (per-protein or packed layout)
+    into a single matrix.
+
+    Args:
+        hdf_file: Path to the HDF5 embedding file.
+        protein_ids: Optional subset of protein IDs to load. IDs missing from the
+            file are ignored. If not given, all proteins in the file are loaded.
+        dtype: In-memory storage dtype (one of TABLE_DTYPES). Rows are converted
+            block by block, so the float32 matrix is never materialized.
+
+    Returns:
+        EmbeddingTable with one row per loaded protein.
+    """
+    if dtype not in TABLE_DTYPES:
+        raise ValueError(
+            f"Unknown embedding dtype '{dtype}'. Choose from: {TABLE_DTYPES}"
+        )
+    with h5py.File(hdf_file, "r") as hdf:
+        if is_packed_store(hdf):
+            return _load_packed_table(hdf, hdf_file, protein_ids, dtype)
+
+        if protein_ids is None:
+            ids = list(hdf.keys())
+        else:
+            wanted = set(protein_ids)
+            ids = [key for key in hdf.keys() if key in wanted]
+
+        if not ids:
+            raise ValueError(f"No matching protein embeddings found in {hdf_file}")
+
+        embedding_size = int(np.prod(hdf[ids[0]].shape))
+        table = _TableBuilder(len(ids), embedding_size, dtype)
+        block = np.empty((DEFAULT_CHUNK_ROWS, embedding_size), dtype=np.float32)
+        with tqdm(
+            total=len(ids), desc="Loading embeddings", unit="protein", mininterval=5
+        ) as pbar:
+            for start in range(0, len(ids), DEFAULT_CHUNK_ROWS):
+                block_ids = ids[start : start + DEFAULT_CHUNK_ROWS]
+                for offset, protein_id in enumerate(block_ids):
+                    block[offset] = hdf[protein_id][()].reshape(-1)
+                table.add(block[: len(block_ids)])
+                pbar.update(len(block_ids))
+
+    embedding_table = table.build(ids)
+    print(
+        f"Loaded {len(ids)} embeddings of size {embedding_size} into memory "
+        f"({dtype}, {embedding_table.nbytes / 1024**2:.1f} MiB)"
+    )
+    return embedding_table
+
+
+def open_memmap_table(hdf_file: Union[str, Path]) -> MemmapEmbeddingTable:
+    """
+    Memory-maps the embedding matrix of a contiguous packed store without reading it.
+
+    Raises:
+        ValueError: If the file is not a packed store or its matrix is chunked or
+            compressed (convert it with ``pack_embeddings.py --contiguous``).
+    """
+    with h5py.File(hdf_file, "r") as hdf:
+        if not is_packed_store(hdf):
+            raise ValueError(
+                f"{hdf_file} is not a packed embedding store and cannot be memory-mapped. "
+                "Convert it with pack_embeddings.py --contiguous."
+            )
+        dataset = hdf[PACKED_EMBEDDINGS_KEY]
+        offset = dataset.id.get_offset()
+        if dataset.chunks is not None or dataset.compression or offset is None:
+            raise ValueError(
+                f"The embedding matrix of {hdf_file} is chunked or compressed and cannot be "
+                "memory-mapped. Convert it with pack_embeddings.py --contiguous."
+            )
+        ids = hdf[PACKED_IDS_KEY].asstr()[()]
+        table = MemmapEmbeddingTable(
+            hdf_file, offset, dataset.shape, dataset.dtype, ids
+        )
+
+    print(
+        f"Memory-mapped {table.shape[0]} embeddings of size {table.shape[1]} "
+        f"({table.dtype}) from {hdf_file}"
+    )
+    return table
+
+
+class _TableBuilder:
+    """Fills the matrix of an EmbeddingTable block by block in its storage dtype."""
+
+    def __init__(self, num_rows: int, embedding_size: int, dtype: str):
+        self.dtype = dtype
+        self.embeddings = np.empty(
+            (num_rows, embedding_size), dtype=_STORAGE_DTYPES[dtype]
+        )
+        self.scales = np.empty(num_rows, dtype=np.float32) if dtype == "int8" else None
+        self.filled = 0
+
+    def add(self, block: np.ndarray):
+        encoded, scales = encode_embeddings(block, self.dtype)
+        self.embeddings[self.filled : self.filled + len(block)] = encoded
+        if scales is not None:
+            self.scales[self.filled : self.filled + len(block)] = scales
+        self.filled += len(block)
+
+    def build(self, ids: Sequence[str]) -> EmbeddingTable:
+        return EmbeddingTable(self.embeddings, ids, self.scales)
+
+
+def _load_packed_table(
+    hdf: h5py.File,
+    hdf_file: str,
+    protein_ids: Optional[Iterable[str]],
+    dtype: str = "float32",
+) -> EmbeddingTable:
+    """Loads (a subset of) a packed store block by block into a matrix of ``dtype``."""
+    ids = hdf[PACKED_IDS_KEY].asstr()[()]
+    dataset = hdf[PACKED_EMBEDDINGS_KEY]
+
+    if protein_ids is None:
+        rows = np.arange(len(ids))
+    else:
+        wanted = pl.Series(list(protein_ids), dtype=pl.Utf8)
+        rows = np.flatnonzero(
+            pl.Series(ids, dtype=pl.Utf8).is_in(wanted.implode()).to_numpy()
+        )
+    if len(rows) == 0:
+        raise ValueError(f"No matching protein embeddings found in {hdf_file}")
+
+    table = _TableBuilder(len(rows), dataset.shape[1], dtype)
+    # Read whole chunks, as many as fit into READ_BLOCK_BYTES of float32
+    chunk_rows = dataset.chunks[0] if dataset.chunks else DEFAULT_CHUNK_ROWS
+    chunk_bytes = chunk_rows * dataset.shape[1] * np.dtype(np.float32).itemsize
+    block_rows = max(1, READ_BLOCK_BYTES // chunk_bytes) * chunk_rows
+    for start in range(0, dataset.shape[0], block_rows):
+        end = start + block_rows
+        block_selection = rows[(rows >= start) & (rows < end)]
+        if len(block_selection) == 0:
+            continue
+        block = dataset[start:end]
+        table.add(block[block_selection - start])
+
+    embedding_table = table.build(ids[rows])
+    print(
+        f"Loaded {len(rows)} packed embeddings of size {dataset.shape[1]} into memory "
+        f"({dtype}, {embedding_table.nbytes / 1024**2:.1f} MiB)"
+    )
+    return embedding_table
@@ -211,6 +211,23 @@ class ExperimentManager:
         last_ckpt = experiment_dir / "checkpoints" / "last.ckpt"
         return last_ckpt if last_ckpt.exists() else None
 
+    @staticmethod
+    def predictions_targets_path(
+        experiment_dir: Path,
+        test_set_name: str,
+        checkpoint_name: str,
+        embedding_dtype: str = "float32",
+    ) -> Path:
+        """Get the path of the cached test predictions and targets of a checkpoint."""
+        base_filename = f"test_{test_set_name}_{checkpoint_name}"
+        if embedding_dtype != "float32":
+            base_filename = f"{base_filename}_{embedding_dtype}"
+        return (
+            Path(experiment_dir)
+            / "evaluation_results"
+            / f"{base_filename}_predictions_targets.npz"
+        )
+
     @staticmethod
     def from_hparams(hparams: dict, models_base_dir: Path) -> "ExperimentManager":
         """Create ExperimentManager from hyperparameters dictionary."""
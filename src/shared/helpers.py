@@ -12,3 +12,14 @@ def get_device():
         device = torch.device("cpu")
         print("Using CPU")
     return device
+
+
+def bf16_supported() -> bool:
+    """Whether the training device (CUDA, else CPU) has native bfloat16 support."""
+    if torch.cuda.is_available():
+        return torch.cuda.is_bf16_supported()
+    try:
+        # AVX512-BF16 / AMX (or AVX512 fallback kernels) through oneDNN
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
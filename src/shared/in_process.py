@@ -0,0 +1,94 @@
+"""
+Runs train.py and evaluate.py in an already running interpreter.
+
+Starting each run with ``uv run python`` pays for a new interpreter, environment
+resolution and the imports of torch, lightning and the project before any work
+starts. ``run_in_process`` instead parses the script arguments with the
+script's ``parse_args`` and calls its ``main`` directly, so runners can execute
+many runs in one process (or in a pool of long-lived worker processes, see
+``init_worker``). Every run starts from the same RNG state with empty dataset
+memos, gets its own output redirection and has its wandb run, if any, finished
+afterwards.
+"""
+
+import contextlib
+import gc
+import importlib
+import os
+import random
+import sys
+import traceback
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import torch
+
+from src.shared.datasets import clear_memos
+
+TRAIN_SCRIPT = Path("src") / "training" / "train.py"
+EVALUATE_SCRIPT = Path("src") / "evaluation" / "evaluate.py"
+SCRIPT_MODULES = {
+    TRAIN_SCRIPT: "src.training.train",
+    EVALUATE_SCRIPT: "src.evaluation.evaluate",
+}
+
+
+def init_worker(threads: Optional[int] = None):
+    """Initializes a long-lived worker process: thread budget and warm imports."""
+    if threads:
+        for variable in ["OMP_NUM_THREADS", "MKL_NUM_THREADS"]:
+            os.environ[variable] = str(threads)
+        torch.set_num_threads(threads)
+    for module_name in SCRIPT_MODULES.values():
+        importlib.import_module(module_name)
+
+
+@contextlib.contextmanager
+def _redirect_output(log_file: Optional[Path]):
+    if log_file is None:
+        yield
+        return
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "a") as f:
+        with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+            yield
+
+
+def _reset_run_state(seed: int = 0):
+    """Resets global state that one run could leak into the next."""
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    wandb = sys.modules.get("wandb")
+    if wandb is not None and wandb.run is not None:
+        wandb.finish()
+    clear_memos()
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def run_in_process(
+    script: Path, script_args: List[str], log_file: Optional[Path] = None
+) -> bool:
+    """
+    Runs train.py or evaluate.py with ``script_args`` in this process.
+
+    Returns whether the run succeeded: its ``main`` neither raised nor returned
+    False. Output goes to ``log_file`` (appended) when given.
+    """
+    module = importlib.import_module(SCRIPT_MODULES[Path(script)])
+    _reset_run_state()
+    with _redirect_output(log_file):
+        try:
+            result = module.main(module.parse_args(script_args))
+            return result is not False
+        except SystemExit as e:
+            # argparse errors and explicit exits
+            return e.code in (0, None)
+        except Exception:
+            traceback.print_exc()
+            return False
+        finally:
+            _reset_run_state()
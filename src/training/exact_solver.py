@@ -0,0 +1,158 @@
+"""
+Closed-form least-squares training for the linear model types.
+
+``LinearRegressionPredictor`` and ``LinearDistancePredictor`` are a single linear
+layer on fixed pair features, so minimizing their MSE is an ordinary (optionally
+ridge-regularized) least-squares problem. Instead of running Adam for many epochs,
+XᵀX and Xᵀy are accumulated in one streaming pass over the train loader and the
+normal equations are solved directly. The ridge λ is chosen on the validation set,
+whose sufficient statistics are accumulated the same way, and the solution is
+written as a regular Lightning checkpoint that ``evaluate.py`` loads like any other.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Sequence, Tuple
+
+import pytorch_lightning as pl
+import torch
+from tqdm import tqdm
+
+EXACT_MODEL_TYPES = ["linear", "linear_distance"]
+
+
+@dataclass
+class NormalEquations:
+    """Sufficient statistics of a least-squares problem with a bias column."""
+
+    xtx: torch.Tensor
+    xty: torch.Tensor
+    yty: float
+    num_samples: int
+
+
+def accumulate_normal_equations(
+    model: pl.LightningModule, loader: Iterable, desc: str = "Accumulating XᵀX"
+) -> NormalEquations:
+    """Streams a loader once and accumulates XᵀX, Xᵀy and yᵀy in float64."""
+    xtx = xty = None
+    yty = 0.0
+    num_samples = 0
+    with torch.no_grad():
+        for batch in tqdm(loader, desc=desc, unit="batch"):
+            if len(batch) == 2:
+                features, targets = batch  # Precomputed pair features
+            else:
+                query_emb, target_emb, targets = batch
+                features = model.pair_features(query_emb, target_emb)
+            features = features.to(torch.float64)
+            targets = torch.as_tensor(targets, device=features.device).to(torch.float64)
+            # Append a constant column for the bias term
+            design = torch.cat([features, features.new_ones(len(features), 1)], dim=1)
+            if xtx is None:
+                xtx = design.new_zeros(design.shape[1], design.shape[1])
+                xty = design.new_zeros(design.shape[1])
+            xtx += design.T @ design
+            xty += design.T @ targets
+            yty += float(targets @ targets)
+            num_samples += len(targets)
+
+    if num_samples == 0:
+        raise ValueError("Cannot solve least squares on an empty loader.")
+    return NormalEquations(xtx.cpu(), xty.cpu(), yty, num_samples)
+
+
+def solve_ridge(equations: NormalEquations, ridge_lambda: float) -> torch.Tensor:
+    """Solves (XᵀX + λI)w = Xᵀy without penalizing the bias (the last weight)."""
+    penalty = torch.full_like(equations.xty, ridge_lambda)
+    penalty[-1] = 0.0
+    lhs = equations.xtx + torch.diag(penalty) * equations.num_samples
+    try:
+        return torch.linalg.solve(lhs, equations.xty)
+    except RuntimeError:
+        # Singular system (e.g. λ=0 with collinear features): minimum-norm solution
+        print(f"Normal equations are singular for λ={ridge_lambda}, using lstsq.")
+        return torch.linalg.lstsq(
+            lhs, equations.xty.unsqueeze(1), driver="gelsd"
+        ).solution.squeeze(1)
+
+
+def mean_squared_error(equations: NormalEquations, weights: torch.Tensor) -> float:
+    """MSE of ``weights`` on the data summarized by ``equations``."""
+    squared_error = (
+        weights @ equations.xtx @ weights - 2 * weights @ equations.xty + equations.yty
+    )
+    return float(squared_error) / equations.num_samples
+
+
+def fit_exact(
+    model: pl.LightningModule,
+    train_loader: Iterable,
+    val_loader: Iterable,
+    ridge_lambdas: Sequence[float] = (0.0,),
+) -> Tuple[float, float, Dict[float, float]]:
+    """
+    Fits the linear layer of ``model`` in closed form and sets its parameters.
+
+    The penalty is scaled by the number of training pairs, so λ is comparable to a
+    weight decay on the mean squared error.
+
+    Returns:
+        Tuple of the selected λ, its validation MSE, and the validation MSE of every λ.
+    """
+    train_equations = accumulate_normal_equations(
+        model, train_loader, desc="Accumulating train XᵀX"
+    )
+    val_equations = accumulate_normal_equations(
+        model, val_loader, desc="Accumulating val XᵀX"
+    )
+
+    val_losses = {}
+    best_lambda, best_weights = None, None
+    for ridge_lambda in ridge_lambdas:
+        weights = solve_ridge(train_equations, ridge_lambda)
+        val_losses[ridge_lambda] = mean_squared_error(val_equations, weights)
+        print(
+            f"λ={ridge_lambda:g}: train MSE {mean_squared_error(train_equations, weights):.6f}, "
+            f"val MSE {val_losses[ridge_lambda]:.6f}"
+        )
+        if best_lambda is None or val_losses[ridge_lambda] < val_losses[best_lambda]:
+            best_lambda, best_weights = ridge_lambda, weights
+
+    with torch.no_grad():
+        linear = model.linear
+        linear.weight.copy_(best_weights[:-1].reshape_as(linear.weight))
+        linear.bias.copy_(best_weights[-1:])
+    return best_lambda, val_losses[best_lambda], val_losses
+
+
+def save_checkpoint(
+    model: pl.LightningModule,
+    checkpoints_dir: Path,
+    val_loss: float,
+    epoch: int = 0,
+    step: int = 0,
+) -> Path:
+    """
+    Writes ``model`` as a Lightning checkpoint named like the ModelCheckpoint files
+    of gradient-based training, so ``load_from_checkpoint`` and
+    ``ExperimentManager.find_best_checkpoint`` work unchanged.
+    """
+    checkpoints_dir.mkdir(parents=True, exist_ok=True)
+    for stale in checkpoints_dir.glob("best-*.ckpt"):
+        stale.unlink()
+    checkpoint_path = (
+        checkpoints_dir
+        / f"best-epoch={epoch:02d}-step={step}-val_loss={val_loss:.3f}.ckpt"
+    )
+    torch.save(
+        {
+            "epoch": epoch,
+            "global_step": step,
+            "pytorch-lightning_version": pl.__version__,
+            "state_dict": model.state_dict(),
+            "hyper_parameters": dict(model.hparams),
+        },
+        checkpoint_path,
+    )
+    return checkpoint_path
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 import torch
 import torch.nn as nn
 import pytorch_lightning as pl
@@ -6,36 +8,147 @@ import pytorch_lightning as pl
 # Base class for common steps
 class BasePredictor(pl.LightningModule):
     criterion = nn.MSELoss()
+    # Appended to validation metric names; "_subset" while validating on a
+    # validation subset (see src/training/validation_subset.py)
+    val_metric_suffix = ""
 
     def forward(self, emb1, emb2):
         # This must be implemented by subclasses
         raise NotImplementedError
 
     def training_step(self, batch, batch_idx):
+        if isinstance(batch, dict) and len(batch["values"]) == 0:
+            return None  # Protein batch without labelled pairs: skip the step
         loss, preds, targets = self._common_step(batch, batch_idx)
         self.log("train_loss", loss, on_step=False, on_epoch=True, prog_bar=True)
         return loss
 
     def validation_step(self, batch, batch_idx):
         loss, preds, targets = self._common_step(batch, batch_idx)
-        self.log("val_loss", loss, on_step=False, on_epoch=True, prog_bar=True)
+        suffix = self.val_metric_suffix
+        # sync_dist averages over DDP processes (no-op in a single process)
+        self.log(
+            f"val_loss{suffix}",
+            loss,
+            on_step=False,
+            on_epoch=True,
+            prog_bar=True,
+            sync_dist=True,
+        )
+        # Per-target (normalised) losses of multi-target models
+        target_names = self.hparams.get("target_names") or []
+        target_losses = self.target_losses(preds, targets) if target_names else []
+        for name, target_loss in zip(target_names, target_losses):
+            if not torch.isnan(target_loss):
+                self.log(
+                    f"val_loss_{name}{suffix}",
+                    target_loss,
+                    on_step=False,
+                    on_epoch=True,
+                    sync_dist=True,
+                )
         return loss
 
+    @staticmethod
+    def masked_mse(predictions, targets):
+        # MSE over the non-NaN targets (missing parameters of multi-target pairs)
+        mask = ~torch.isnan(targets)
+        return (predictions[mask] - targets[mask]).pow(2).mean()
+
+    def _register_target_scaling(self, target_means, target_stds):
+        # Multi-target models learn every target standardised by its train-set mean
+        # and standard deviation (hfsp spans ~0-100, fident and alntmscore 0-1), so
+        # that all targets weigh the same in the loss; outputs are in target units
+        scaling = target_means is not None and target_stds is not None
+        for name, values in [
+            ("target_mean", target_means),
+            ("target_std", target_stds),
+        ]:
+            self.register_buffer(
+                name,
+                torch.tensor(values, dtype=torch.float32) if scaling else None,
+                persistent=False,
+            )
+
+    def target_losses(self, predictions, targets):
+        """Per-target MSEs of a multi-target model in standardised units (NaN without pairs)."""
+        if self.target_mean is not None:
+            predictions = (predictions - self.target_mean) / self.target_std
+            targets = (targets - self.target_mean) / self.target_std
+        return torch.stack(
+            [
+                self.masked_mse(predictions[:, column], targets[:, column])
+                for column in range(targets.shape[1])
+            ]
+        )
+
+    def _loss(self, predictions, targets):
+        if targets.ndim > 1:
+            # Mean of the per-target losses: each target weighs the same, however
+            # many pairs have a value for it
+            losses = self.target_losses(predictions, targets)
+            return losses[~torch.isnan(losses)].mean()
+        return self.criterion(predictions, targets)
+
+    def _output(self, output):
+        # Single-target models return (B,), multi-target models (B, output_size)
+        if output.shape[-1] == 1:
+            return output.squeeze(-1)
+        if self.target_mean is not None:
+            output = output * self.target_std + self.target_mean
+        return output
+
+    def forward_features(self, features):
+        # Only models trainable on precomputed pair features implement this
+        raise NotImplementedError
+
+    def forward_indexed(self, embeddings, query_index, target_index):
+        # Pairs given as positions into one matrix of protein embeddings
+        # (see ProteinBatchDataset); models that encode proteins override this
+        return self(embeddings[query_index], embeddings[target_index])
+
     def predict_step(self, batch, batch_idx, dataloader_idx=0):
         # Assumes batch structure (query_emb, target_emb, optional_target)
+        # or (pair_features, optional_target) for precomputed features
         # Subclasses might override if batch structure differs during prediction
+        if len(batch) == 2:
+            return self.forward_features(batch[0])
         query_emb, target_emb, _ = batch
         return self(query_emb, target_emb)
 
     def _common_step(self, batch, batch_idx):
+        if isinstance(batch, dict):
+            # Protein minibatch with all labelled pairs among its proteins
+            predictions = self.forward_indexed(
+                batch["embeddings"], batch["query_index"], batch["target_index"]
+            )
+            loss = self._loss(predictions, batch["values"])
+            return loss, predictions, batch["values"]
+        if len(batch) == 2:
+            # Precomputed pair features (see create_feature_loader)
+            features, param_value = batch
+            predictions = self.forward_features(features)
+            loss = self._loss(predictions, param_value)
+            return loss, predictions, param_value
         query_emb, target_emb, param_value = batch
         predictions = self(query_emb, target_emb)  # Calls the subclass's forward method
-        loss = self.criterion(predictions, param_value)
+        loss = self._loss(predictions, param_value)
         return loss, predictions, param_value
 
     def configure_optimizers(self):
         # Access learning_rate from hparams saved by subclasses
-        return torch.optim.Adam(self.parameters(), lr=self.hparams.learning_rate)
+        optimizer = torch.optim.Adam(self.parameters(), lr=self.hparams.learning_rate)
+        warmup_steps = self.hparams.get("warmup_steps", 0)
+        if not warmup_steps:
+            return optimizer
+        # Linear learning rate warmup over the first optimizer steps (large batches)
+        scheduler = torch.optim.lr_scheduler.LambdaLR(
+            optimizer, lambda step: min(1.0, (step + 1) / warmup_steps)
+        )
+        return {
+            "optimizer": optimizer,
+            "lr_scheduler": {"scheduler": scheduler, "interval": "step"},
+        }
 
 
 class FNNPredictor(BasePredictor):  # Inherit from BasePredictor
@@ -44,9 +157,15 @@ class FNNPredictor(BasePredictor):  # Inherit from BasePredictor
         embedding_size: int,
         hidden_size: int = 64,
         learning_rate: float = 0.001,
+        output_size: int = 1,
+        target_names: Optional[List[str]] = None,
+        warmup_steps: int = 0,
+        target_means: Optional[List[float]] = None,
+        target_stds: Optional[List[float]] = None,
     ):
         super().__init__()
-        self.save_hyperparameters()  # Saves embedding_size, hidden_size, learning_rate
+        self.save_hyperparameters()  # Saves embedding_size, hidden_size, learning_rate, ...
+        self._register_target_scaling(target_means, target_stds)
 
         # Model layers (specific to FNN)
         self.individual_layers = nn.Sequential(
@@ -58,47 +177,99 @@ class FNNPredictor(BasePredictor):  # Inherit from BasePredictor
             nn.ReLU(),
             nn.Linear(hidden_size, hidden_size // 2),
             nn.ReLU(),
-            nn.Linear(hidden_size // 2, 1),
+            nn.Linear(hidden_size // 2, output_size),
         )
         # Criterion is inherited from BasePredictor
 
     def forward(self, emb1, emb2):
-        proc1 = self.individual_layers(emb1)
-        proc2 = self.individual_layers(emb2)
-        combined = torch.cat([proc1, proc2], dim=1)
-        return self.combined_layers(combined).squeeze()
+        return self.score(self.encode(emb1), self.encode(emb2))
+
+    def encode(self, emb):
+        # Per-protein projection, shared by both sides of a pair (siamese)
+        return self.individual_layers(emb)
+
+    def forward_indexed(self, embeddings, query_index, target_index):
+        # Each protein of the batch is encoded once, however many pairs it is in
+        hidden = self.encode(embeddings)
+        return self.score(hidden[query_index], hidden[target_index])
+
+    def score(self, hidden1, hidden2):
+        # Pair prediction from encoded proteins; lets inference encode each
+        # protein once and reuse its hidden vector across all of its pairs
+        combined = torch.cat([hidden1, hidden2], dim=1)
+        return self._output(self.combined_layers(combined))
 
     # training_step, validation_step, predict_step, _common_step, configure_optimizers are inherited
 
 
 class LinearRegressionPredictor(BasePredictor):  # Inherit from BasePredictor
-    def __init__(self, embedding_size: int, learning_rate: float = 0.001):
+    def __init__(
+        self,
+        embedding_size: int,
+        learning_rate: float = 0.001,
+        output_size: int = 1,
+        target_names: Optional[List[str]] = None,
+        warmup_steps: int = 0,
+        target_means: Optional[List[float]] = None,
+        target_stds: Optional[List[float]] = None,
+    ):
         super().__init__()
         self.save_hyperparameters()
+        self._register_target_scaling(target_means, target_stds)
 
         # Simple linear layer operating on the concatenated embeddings
-        self.linear = nn.Linear(embedding_size * 2, 1)
+        self.linear = nn.Linear(embedding_size * 2, output_size)
         # Criterion is inherited
 
     def forward(self, emb1, emb2):
-        combined = torch.cat([emb1, emb2], dim=1)
-        return self.linear(combined).squeeze()
+        return self.forward_features(self.pair_features(emb1, emb2))
+
+    def pair_features(self, emb1, emb2):
+        # Concatenated embeddings (the design matrix of the exact solver)
+        return torch.cat([emb1, emb2], dim=1)
+
+    def forward_features(self, combined):
+        return self._output(self.linear(combined))
 
     # training_step, validation_step, predict_step, _common_step, configure_optimizers are inherited
 
 
 class LinearDistancePredictor(BasePredictor):  # Inherit from BasePredictor
-    def __init__(self, embedding_size: int, learning_rate: float = 0.001):
+    def __init__(
+        self,
+        embedding_size: int,
+        learning_rate: float = 0.001,
+        output_size: int = 1,
+        target_names: Optional[List[str]] = None,
+        warmup_steps: int = 0,
+        target_means: Optional[List[float]] = None,
+        target_stds: Optional[List[float]] = None,
+    ):
         super().__init__()
         self.save_hyperparameters()
+        self._register_target_scaling(target_means, target_stds)
 
         # Linear layer operating on the element-wise squared difference
-        self.linear = nn.Linear(embedding_size, 1)
+        self.linear = nn.Linear(embedding_size, output_size)
         # Criterion is inherited
 
     def forward(self, emb1, emb2):
+        return self.forward_features(self.pair_features(emb1, emb2))
+
+    def pair_features(self, emb1, emb2):
         # Calculate element-wise squared difference
-        diff_sq = (emb1 - emb2).pow(2)
-        return self.linear(diff_sq).squeeze()
+        return (emb1 - emb2).pow(2)
+
+    def forward_features(self, diff_sq):
+        # Operates on precomputed squared differences (see create_feature_loader)
+        return self._output(self.linear(diff_sq))
 
     # training_step, validation_step, predict_step, _common_step, configure_optimizers are inherited
+
+
+# LightningModule classes of the trainable model types
+MODEL_CLASSES = {
+    "fnn": FNNPredictor,
+    "linear": LinearRegressionPredictor,
+    "linear_distance": LinearDistancePredictor,
+}
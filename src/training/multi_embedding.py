@@ -0,0 +1,136 @@
+"""
+Trains one independent model per embedding file in a single process.
+
+Sweeping several embeddings with ``run_experiments.py`` normally starts one
+``train.py`` process per embedding file, each of which reparses the pair tables,
+refilters them against its embedding file and starts its own DataLoader workers.
+With several ``--embedding_file`` arguments, ``train.py`` instead loads the pairs
+once and serves every minibatch from all K embedding tables
+(``create_multi_table_loader``). ``MultiEmbeddingPredictor`` wraps the K models and
+steps their K optimizers on the same shuffled pair stream, and
+``PerModelCheckpoint`` early-stops and checkpoints each model on its own
+validation loss into its regular experiment directory, so ``evaluate.py`` treats
+the results exactly like separately trained runs.
+"""
+
+from pathlib import Path
+from typing import List
+
+import pytorch_lightning as pl
+import torch
+from pytorch_lightning.callbacks import Callback
+from torch import nn
+
+from src.training.exact_solver import save_checkpoint
+from src.training.models import BasePredictor
+
+
+class MultiEmbeddingPredictor(pl.LightningModule):
+    """
+    K independent predictors trained on the same batches, one per embedding file.
+
+    Batches are ``(query_embs, target_embs, values)`` with one query and target
+    tensor per model (see MultiTablePairDataset). Each model has its own optimizer
+    and loss; models stopped by PerModelCheckpoint are skipped.
+    """
+
+    def __init__(self, models: List[BasePredictor], names: List[str]):
+        super().__init__()
+        self.models = nn.ModuleList(models)
+        self.names = list(names)
+        self.active = [True] * len(models)
+        self.automatic_optimization = False
+
+    def training_step(self, batch, batch_idx):
+        query_embs, target_embs, param_value = batch
+        optimizers = self.optimizers()
+        if not isinstance(optimizers, list):
+            optimizers = [optimizers]
+        # Warmup schedulers (one per model when warmup_steps is set)
+        schedulers = self.lr_schedulers() or [None] * len(optimizers)
+        if not isinstance(schedulers, list):
+            schedulers = [schedulers]
+
+        for k, (model, optimizer) in enumerate(zip(self.models, optimizers)):
+            if not self.active[k]:
+                continue
+            loss, _, _ = model._common_step(
+                (query_embs[k], target_embs[k], param_value), batch_idx
+            )
+            optimizer.zero_grad()
+            self.manual_backward(loss)
+            optimizer.step()
+            if schedulers[k] is not None:
+                schedulers[k].step()
+            self.log(f"train_loss_{self.names[k]}", loss, on_step=False, on_epoch=True)
+
+    def validation_step(self, batch, batch_idx):
+        query_embs, target_embs, param_value = batch
+        losses = []
+        for k, model in enumerate(self.models):
+            loss, _, _ = model._common_step(
+                (query_embs[k], target_embs[k], param_value), batch_idx
+            )
+            self.log(f"val_loss_{self.names[k]}", loss, on_step=False, on_epoch=True)
+            losses.append(loss)
+        val_loss = torch.stack(losses).mean()
+        self.log("val_loss", val_loss, on_step=False, on_epoch=True, prog_bar=True)
+        return val_loss
+
+    def configure_optimizers(self):
+        return [model.configure_optimizers() for model in self.models]
+
+
+class PerModelCheckpoint(Callback):
+    """
+    Early stopping and best-checkpoint saving for each model of a MultiEmbeddingPredictor.
+
+    After every validation run, each still-active model whose ``val_loss_{name}``
+    improved is saved to its own checkpoints directory, named like the
+    ModelCheckpoint files of single-embedding training. A model whose loss has not
+    improved for ``patience`` validation runs is stopped; training ends once all
+    models are stopped.
+    """
+
+    def __init__(self, checkpoints_dirs: List[Path], patience: int):
+        self.checkpoints_dirs = [Path(d) for d in checkpoints_dirs]
+        self.patience = patience
+        self.best_scores = [float("inf")] * len(checkpoints_dirs)
+        self.best_model_paths = [""] * len(checkpoints_dirs)
+        self.wait_counts = [0] * len(checkpoints_dirs)
+
+    def on_validation_end(self, trainer, pl_module):
+        if trainer.sanity_checking:
+            return
+
+        for k, name in enumerate(pl_module.names):
+            if not pl_module.active[k]:
+                continue
+            val_loss = trainer.callback_metrics.get(f"val_loss_{name}")
+            if val_loss is None:
+                continue
+            val_loss = float(val_loss)
+
+            if val_loss < self.best_scores[k]:
+                self.best_scores[k] = val_loss
+                self.wait_counts[k] = 0
+                self.best_model_paths[k] = str(
+                    save_checkpoint(
+                        pl_module.models[k],
+                        self.checkpoints_dirs[k],
+                        val_loss,
+                        epoch=trainer.current_epoch,
+                        step=trainer.global_step,
+                    )
+                )
+            else:
+                self.wait_counts[k] += 1
+                if self.wait_counts[k] >= self.patience:
+                    pl_module.active[k] = False
+                    print(
+                        f"Early stopping {name}: val_loss_{name} did not improve for "
+                        f"{self.patience} validation checks (best {self.best_scores[k]:.6f})."
+                    )
+
+        if not any(pl_module.active):
+            trainer.should_stop = True
@@ -1,20 +1,341 @@
 #!/usr/bin/env python
 """
 This script runs training experiments for different models, embeddings, and parameters.
-All training runs use Weights & Biases for logging and visualization.
-Wandb automatically captures all console output, metrics, and model artifacts.
+Training metrics are logged locally as CSV by default; with --logger wandb, Weights &
+Biases captures all console output, metrics, and model artifacts.
 It also optionally evaluates the results after each training run.
+Euclidean (distance) baselines need no training: their test predictions are computed in
+this process, one embedding file at a time, and only their evaluation is scheduled.
 
 Usage:
-python run_experiments.py --data_dir data/processed/sprot_pre2024 --evaluate_after_train --model_types fnn linear euclidean --target_params fident alntmscore hfsp --wandb_project my-project
+python run_experiments.py --data_dir data/processed/sprot_pre2024 --evaluate_after_train --model_types fnn linear euclidean --target_params fident alntmscore hfsp --logger wandb --wandb_project my-project
 """
 
 import argparse
-import subprocess
+import os
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
 from tqdm import tqdm
 
+from src.evaluation.distance_baseline import (
+    DISTANCE_METRICS,
+    compute_distance_baselines,
+)
+from src.shared.embedding_store import read_embedding_size
 from src.shared.experiment_manager import ExperimentManager
+from src.training.scheduler import ExperimentJob, ExperimentScheduler, order_jobs
+from src.training.train import distance_baseline_hparams, save_local_hparams
+
+# Rough multiply-adds per train pair and embedding dimension of each model type
+# (fnn: two embeddings through a 64-unit first layer); euclidean does not train
+MODEL_COST_FACTORS = {"fnn": 128, "linear": 2, "linear_distance": 1, "euclidean": 0}
+
+
+def build_train_command(
+    args,
+    model_type: str,
+    param_name: str,
+    embedding_files: List[Path],
+    sets_dir: Path,
+    output_dir: Path,
+) -> List[str]:
+    """Builds the train.py arguments of one run (several embedding files: one shared run)."""
+    train_command = [
+        "--model_type",
+        model_type,
+        "--param_name",
+        param_name,
+        "--embedding_file",
+        *(str(embedding_file.resolve()) for embedding_file in embedding_files),
+        "--data_dir",
+        str(sets_dir),
+        "--output_base_dir",
+        str(output_dir),
+        "--num_workers",
+        str(args.num_workers),
+        "--batch_size",
+        str(args.batch_size),
+        "--learning_rate",
+        "0.0001",
+        "--max_epochs",
+        "100",
+        "--early_stopping_patience",
+        "5",
+        "--val_check_interval",
+        str(args.val_check_interval),  # Use the provided val_check_interval
+        "--loader_mode",
+        args.loader_mode,
+    ]
+    if args.lr_scaling != "none":
+        train_command.extend(["--lr_scaling", args.lr_scaling])
+    if args.warmup_steps > 0:
+        train_command.extend(["--warmup_steps", str(args.warmup_steps)])
+    if args.mmap_embeddings:
+        train_command.append("--mmap_embeddings")
+    if args.cache_pair_index:
+        train_command.append("--cache_pair_index")
+    if args.solver == "exact" and model_type in [
+        "linear",
+        "linear_distance",
+    ]:
+        train_command.extend(["--solver", "exact", "--ridge_lambdas"])
+        train_command.extend(str(value) for value in args.ridge_lambdas)
+    elif (
+        args.protein_batch_size > 0
+        and model_type != "euclidean"
+        and not (args.precompute_features and model_type == "linear_distance")
+    ):
+        train_command.extend(["--protein_batch_size", str(args.protein_batch_size)])
+    if args.val_subset_size > 0 and model_type != "euclidean":
+        train_command.extend(["--val_subset_size", str(args.val_subset_size)])
+    if args.locality_order:
+        train_command.append("--locality_order")
+    if args.embedding_cache_size > 0:
+        train_command.extend(["--embedding_cache_size", str(args.embedding_cache_size)])
+    if args.embedding_dtype != "float32":
+        train_command.extend(["--embedding_dtype", args.embedding_dtype])
+    if args.precompute_features and model_type == "linear_distance":
+        train_command.extend(
+            ["--precompute_features", "--feature_dtype", args.feature_dtype]
+        )
+
+    # Add logger and wandb configuration
+    if model_type == "euclidean":
+        train_command.extend(["--distance_metrics", *args.distance_metrics])
+    train_command.extend(["--logger", args.logger])
+    if args.wandb_project:
+        train_command.extend(["--wandb_project", args.wandb_project])
+    if args.wandb_entity:
+        train_command.extend(["--wandb_entity", args.wandb_entity])
+    return train_command
+
+
+def job_budget(args) -> Tuple[Optional[int], int]:
+    """Returns the math threads and DataLoader workers of each concurrent job."""
+    if args.jobs == 1 and args.threads_per_job is None:
+        # A single job uses the whole node as before
+        return None, args.num_workers if args.num_workers is not None else 10
+    threads = args.threads_per_job or max(1, (os.cpu_count() or 1) // args.jobs)
+    workers = args.num_workers if args.num_workers is not None else min(10, threads)
+    return threads, workers
+
+
+def count_train_pairs(sets_dir: Path) -> int:
+    """Returns the number of rows of train.parquet without loading the table."""
+    return pl.scan_parquet(sets_dir / "train.parquet").select(pl.len()).collect().item()
+
+
+def estimate_job_cost(
+    model_type: str, embedding_files: List[Path], sizes: Dict[Path, int], pairs: int
+) -> float:
+    """Estimates the training cost of a job: embedding dimension x train pairs."""
+    dims = sum(sizes[embedding_file] for embedding_file in embedding_files)
+    return float(MODEL_COST_FACTORS[model_type] * dims * pairs)
+
+
+def build_jobs(
+    args,
+    data_dir: Path,
+    sets_dir: Path,
+    models_base_dir: Path,
+    embedding_files: List[Path],
+) -> Tuple[List[ExperimentJob], int, Dict[Path, List[Tuple[str, Path]]]]:
+    """
+    Returns the jobs of all model type x param x embedding combinations still to run,
+    the number of completed combinations that were skipped, and the pending euclidean
+    baselines as ``(param_name, experiment_dir)`` runs per embedding file.
+    """
+    jobs = []
+    skipped_count = 0
+    baselines: Dict[Path, List[Tuple[str, Path]]] = {}
+    # Inputs of the job cost estimates, read once per sweep
+    pairs = count_train_pairs(sets_dir)
+    sizes = {
+        embedding_file: read_embedding_size(embedding_file)
+        for embedding_file in embedding_files
+    }
+    for model_type in args.model_types:
+        for param_name in args.target_params:
+            # Options not supported by multi-embedding training stay one run per
+            # embedding
+            single_run_only = (
+                model_type == "euclidean"
+                or (
+                    args.solver == "exact"
+                    and model_type in ["linear", "linear_distance"]
+                )
+                or (args.precompute_features and model_type == "linear_distance")
+                or args.protein_batch_size > 0
+                or args.val_subset_size > 0
+                or args.logger == "wandb"
+                or args.loader_mode != "batched"
+                or args.locality_order
+                or args.embedding_cache_size > 0
+                or (args.mmap_embeddings and args.embedding_dtype != "float32")
+            )
+
+            pending = []
+            for embedding_file_path in embedding_files:
+                exp_manager = ExperimentManager(
+                    dataset_dir=data_dir,  # data/processed/sprot_pre2024
+                    embedding_name=embedding_file_path.stem,  # e.g., 'esm1b'
+                    model_type=model_type,
+                    param_name=param_name,
+                    models_base_dir=models_base_dir,
+                )
+                # Check experiment status using the centralized manager
+                status, experiment_dir = exp_manager.check_experiment_status()
+                if status == "completed":
+                    # Training completed - skip this experiment
+                    skipped_count += 1
+                    continue
+                pending.append((embedding_file_path, experiment_dir, status))
+
+            if args.multi_embedding and not single_run_only:
+                if not pending:
+                    continue
+                # One train.py process for all pending embeddings of this model/param;
+                # interrupted runs are retrained from scratch in this mode
+                jobs.append(
+                    ExperimentJob(
+                        name=f"{model_type}/{param_name}/{len(pending)} embeddings",
+                        train_args=build_train_command(
+                            args,
+                            model_type,
+                            param_name,
+                            [
+                                embedding_file_path
+                                for embedding_file_path, _, _ in pending
+                            ],
+                            sets_dir,
+                            pending[0][1],
+                        ),
+                        experiment_dirs=[
+                            experiment_dir for _, experiment_dir, _ in pending
+                        ],
+                        embedding_files=[
+                            embedding_file_path for embedding_file_path, _, _ in pending
+                        ],
+                        cost=estimate_job_cost(
+                            model_type,
+                            [
+                                embedding_file_path
+                                for embedding_file_path, _, _ in pending
+                            ],
+                            sizes,
+                            pairs,
+                        ),
+                    )
+                )
+                continue
+
+            for embedding_file_path, experiment_dir, status in pending:
+                if model_type == "euclidean":
+                    baselines.setdefault(embedding_file_path, []).append(
+                        (param_name, experiment_dir)
+                    )
+                    continue
+                name = f"{model_type}/{param_name}/{embedding_file_path.stem}"
+                train_args = build_train_command(
+                    args,
+                    model_type,
+                    param_name,
+                    [embedding_file_path],
+                    sets_dir,
+                    experiment_dir,
+                )
+                if status == "interrupted":
+                    # Training interrupted but has checkpoint - resume
+                    print(f"Resuming interrupted training: {name}")
+                    train_args.append("--resume_from_checkpoint")
+                jobs.append(
+                    ExperimentJob(
+                        name=name,
+                        train_args=train_args,
+                        experiment_dirs=[experiment_dir],
+                        embedding_files=[embedding_file_path],
+                        cost=estimate_job_cost(
+                            model_type, [embedding_file_path], sizes, pairs
+                        ),
+                    )
+                )
+    return jobs, skipped_count, baselines
+
+
+def run_distance_baselines(
+    args,
+    project_root: Path,
+    data_dir: Path,
+    models_base_dir: Path,
+    baselines: Dict[Path, List[Tuple[str, Path]]],
+) -> Tuple[List[ExperimentJob], int]:
+    """
+    Computes the pending euclidean baselines in this process.
+
+    The test pairs and embeddings of each embedding file are loaded once for all of
+    its parameters and distance metrics. Returns evaluation-only jobs for the
+    completed runs and the number of runs that failed.
+    """
+    jobs = []
+    failed_count = 0
+    for embedding_file_path, runs in baselines.items():
+        name = f"euclidean/{embedding_file_path.stem}"
+        tqdm.write(f"Computing distance baselines: {name} ({len(runs)} params)")
+        try:
+            managers = [
+                ExperimentManager(
+                    dataset_dir=data_dir,
+                    embedding_name=embedding_file_path.stem,
+                    model_type="euclidean",
+                    param_name=param_name,
+                    models_base_dir=models_base_dir,
+                )
+                for param_name, _ in runs
+            ]
+            paths_list = [
+                manager.create_experiment_paths(project_root) for manager in managers
+            ]
+            for (param_name, _), paths in zip(runs, paths_list):
+                # The hparams.yaml train.py writes for the same baseline run
+                hparams = distance_baseline_hparams(
+                    paths,
+                    param_name,
+                    args.distance_metrics,
+                    args.batch_size,
+                    cache_pair_index=args.cache_pair_index,
+                    wandb_project=args.wandb_project,
+                    wandb_entity=args.wandb_entity,
+                )
+                save_local_hparams(paths.experiment_dir, hparams)
+            if paths_list[0].test_file is not None:
+                compute_distance_baselines(
+                    paths_list[0].embedding_file,
+                    paths_list[0].test_file,
+                    runs,
+                    args.distance_metrics,
+                    use_cache=args.cache_pair_index,
+                    mmap_embeddings=args.mmap_embeddings,
+                )
+            for manager, paths in zip(managers, paths_list):
+                manager.create_completion_marker(
+                    paths.experiment_dir, "euclidean_baseline", 0.0
+                )
+        except Exception as e:
+            tqdm.write(f"Error computing distance baselines {name}: {e}")
+            failed_count += len(runs)
+            continue
+        jobs.extend(
+            ExperimentJob(
+                name=f"euclidean/{param_name}/{embedding_file_path.stem}",
+                train_args=None,
+                experiment_dirs=[experiment_dir],
+                embedding_files=[embedding_file_path],
+            )
+            for param_name, experiment_dir in runs
+        )
+    return jobs, failed_count
 
 
 def main(args):
@@ -59,202 +380,73 @@ def main(args):
         print(f" - {f.name}")
     print(f"Target model types: {model_types}")
     print(f"Target parameters: {target_params}")
-    print(f"Wandb project: {args.wandb_project}")
-    if args.wandb_entity:
-        print(f"Wandb entity: {args.wandb_entity}")
+    print(f"Metrics logger: {args.logger}")
+    if args.logger == "wandb":
+        print(f"Wandb project: {args.wandb_project}")
+        if args.wandb_entity:
+            print(f"Wandb entity: {args.wandb_entity}")
     if args.evaluate_after_train:
         print("Evaluation after each training run: Enabled")
-    print(
-        "All training logs and metrics are captured automatically by Weights & Biases."
-    )
+
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1.")
+        return
+    threads_per_job, args.num_workers = job_budget(args)
+    if args.jobs > 1 or threads_per_job:
+        print(
+            f"Running up to {args.jobs} jobs at once with {threads_per_job} threads and "
+            f"{args.num_workers} DataLoader workers each."
+        )
+    if args.jobs > 1:
+        print(
+            "Job output is written to train.log/evaluate.log in each experiment directory."
+        )
+    if args.in_process:
+        print(f"Running jobs in {args.jobs} long-lived worker process(es).")
     print("\n")
 
     total_combinations = len(model_types) * len(target_params) * len(embedding_files)
-    run_count = 0
-    skipped_count = 0
-    eval_success_count = 0
-    eval_fail_count = 0
-    error_count = 0  # Track general errors
+    jobs, skipped_count, baselines = build_jobs(
+        args, data_dir, sets_dir, models_base_dir, embedding_files
+    )
 
     # Wrap the iteration with tqdm for a progress bar
     pbar = tqdm(total=total_combinations, desc="Running Experiments", unit="run")
-
-    # Iterate through all combinations
-    for model_type in model_types:
-        for param_name in target_params:
-            for embedding_file_path in embedding_files:
-                embedding_name = embedding_file_path.stem
-
-                # Update progress bar description
-                pbar.set_description(
-                    f"Checking: {model_type}/{param_name}/{embedding_name}"
-                )
-
-                # Create experiment manager for this combination
-                exp_manager = ExperimentManager(
-                    dataset_dir=data_dir,  # data/processed/sprot_pre2024
-                    embedding_name=embedding_name,  # e.g., 'esm1b'
-                    model_type=model_type,
-                    param_name=param_name,
-                    models_base_dir=models_base_dir,
-                )
-
-                # Check experiment status using the centralized manager
-                status, experiment_dir = exp_manager.check_experiment_status()
-                # print(f"Experiment status: {status}")
-                # print(f"Experiment directory: {experiment_dir}")
-                # exit()
-
-                if status == "completed":
-                    # Training completed - skip this experiment
-                    skipped_count += 1
-                    pbar.update(1)
-                    pbar.set_postfix(
-                        skipped=skipped_count, errors=error_count, refresh=True
-                    )
-                    continue
-                elif status == "interrupted":
-                    # Training interrupted but has checkpoint - resume
-                    print(
-                        f"Resuming interrupted training: {model_type}/{param_name}/{embedding_name}"
-                    )
-                    resume_training = True
-                else:
-                    # Fresh start (not_started or empty)
-                    resume_training = False
-
-                # Update description before training
-                pbar.set_description(
-                    f"Training: {model_type}/{param_name}/{embedding_name}"
-                )
-
-                run_count += 1
-
-                # Base command
-                train_command = [
-                    "uv",
-                    "run",
-                    "python",
-                    str(project_root / "src" / "training" / "train.py"),
-                    "--model_type",
-                    model_type,
-                    "--param_name",
-                    param_name,
-                    "--embedding_file",
-                    str(embedding_file_path.resolve()),
-                    "--data_dir",
-                    str(sets_dir),
-                    "--output_base_dir",
-                    str(exp_manager.experiment_dir),
-                    "--num_workers",
-                    "10",
-                    "--batch_size",
-                    "1024",
-                    "--learning_rate",
-                    "0.0001",
-                    "--max_epochs",
-                    "100",
-                    "--early_stopping_patience",
-                    "5",
-                    "--val_check_interval",
-                    str(args.val_check_interval),  # Use the provided val_check_interval
-                ]
-
-                # Add wandb configuration
-                if args.wandb_project:
-                    train_command.extend(["--wandb_project", args.wandb_project])
-                if args.wandb_entity:
-                    train_command.extend(["--wandb_entity", args.wandb_entity])
-
-                # Add resume flag if resuming
-                if resume_training:
-                    train_command.append("--resume_from_checkpoint")
-
-                training_successful = False
-                try:
-                    # Run training - wandb captures all output automatically
-                    subprocess.run(
-                        train_command,
-                        check=True,  # Will raise CalledProcessError on failure
-                        cwd=project_root,
-                        text=True,
-                    )
-                    training_successful = True
-
-                except subprocess.CalledProcessError as e:
-                    error_count += 1
-                    tqdm.write(
-                        f"Error during training for {model_type}/{param_name}/{embedding_name}: {e}"
-                    )
-                except KeyboardInterrupt:
-                    pbar.close()
-                    print("\nExperiment run interrupted by user.")
-                    return
-                except Exception as e:
-                    error_count += 1
-                    tqdm.write(
-                        f"Unexpected error during training execution for {model_type}/{param_name}/{embedding_name}: {e}"
-                    )
-
-                # --- Optional Evaluation Step ---
-                if training_successful and args.evaluate_after_train:
-                    # Use the experiment directory for evaluation
-                    pbar.set_description(
-                        f"Evaluating: {model_type}/{param_name}/{embedding_name}"
-                    )
-
-                    eval_command = [
-                        "uv",
-                        "run",
-                        "python",
-                        str(project_root / "src" / "evaluation" / "evaluate.py"),
-                        "--run_dir",
-                        str(experiment_dir),
-                    ]
-
-                    try:
-                        # Run evaluation - output goes to console/wandb
-                        subprocess.run(
-                            eval_command,
-                            check=True,
-                            cwd=project_root,
-                            text=True,
-                        )
-                        eval_success_count += 1
-                    except subprocess.CalledProcessError as e:
-                        eval_fail_count += 1
-                        error_count += 1  # Count eval errors too
-                        tqdm.write(f"Error during evaluation for {experiment_dir}: {e}")
-                    except KeyboardInterrupt:
-                        pbar.close()
-                        print("\nEvaluation interrupted by user.")
-                        return
-                    except Exception as e:
-                        eval_fail_count += 1
-                        error_count += 1  # Count eval errors too
-                        tqdm.write(
-                            f"Unexpected error during evaluation for {experiment_dir}: {e}"
-                        )
-
-                # Update progress bar after processing each combination
-                pbar.update(1)
-                pbar.set_postfix(
-                    skipped=skipped_count,
-                    errors=error_count,
-                    eval_ok=eval_success_count,
-                    eval_fail=eval_fail_count,
-                    refresh=True,
-                )
-
+    pbar.update(skipped_count)
+    baseline_jobs, failed_baselines = run_distance_baselines(
+        args, project_root, data_dir, models_base_dir, baselines
+    )
+    pbar.update(failed_baselines)
+    # Keep each embedding file's jobs together and start the longest ones first
+    jobs = order_jobs(jobs + baseline_jobs)
+    scheduler = ExperimentScheduler(
+        project_root,
+        pbar,
+        max_jobs=args.jobs,
+        threads_per_job=threads_per_job,
+        evaluate=args.evaluate_after_train,
+        skipped=skipped_count,
+        in_process=args.in_process,
+    )
+    try:
+        counts = scheduler.run(jobs)
+    except KeyboardInterrupt:
+        pbar.close()
+        print("\nExperiment run interrupted by user.")
+        return
     pbar.close()  # Close the progress bar cleanly
 
     print("\n==== Experiment Runner Finished ====")
     print(f"Total combinations processed: {total_combinations}")
-    print(f"Launched training runs: {run_count}")
+    print(f"Launched training runs: {len(jobs) - len(baseline_jobs)}")
+    print(f"Failed training runs: {counts['failed']}")
+    print(f"Computed distance baselines: {len(baseline_jobs)}")
+    if failed_baselines:
+        print(f"Failed distance baselines: {failed_baselines}")
     print(f"Skipped existing runs: {skipped_count}")
     if args.evaluate_after_train:
-        print(f"Successful evaluations: {eval_success_count}")
-        print(f"Failed evaluations: {eval_fail_count}")
+        print(f"Successful evaluations: {counts['eval_ok']}")
+        print(f"Failed evaluations: {counts['eval_fail']}")
     print("==================================")
 
 
@@ -286,8 +478,24 @@ if __name__ == "__main__":
         "--target_params",
         nargs="+",
         default=["fident", "alntmscore", "hfsp"],
-        choices=["fident", "alntmscore", "hfsp"],
-        help="List of target parameters to run.",
+        choices=["fident", "alntmscore", "hfsp", "multi"],
+        help="List of target parameters to run. 'multi' trains one model per embedding that "
+        "predicts all three parameters from a single pass over the pairs.",
+    )
+    parser.add_argument(
+        "--distance_metrics",
+        nargs="+",
+        default=["euclidean"],
+        choices=DISTANCE_METRICS,
+        help="Distances between the pair embeddings computed (and evaluated) by the euclidean "
+        "baseline runs (default: euclidean).",
+    )
+    parser.add_argument(
+        "--logger",
+        type=str,
+        default="csv",
+        choices=["csv", "tensorboard", "wandb", "none"],
+        help="Metrics logger of the training runs (see train.py; default: csv).",
     )
     parser.add_argument(
         "--wandb_project",
@@ -301,12 +509,153 @@ if __name__ == "__main__":
         default=None,
         help="Weights & Biases entity (username/team).",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of training/evaluation jobs run concurrently (default: 1).",
+    )
+    parser.add_argument(
+        "--in_process",
+        action="store_true",
+        help="Run train.py/evaluate.py in --jobs long-lived worker processes that import "
+        "torch once, instead of one 'uv run python' subprocess per run.",
+    )
+    parser.add_argument(
+        "--threads_per_job",
+        type=int,
+        default=None,
+        help="Math threads (OMP/MKL) per job. Default: all cores with --jobs 1, otherwise "
+        "cpu_count / jobs.",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help="DataLoader workers per job. Default: 10 with --jobs 1, otherwise "
+        "min(10, threads per job).",
+    )
     parser.add_argument(
         "--val_check_interval",
         type=float,
         default=0.2,
         help="How often to run validation during training. 0.2 = 5 times per epoch (default: 0.2)",
     )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1024,
+        help="Training batch size (default: 1024).",
+    )
+    parser.add_argument(
+        "--lr_scaling",
+        type=str,
+        default="none",
+        choices=["none", "linear", "sqrt"],
+        help="Scale the learning rate with --batch_size relative to 1024 (default: none).",
+    )
+    parser.add_argument(
+        "--warmup_steps",
+        type=int,
+        default=0,
+        help="Learning rate warmup steps for large-batch training (default: 0).",
+    )
+    parser.add_argument(
+        "--val_subset_size",
+        type=int,
+        default=0,
+        help="Validate intermediate checks on a stratified subset of this many pairs; the "
+        "full validation set is scored at the end of each epoch (default: 0 = always full).",
+    )
+    parser.add_argument(
+        "--multi_embedding",
+        action="store_true",
+        help="Train all pending embedding files of a model type and parameter in one train.py "
+        "process on a shared pair stream instead of one process per embedding file "
+        "(trainable model types with --loader_mode batched, not with --logger wandb; "
+        "interrupted runs are retrained from scratch).",
+    )
+    parser.add_argument(
+        "--loader_mode",
+        type=str,
+        default="h5",
+        choices=["h5", "memory", "batched", "device"],
+        help="How embeddings are served to the DataLoader: 'h5' reads per sample from HDF5, "
+        "'memory' preloads them into one matrix shared by all workers, 'batched' gathers "
+        "whole minibatches from that matrix at once, 'device' keeps the matrix and pair indices "
+        "on the training device and slices batches there (default: h5)",
+    )
+    parser.add_argument(
+        "--mmap_embeddings",
+        action="store_true",
+        help="Memory-map contiguous packed embedding stores instead of loading them, so all "
+        "DataLoader workers share one page-cache copy (requires --loader_mode memory, batched or device).",
+    )
+    parser.add_argument(
+        "--cache_pair_index",
+        action="store_true",
+        help="Cache the filtered, integer-indexed pair tables as .npz files next to the parquet "
+        "files, so repeated runs and evaluations on the same embedding file skip reading and "
+        "filtering them again.",
+    )
+
+    parser.add_argument(
+        "--embedding_dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16", "bfloat16", "int8"],
+        help="In-memory storage dtype of the embedding tables (requires --loader_mode memory, "
+        "batched or device; default: float32).",
+    )
+    parser.add_argument(
+        "--solver",
+        type=str,
+        default="adam",
+        choices=["adam", "exact"],
+        help="Solver for the linear model types: 'exact' fits linear and linear_distance in "
+        "closed form from one data pass; fnn always uses Adam (default: adam).",
+    )
+    parser.add_argument(
+        "--ridge_lambdas",
+        type=float,
+        nargs="+",
+        default=[0.0],
+        help="Ridge penalties tried by --solver exact, selected on the validation set (default: 0.0).",
+    )
+    parser.add_argument(
+        "--locality_order",
+        action="store_true",
+        help="Read validation/test pairs sorted by query and target protein (predictions keep "
+        "the parquet row order).",
+    )
+    parser.add_argument(
+        "--embedding_cache_size",
+        type=int,
+        default=0,
+        help="Per-worker LRU cache size for embeddings read from HDF5 during validation/test "
+        "(default: 0 = off).",
+    )
+    parser.add_argument(
+        "--protein_batch_size",
+        type=int,
+        default=0,
+        help="Train on all labelled pairs among minibatches of this many proteins, built "
+        "from pair-graph neighbourhoods "
+        "(not with --solver exact; default: 0 = pair minibatches).",
+    )
+    parser.add_argument(
+        "--precompute_features",
+        action="store_true",
+        help="Train linear_distance models on squared-difference pair features that are "
+        "precomputed once per split and embedding file.",
+    )
+    parser.add_argument(
+        "--feature_dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16"],
+        help="Storage dtype of precomputed pair features (default: float32).",
+    )
 
     args = parser.parse_args()
     main(args)
@@ -0,0 +1,236 @@
+"""
+Runs the training and evaluation jobs of run_experiments.py in a pool of concurrent
+subprocesses.
+
+Every job gets a CPU budget: its train.py and evaluate.py processes run with
+``OMP_NUM_THREADS``/``MKL_NUM_THREADS`` set to ``threads_per_job`` (and the
+DataLoader worker count chosen by run_experiments.py), so that ``max_jobs``
+concurrent jobs do not oversubscribe the node. With more than one concurrent
+job, the output of each job goes to ``train.log``/``evaluate.log`` in its
+experiment directory instead of the console. The progress bar shows how many jobs
+are queued, running, done and failed.
+
+``order_jobs`` runs all jobs of one embedding file back to back, so the OS page
+cache (and any in-memory embedding or pair-index caches) stays warm for it, and
+starts the most expensive jobs first, so long jobs do not end up running alone at
+the end of a concurrent sweep.
+
+With ``in_process=True`` the scripts run in a pool of ``max_jobs`` long-lived
+worker processes (see src/shared/in_process.py) instead of one ``uv run python``
+subprocess per script, which skips interpreter startup and the torch/lightning
+imports for every run.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tqdm import tqdm
+
+from src.shared.in_process import (
+    EVALUATE_SCRIPT,
+    TRAIN_SCRIPT,
+    init_worker,
+    run_in_process,
+)
+
+
+@dataclass
+class ExperimentJob:
+    """
+    One train.py run and the experiment directories it produces.
+
+    Jobs without ``train_args`` only evaluate already complete experiment
+    directories (e.g. distance baselines computed by run_experiments.py).
+    """
+
+    name: str
+    train_args: Optional[List[str]]
+    experiment_dirs: List[Path] = field(default_factory=list)
+    embedding_files: List[Path] = field(default_factory=list)
+    cost: float = 0.0  # Estimated relative training cost (see order_jobs)
+
+
+def order_jobs(jobs: List[ExperimentJob]) -> List[ExperimentJob]:
+    """
+    Returns the jobs grouped by embedding files, longest estimated jobs first.
+
+    Groups are ordered by their total cost and the jobs of a group by their own
+    cost, both descending; equal costs keep their submission order.
+    """
+    groups: Dict[tuple, List[ExperimentJob]] = {}
+    for job in jobs:
+        groups.setdefault(tuple(job.embedding_files), []).append(job)
+    ordered_groups = sorted(
+        groups.values(), key=lambda group: -sum(job.cost for job in group)
+    )
+    return [
+        job
+        for group in ordered_groups
+        for job in sorted(group, key=lambda job: -job.cost)
+    ]
+
+
+def python_command(project_root: Path, script: Path, script_args: List[str]) -> list:
+    """Returns the ``uv run python`` command of a project script."""
+    return ["uv", "run", "python", str(project_root / script), *script_args]
+
+
+def job_environment(threads_per_job: Optional[int]) -> Dict[str, str]:
+    """Returns the environment of a job's processes, limiting their math threads."""
+    env = os.environ.copy()
+    if threads_per_job:
+        for variable in ["OMP_NUM_THREADS", "MKL_NUM_THREADS"]:
+            env[variable] = str(threads_per_job)
+    return env
+
+
+def run_script(
+    project_root: Path,
+    script: Path,
+    script_args: List[str],
+    env: Optional[Dict[str, str]] = None,
+    log_file: Optional[Path] = None,
+) -> bool:
+    """Runs a project script to completion and returns whether it succeeded."""
+    command = python_command(project_root, script, script_args)
+    try:
+        if log_file is None:
+            subprocess.run(command, check=True, cwd=project_root, text=True, env=env)
+        else:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(log_file, "a") as f:
+                subprocess.run(
+                    command,
+                    check=True,
+                    cwd=project_root,
+                    text=True,
+                    env=env,
+                    stdout=f,
+                    stderr=subprocess.STDOUT,
+                )
+        return True
+    except subprocess.CalledProcessError as e:
+        tqdm.write(f"Error running {script.name} {' '.join(script_args[:6])}...: {e}")
+    except Exception as e:
+        tqdm.write(f"Unexpected error running {script.name}: {e}")
+    return False
+
+
+class ExperimentScheduler:
+    """
+    Runs ExperimentJobs on a pool of ``max_jobs`` concurrent slots.
+
+    A job trains with train.py and then, with ``evaluate``, runs evaluate.py on
+    each of its experiment directories in the same slot. ``pbar`` advances by one
+    per experiment directory; its postfix is the live job summary.
+    """
+
+    def __init__(
+        self,
+        project_root: Path,
+        pbar: tqdm,
+        max_jobs: int = 1,
+        threads_per_job: Optional[int] = None,
+        evaluate: bool = False,
+        skipped: int = 0,
+        in_process: bool = False,
+    ):
+        self.project_root = project_root
+        self.pbar = pbar
+        self.max_jobs = max_jobs
+        self.threads_per_job = threads_per_job
+        self.env = job_environment(threads_per_job)
+        self.evaluate = evaluate
+        self.in_process = in_process
+        self._workers = None
+        self.counts = {
+            "skipped": skipped,
+            "queued": 0,
+            "running": 0,
+            "done": 0,
+            "failed": 0,
+            "eval_ok": 0,
+            "eval_fail": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _log_file(self, job: ExperimentJob, name: str) -> Optional[Path]:
+        # Concurrent jobs would interleave their console output
+        if self.max_jobs == 1 or not job.experiment_dirs:
+            return None
+        return job.experiment_dirs[0] / name
+
+    def _update(self, advance: int = 0, **changes):
+        with self._lock:
+            for key, delta in changes.items():
+                self.counts[key] += delta
+            self.pbar.update(advance)
+            self.pbar.set_postfix(self.counts, refresh=True)
+
+    def _run_script(
+        self, script: Path, script_args: List[str], log_file: Optional[Path]
+    ) -> bool:
+        if self._workers is not None:
+            try:
+                return self._workers.submit(
+                    run_in_process, script, script_args, log_file
+                ).result()
+            except Exception as e:
+                # e.g. a worker process that died (BrokenProcessPool)
+                tqdm.write(f"Worker error running {script.name}: {e}")
+                return False
+        return run_script(self.project_root, script, script_args, self.env, log_file)
+
+    def _run_job(self, job: ExperimentJob):
+        self._update(queued=-1, running=1)
+        if job.train_args is not None:
+            tqdm.write(f"Training: {job.name}")
+            trained = self._run_script(
+                TRAIN_SCRIPT, job.train_args, self._log_file(job, "train.log")
+            )
+            if not trained:
+                self._update(len(job.experiment_dirs), running=-1, failed=1)
+                return
+
+        for experiment_dir in job.experiment_dirs:
+            if self.evaluate:
+                evaluated = self._run_script(
+                    EVALUATE_SCRIPT,
+                    ["--run_dir", str(experiment_dir)],
+                    experiment_dir / "evaluate.log" if self.max_jobs > 1 else None,
+                )
+                self._update(eval_ok=int(evaluated), eval_fail=int(not evaluated))
+            self._update(1)
+        tqdm.write(f"Finished: {job.name}")
+        self._update(running=-1, done=1)
+
+    def run(self, jobs: List[ExperimentJob]) -> Dict[str, int]:
+        """Runs all jobs and returns the final job counts."""
+        self._update(queued=len(jobs))
+        if self.in_process:
+            # Spawned workers import torch and the scripts once and then run many jobs
+            self._workers = ProcessPoolExecutor(
+                max_workers=self.max_jobs,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(self.threads_per_job,),
+            )
+        executor = ThreadPoolExecutor(max_workers=self.max_jobs)
+        try:
+            futures = [executor.submit(self._run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                future.result()
+        finally:
+            # On KeyboardInterrupt, drop queued jobs; running ones receive the
+            # interrupt themselves
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self._workers is not None:
+                self._workers.shutdown(wait=False, cancel_futures=True)
+                self._workers = None
+        return dict(self.counts)
@@ -3,26 +3,73 @@ This script trains a specified model or calculates the Euclidean baseline.
 
 Usage:
 python train.py --model_type fnn --embedding_file path/to/embeddings.h5 --data_dir path/to/data_dir --param_name param_name
+
+Several --embedding_file values train one model per file in a single process:
+python train.py --model_type fnn --embedding_file path/to/a.h5 path/to/b.h5 --data_dir path/to/data_dir --param_name param_name
+
+Data-parallel training in 4 CPU processes (DDP), each on its own shard of the pairs:
+python train.py --model_type fnn --embedding_file path/to/embeddings.h5 --data_dir path/to/data_dir --param_name param_name --strategy ddp_cpu --num_processes 4
 """
 
 import argparse
+import math
+import os
+from dataclasses import replace
 from pathlib import Path
-from typing import Tuple, Type
+from typing import List, Optional, Tuple, Type
 import pytorch_lightning as pl
 import torch
-from pytorch_lightning.callbacks import EarlyStopping, ModelCheckpoint
-from pytorch_lightning.loggers import WandbLogger
+from pytorch_lightning.callbacks import Callback, EarlyStopping, ModelCheckpoint
+from pytorch_lightning.loggers import (
+    CSVLogger,
+    Logger,
+    TensorBoardLogger,
+    WandbLogger,
+)
+from pytorch_lightning.utilities import rank_zero_only
 from torch.utils.data import DataLoader
-import wandb
 import yaml
 
-from src.shared.datasets import create_single_loader, get_embedding_size
+from src.evaluation.distance_baseline import (
+    DISTANCE_METRICS,
+    baseline_hparams,
+    compute_distance_baselines,
+)
+from src.shared.datasets import (
+    FEATURE_DTYPES,
+    LOADER_MODES,
+    MULTI_PARAM,
+    TARGET_PARAMS,
+    create_feature_loader,
+    create_multi_table_loader,
+    create_protein_batch_loader,
+    create_single_loader,
+    get_embedding_size,
+    set_pair_sampler_epoch,
+    target_statistics,
+)
+from src.shared.embedding_store import (
+    TABLE_DTYPES,
+    load_embedding_table,
+    open_memmap_table,
+)
 from src.shared.experiment_manager import ExperimentManager, ExperimentPaths
+from src.shared.helpers import bf16_supported
+from src.training.exact_solver import EXACT_MODEL_TYPES, fit_exact, save_checkpoint
 from src.training.models import (
     FNNPredictor,
     LinearRegressionPredictor,
     LinearDistancePredictor,
 )
+from src.training.multi_embedding import MultiEmbeddingPredictor, PerModelCheckpoint
+from src.training.validation_subset import (
+    SubsetValidationLoader,
+    SubsetValidationSwitch,
+)
+
+LOGGER_TYPES = ["csv", "tensorboard", "wandb", "none"]
+DEFAULT_SEED = 42
+DEFAULT_WANDB_PROJECT = "which-plm"
 
 
 def setup_environment(seed: int):
@@ -35,6 +82,17 @@ def setup_environment(seed: int):
         print("CUDA not available.")
 
 
+def resolve_precision(bf16: bool) -> str:
+    """Returns the Lightning precision: bf16 autocast where the hardware supports it."""
+    if not bf16:
+        return "32-true"
+    if bf16_supported():
+        print("Using bf16 mixed precision (autocast).")
+        return "bf16-mixed"
+    print("Warning: bfloat16 is not supported on this hardware, training in float32.")
+    return "32-true"
+
+
 def prepare_data(
     param_name: str,
     batch_size: int,
@@ -42,80 +100,329 @@ def prepare_data(
     train_file: Path,
     val_file: Path,
     num_workers: int,
-) -> Tuple[int, DataLoader, DataLoader]:
-    """Load train/val datasets and return embedding size and dataloaders."""
+    loader_mode: str = "h5",
+    mmap_embeddings: bool = False,
+    cache_pair_index: bool = False,
+    precompute_features: bool = False,
+    feature_dtype: str = "float32",
+    embedding_dtype: str = "float32",
+    locality_order: bool = False,
+    embedding_cache_size: int = 0,
+    protein_batch_size: int = 0,
+    val_subset_size: int = 0,
+    shuffle_seed: Optional[int] = None,
+) -> Tuple[int, DataLoader, DataLoader, Optional[DataLoader]]:
+    """
+    Load train/val datasets and return embedding size and dataloaders.
+
+    The last element is a loader over a stratified subset of ``val_subset_size``
+    validation pairs, or None when ``val_subset_size`` is 0. ``shuffle_seed``
+    fixes the shuffled order of the train loader per epoch (see PairBatchSampler).
+    """
     print("Preparing train and validation data loaders...")
     embedding_size = get_embedding_size(str(embeddings_file))
     print(f"Detected embedding size: {embedding_size}")
 
+    if precompute_features:
+        # Stream precomputed squared differences instead of gathering embeddings
+        feature_args = {
+            "hdf_file": str(embeddings_file),
+            "param_name": param_name,
+            "batch_size": batch_size,
+            "num_workers": num_workers,
+            "feature_dtype": feature_dtype,
+            "cache_pair_index": cache_pair_index,
+        }
+        print(f"Using precomputed pair features ({feature_dtype}).")
+        train_loader = create_feature_loader(
+            parquet_file=str(train_file), shuffle=True, **feature_args
+        )
+        val_loader = create_feature_loader(
+            parquet_file=str(val_file), shuffle=False, **feature_args
+        )
+        print(f"Train batches: {len(train_loader)}, Val batches: {len(val_loader)}")
+        return embedding_size, train_loader, val_loader, None
+
     loader_args = {
         "hdf_file": str(embeddings_file),
         "param_name": param_name,
         "batch_size": batch_size,
         "num_workers": num_workers,
+        "loader_mode": loader_mode,
+        "cache_pair_index": cache_pair_index,
+        "embedding_dtype": embedding_dtype,
     }
+    if mmap_embeddings:
+        # Map the packed store once; workers re-map it and share the page cache
+        loader_args["embedding_table"] = open_memmap_table(str(embeddings_file))
+    elif loader_mode != "h5":
+        # Load every embedding once and share the table between train and val
+        loader_args["embedding_table"] = load_embedding_table(
+            str(embeddings_file), dtype=embedding_dtype
+        )
+    print(f"Using loader mode: {loader_mode}")
     print(f"Using {num_workers} worker(s) for DataLoaders.")
 
-    train_loader = create_single_loader(
-        parquet_file=str(train_file), shuffle=True, **loader_args
-    )
+    if protein_batch_size > 0:
+        # Train on all labelled pairs among minibatches of pair-graph neighbourhoods
+        embedding_table = loader_args.get("embedding_table")
+        if embedding_table is None:
+            embedding_table = load_embedding_table(
+                str(embeddings_file), dtype=embedding_dtype
+            )
+        train_loader = create_protein_batch_loader(
+            parquet_file=str(train_file),
+            hdf_file=str(embeddings_file),
+            param_name=param_name,
+            embedding_table=embedding_table,
+            proteins_per_batch=protein_batch_size,
+            num_workers=num_workers,
+            cache_pair_index=cache_pair_index,
+        )
+    else:
+        train_loader = create_single_loader(
+            parquet_file=str(train_file),
+            shuffle=True,
+            shuffle_seed=shuffle_seed,
+            **loader_args,
+        )
     val_loader = create_single_loader(
-        parquet_file=str(val_file), shuffle=False, **loader_args
+        parquet_file=str(val_file),
+        shuffle=False,
+        locality_order=locality_order,
+        embedding_cache_size=embedding_cache_size,
+        **loader_args,
     )
 
+    val_subset_loader = None
+    if val_subset_size > 0:
+        val_subset_loader = create_single_loader(
+            parquet_file=str(val_file),
+            shuffle=False,
+            locality_order=locality_order,
+            embedding_cache_size=embedding_cache_size,
+            subset_size=val_subset_size,
+            **loader_args,
+        )
+
     print(f"Train batches: {len(train_loader)}, Val batches: {len(val_loader)}")
-    return embedding_size, train_loader, val_loader
+    return embedding_size, train_loader, val_loader, val_subset_loader
 
 
-def train_model(
-    model_class: Type[pl.LightningModule],
-    model_kwargs: dict,
-    trainer_kwargs: dict,
+def device_trainer_kwargs(strategy: str, num_processes: int) -> dict:
+    """
+    Returns the accelerator, devices and strategy arguments of the Lightning Trainer.
+
+    'ddp_cpu' trains data-parallel in ``num_processes`` CPU processes: Lightning
+    starts one copy of this script per process, shards the train and validation
+    pairs across them with a DistributedSampler and averages the gradients of
+    every step.
+    """
+    if strategy == "ddp_cpu":
+        return {"accelerator": "cpu", "devices": num_processes, "strategy": "ddp"}
+    return {"accelerator": "auto", "devices": "auto"}
+
+
+class PairSamplerEpoch(Callback):
+    """
+    Reshuffles seeded PairBatchSamplers every epoch under DDP.
+
+    Lightning wraps custom samplers in a DistributedSamplerWrapper and calls
+    ``set_epoch`` only on the wrapper, so the wrapped sampler would draw the same
+    permutation in every epoch on Lightning releases that do not forward it.
+    """
+
+    def on_train_epoch_start(self, trainer, pl_module):
+        set_pair_sampler_epoch(trainer.train_dataloader, trainer.current_epoch)
+
+
+def effective_batch_size(args) -> int:
+    """Returns the number of pairs per optimizer step, over all DDP processes."""
+    num_processes = args.num_processes if args.strategy == "ddp_cpu" else 1
+    return args.batch_size * args.accumulate_grad_batches * num_processes
+
+
+def scaled_learning_rate(args) -> float:
+    """Scales --learning_rate from --base_batch_size to the effective batch size."""
+    ratio = effective_batch_size(args) / args.base_batch_size
+    if args.lr_scaling == "linear":
+        return args.learning_rate * ratio
+    if args.lr_scaling == "sqrt":
+        return args.learning_rate * math.sqrt(ratio)
+    return args.learning_rate
+
+
+def model_spec(
+    args, embedding_size: int, train_file: Path
+) -> Tuple[Type[pl.LightningModule], dict]:
+    """Returns the model class and constructor arguments of a trainable model type."""
+    model_kwargs = {
+        "embedding_size": embedding_size,
+        "learning_rate": scaled_learning_rate(args),
+        "warmup_steps": args.warmup_steps,
+    }
+    if args.param_name == MULTI_PARAM:
+        # One output per target parameter, trained with a NaN-masked loss on
+        # targets standardised by their train-set mean and standard deviation
+        model_kwargs["output_size"] = len(TARGET_PARAMS)
+        model_kwargs["target_names"] = list(TARGET_PARAMS)
+        means, stds = target_statistics(str(train_file))
+        model_kwargs["target_means"] = means
+        model_kwargs["target_stds"] = stds
+    if args.model_type == "fnn":
+        model_class = FNNPredictor
+        model_kwargs["hidden_size"] = args.hidden_size
+    elif args.model_type == "linear":
+        model_class = LinearRegressionPredictor
+    elif args.model_type == "linear_distance":
+        model_class = LinearDistancePredictor
+    else:
+        raise ValueError(f"Unknown trainable model_type: {args.model_type}")
+    return model_class, model_kwargs
+
+
+def training_hparams(args, paths: ExperimentPaths, embedding_size: int) -> dict:
+    """Returns the hyperparameters logged for a trained model (subset of args + derived)."""
+    hparams_to_log = {
+        "model_type": args.model_type,
+        "param_name": args.param_name,
+        "embedding_file": str(paths.embedding_file),
+        "data_dir": str(paths.data_dir),
+        "embedding_size": embedding_size,
+        "learning_rate": args.learning_rate,
+        "scaled_learning_rate": scaled_learning_rate(args),
+        "lr_scaling": args.lr_scaling,
+        "base_batch_size": args.base_batch_size,
+        "warmup_steps": args.warmup_steps,
+        "accumulate_grad_batches": args.accumulate_grad_batches,
+        "batch_size": args.batch_size,
+        "max_epochs": args.max_epochs,
+        "early_stopping_patience": args.early_stopping_patience,
+        "val_check_interval": args.val_check_interval,
+        "num_workers": args.num_workers,
+        "loader_mode": args.loader_mode,
+        "mmap_embeddings": args.mmap_embeddings,
+        "cache_pair_index": args.cache_pair_index,
+        "precompute_features": args.precompute_features,
+        "feature_dtype": args.feature_dtype,
+        "embedding_dtype": args.embedding_dtype,
+        "locality_order": args.locality_order,
+        "embedding_cache_size": args.embedding_cache_size,
+        "protein_batch_size": args.protein_batch_size,
+        "val_subset_size": args.val_subset_size,
+        "compile": args.compile,
+        "bf16": args.bf16,
+        "strategy": args.strategy,
+        "num_processes": args.num_processes,
+        "seed": args.seed,
+        "wandb_project": args.wandb_project,
+        "wandb_entity": args.wandb_entity,
+    }
+    if args.model_type == "fnn":
+        hparams_to_log["hidden_size"] = args.hidden_size
+    hparams_to_log["solver"] = args.solver
+    if args.solver == "exact":
+        hparams_to_log["ridge_lambdas"] = args.ridge_lambdas
+    return hparams_to_log
+
+
+def _patience_in_checks(early_stopping_patience: int, val_check_interval) -> int:
+    """Converts an early stopping patience in epochs into a number of validation checks."""
+    if isinstance(val_check_interval, float) and 0 < val_check_interval <= 1:
+        return max(1, int(early_stopping_patience / val_check_interval))
+    return early_stopping_patience
+
+
+def distance_baseline_hparams(
+    paths: ExperimentPaths,
+    param_name: str,
+    distance_metrics: List[str],
+    batch_size: int,
+    cache_pair_index: bool = False,
+    seed: int = DEFAULT_SEED,
+    wandb_project: str = DEFAULT_WANDB_PROJECT,
+    wandb_entity: Optional[str] = None,
+) -> dict:
+    """Returns the hyperparameters saved for a distance baseline run."""
+    return baseline_hparams(
+        paths,
+        param_name,
+        distance_metrics,
+        batch_size=batch_size,
+        seed=seed,
+        cache_pair_index=cache_pair_index,
+        wandb_project=wandb_project,
+        wandb_entity=wandb_entity,
+    )
+
+
+def save_local_hparams(experiment_dir: Path, hparams: dict):
+    """Writes the hparams of a run to hparams.yaml in its experiment directory."""
+    if rank_zero_only.rank != 0:
+        return
+    hparams_path = experiment_dir / "hparams.yaml"
+    with open(hparams_path, "w") as f:
+        yaml.dump(hparams, f)
+    print(f"Saved hyperparameters to {hparams_path}")
+
+
+def create_logger(
     paths: ExperimentPaths,
-    train_loader: DataLoader,
-    val_loader: DataLoader,
     hparams: dict,
+    logger_type: str = "csv",
     wandb_project: str = "which-plm",
     wandb_entity: str = None,
     resume_from_checkpoint: bool = False,
-) -> Tuple[str, WandbLogger, float]:
-    """Configure and run the PyTorch Lightning training loop for a given model."""
-    print(f"Configuring model ({model_class.__name__}) and trainer...")
+) -> Optional[Logger]:
+    """
+    Create the metrics logger of a run and log its hparams (None for 'none').
 
-    # Extract hyperparameters from hparams dict
-    early_stopping_patience = hparams.get("early_stopping_patience", 10)
-    val_check_interval = hparams.get("val_check_interval", 0.2)
-    batch_size = hparams.get("batch_size", 1024)
+    The local 'csv' and 'tensorboard' loggers write to ``logs/version_N`` in the
+    experiment directory and record that directory in ``run_id.txt``. Only
+    'wandb' contacts the network; it records its run ID in ``wandb_run_id.txt``
+    so that resumed training and evaluate.py log to the same run.
+    """
+    if logger_type not in LOGGER_TYPES:
+        raise ValueError(f"Unknown logger '{logger_type}'. Choose from: {LOGGER_TYPES}")
+    if logger_type == "none":
+        print("Metric logging disabled.")
+        return None
 
-    # Calculate actual patience based on val_check_interval
-    if isinstance(val_check_interval, float) and 0 < val_check_interval <= 1:
-        actual_patience = max(1, int(early_stopping_patience / val_check_interval))
+    if logger_type == "wandb":
+        logger = _create_wandb_logger(
+            paths, hparams, wandb_project, wandb_entity, resume_from_checkpoint
+        )
     else:
-        actual_patience = early_stopping_patience
+        logger_class = CSVLogger if logger_type == "csv" else TensorBoardLogger
+        logger = logger_class(save_dir=str(paths.experiment_dir), name="logs")
+        if rank_zero_only.rank == 0:
+            run_id = os.path.relpath(logger.log_dir, paths.experiment_dir)
+            (paths.experiment_dir / "run_id.txt").write_text(run_id)
+        print(f"Logging metrics ({logger_type}) to: {logger.log_dir}")
 
-    print(
-        f"Early stopping patience: {early_stopping_patience} epochs = {actual_patience} validation checks"
-    )
+    logger.log_hyperparams(hparams)
+    return logger
 
-    # Instantiate the selected model
-    model = model_class(**model_kwargs)
 
-    # Callbacks
-    checkpoint_callback = ModelCheckpoint(
-        dirpath=paths.checkpoints_dir,
-        save_top_k=1,
-        save_last=True,
-        monitor="val_loss",
-        mode="min",
-        filename="best-{epoch:02d}-{step}-{val_loss:.3f}",
-    )
-    early_stopping_callback = EarlyStopping(
-        monitor="val_loss",
-        patience=actual_patience,
-        mode="min",
-        verbose=True,
-    )
-    callbacks = [early_stopping_callback, checkpoint_callback]
+def _create_wandb_logger(
+    paths: ExperimentPaths,
+    hparams: dict,
+    wandb_project: str,
+    wandb_entity: Optional[str],
+    resume_from_checkpoint: bool,
+) -> WandbLogger:
+    """Create (or resume) the Weights & Biases logger of a run."""
+    import wandb
+
+    print("Initializing Weights & Biases...")
+    try:
+        wandb.login()
+        print("Successfully logged into Weights & Biases")
+    except Exception as e:
+        print(f"Warning: Could not log into wandb automatically: {e}")
+        print(
+            "Please run 'wandb login' manually or set WANDB_API_KEY environment variable"
+        )
 
     # Weights & Biases logger configuration
     embedding_name = Path(hparams["embedding_file"]).stem
@@ -145,8 +452,9 @@ def train_model(
         tags=[hparams["model_type"], hparams["param_name"]],
     )
 
-    # Save wandb run ID for future resuming (only for new runs)
-    if not wandb_run_id:
+    # Save wandb run ID for future resuming (only for new runs, and under DDP
+    # only in the process that owns the wandb run)
+    if not wandb_run_id and rank_zero_only.rank == 0:
         try:
             # Access experiment to ensure run is created
             _ = logger.experiment
@@ -158,9 +466,92 @@ def train_model(
             print(f"Warning: Could not save wandb run ID: {e}")
 
     print(f"Using Weights & Biases logging - Project: {wandb_project}, Run: {run_name}")
+    return logger
 
-    # Log hyperparameters to wandb
-    logger.log_hyperparams(hparams)
+
+def train_model(
+    model_class: Type[pl.LightningModule],
+    model_kwargs: dict,
+    trainer_kwargs: dict,
+    paths: ExperimentPaths,
+    train_loader: DataLoader,
+    val_loader: DataLoader,
+    hparams: dict,
+    logger_type: str = "csv",
+    wandb_project: str = "which-plm",
+    wandb_entity: str = None,
+    resume_from_checkpoint: bool = False,
+    compile_model: bool = False,
+    val_subset_loader: Optional[DataLoader] = None,
+) -> Tuple[str, Optional[Logger], float]:
+    """
+    Configure and run the PyTorch Lightning training loop for a given model.
+
+    With ``val_subset_loader``, intermediate validation checks score only that
+    subset (logged as ``val_loss_subset``); the full ``val_loader`` is scored at
+    the last check of each epoch, and early stopping and checkpoint selection
+    happen once per epoch on its ``val_loss``.
+    """
+    print(f"Configuring model ({model_class.__name__}) and trainer...")
+
+    # Extract hyperparameters from hparams dict
+    early_stopping_patience = hparams.get("early_stopping_patience", 10)
+    val_check_interval = hparams.get("val_check_interval", 0.2)
+    batch_size = hparams.get("batch_size", 1024)
+
+    if val_subset_loader is not None:
+        # The full val_loss only exists once per epoch
+        actual_patience = early_stopping_patience
+        print(
+            f"Early stopping patience: {early_stopping_patience} epochs "
+            "(full validation at epoch end, subset for intermediate checks)"
+        )
+    else:
+        # Calculate actual patience based on val_check_interval
+        actual_patience = _patience_in_checks(
+            early_stopping_patience, val_check_interval
+        )
+        print(
+            f"Early stopping patience: {early_stopping_patience} epochs = {actual_patience} validation checks"
+        )
+
+    # Instantiate the selected model
+    model = model_class(**model_kwargs)
+    if compile_model:
+        # Compiles forward in place, so checkpoints keep their usual state_dict keys
+        print("Compiling model with torch.compile...")
+        model.compile()
+
+    # Callbacks
+    checkpoint_callback = ModelCheckpoint(
+        dirpath=paths.checkpoints_dir,
+        save_top_k=1,
+        save_last=True,
+        monitor="val_loss",
+        mode="min",
+        filename="best-{epoch:02d}-{step}-{val_loss:.3f}",
+        save_on_train_epoch_end=val_subset_loader is not None,
+    )
+    early_stopping_callback = EarlyStopping(
+        monitor="val_loss",
+        patience=actual_patience,
+        mode="min",
+        verbose=True,
+        check_on_train_epoch_end=val_subset_loader is not None,
+    )
+    callbacks = [early_stopping_callback, checkpoint_callback, PairSamplerEpoch()]
+    if val_subset_loader is not None:
+        val_loader = SubsetValidationLoader(val_loader, val_subset_loader)
+        callbacks.append(SubsetValidationSwitch(val_loader))
+
+    logger = create_logger(
+        paths,
+        hparams,
+        logger_type,
+        wandb_project,
+        wandb_entity,
+        resume_from_checkpoint,
+    )
 
     # --- Trainer Setup ---
     # Calculate logging frequency to be consistent with validation
@@ -182,7 +573,7 @@ def train_model(
 
     trainer = pl.Trainer(
         callbacks=callbacks,
-        logger=logger,
+        logger=logger if logger is not None else False,
         log_every_n_steps=logging_steps,
         enable_checkpointing=True,
         enable_progress_bar=True,
@@ -217,37 +608,221 @@ def train_model(
     return best_model_path, logger, best_model_score
 
 
+def solve_model(
+    model_class: Type[pl.LightningModule],
+    model_kwargs: dict,
+    paths: ExperimentPaths,
+    train_loader: DataLoader,
+    val_loader: DataLoader,
+    hparams: dict,
+    ridge_lambdas: List[float],
+    logger_type: str = "csv",
+    wandb_project: str = "which-plm",
+    wandb_entity: str = None,
+) -> Tuple[str, Optional[Logger], float]:
+    """Fit a linear model in closed form (--solver exact) and save it as the best checkpoint."""
+    print(f"Solving {model_class.__name__} in closed form...")
+    model = model_class(**model_kwargs)
+    logger = create_logger(paths, hparams, logger_type, wandb_project, wandb_entity)
+
+    best_lambda, best_val_loss, val_losses = fit_exact(
+        model, train_loader, val_loader, ridge_lambdas
+    )
+    if logger is not None:
+        for ridge_lambda, val_loss in val_losses.items():
+            logger.log_metrics({"ridge_lambda": ridge_lambda, "val_loss": val_loss})
+        logger.log_metrics(
+            {"best_ridge_lambda": best_lambda, "val_loss": best_val_loss}
+        )
+        logger.finalize("success")
+
+    best_model_path = str(save_checkpoint(model, paths.checkpoints_dir, best_val_loss))
+    print(f"\nSolved with λ={best_lambda:g}. Best model saved at: {best_model_path}")
+    print(f"Best validation loss: {best_val_loss:.6f}")
+    return best_model_path, logger, best_val_loss
+
+
+def train_multi_embedding(args, dataset_dir: Path, models_base_dir: Path):
+    """
+    Train one model per --embedding_file in this process on a shared pair stream.
+
+    The pair tables are loaded once and every minibatch is gathered from all
+    embedding tables (see src/training/multi_embedding.py). Each model gets its
+    own experiment directory with hparams.yaml, best checkpoint and completion
+    marker, exactly like a separate single-embedding run.
+    """
+    if args.model_type == "euclidean":
+        raise ValueError(
+            "Several --embedding_file values require a trainable model type."
+        )
+    if (
+        args.solver == "exact"
+        or args.precompute_features
+        or args.resume_from_checkpoint
+        or args.protein_batch_size > 0
+        or args.accumulate_grad_batches > 1
+        or args.val_subset_size > 0
+        or args.strategy != "auto"
+        or args.logger == "wandb"
+    ):
+        raise ValueError(
+            "Training several embedding files at once does not support --solver exact, "
+            "--precompute_features, --protein_batch_size, --accumulate_grad_batches, "
+            "--val_subset_size, --strategy, --resume_from_checkpoint or --logger wandb."
+        )
+    # Minibatches are always gathered from loaded (or memory-mapped) tables
+    if (
+        args.loader_mode != "batched"
+        or args.locality_order
+        or args.embedding_cache_size > 0
+        or (args.mmap_embeddings and args.embedding_dtype != "float32")
+    ):
+        raise ValueError(
+            "Training several embedding files at once requires --loader_mode batched and "
+            "does not support --locality_order, --embedding_cache_size or "
+            "--embedding_dtype with --mmap_embeddings."
+        )
+    names = [embedding_file.stem for embedding_file in args.embedding_file]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Embedding file names must be unique, got: {names}")
+
+    project_root = Path(__file__).parent.parent.parent
+    exp_managers, paths_list = [], []
+    for name in names:
+        exp_manager = ExperimentManager(
+            dataset_dir=dataset_dir,
+            embedding_name=name,
+            model_type=args.model_type,
+            param_name=args.param_name,
+            models_base_dir=models_base_dir,
+        )
+        exp_managers.append(exp_manager)
+        paths_list.append(
+            exp_manager.create_experiment_paths(project_root=project_root)
+        )
+
+    print(f"Training {len(names)} {args.model_type} models on one pair stream: {names}")
+    hdf_files = [str(paths.embedding_file) for paths in paths_list]
+    if args.mmap_embeddings:
+        tables = [open_memmap_table(hdf_file) for hdf_file in hdf_files]
+    else:
+        tables = [
+            load_embedding_table(hdf_file, dtype=args.embedding_dtype)
+            for hdf_file in hdf_files
+        ]
+    loader_args = {
+        "hdf_files": hdf_files,
+        "embedding_tables": tables,
+        "param_name": args.param_name,
+        "batch_size": args.batch_size,
+        "num_workers": args.num_workers,
+        "cache_pair_index": args.cache_pair_index,
+    }
+    train_loader = create_multi_table_loader(
+        parquet_file=str(paths_list[0].train_file), shuffle=True, **loader_args
+    )
+    val_loader = create_multi_table_loader(
+        parquet_file=str(paths_list[0].val_file), shuffle=False, **loader_args
+    )
+    print(f"Train batches: {len(train_loader)}, Val batches: {len(val_loader)}")
+
+    models = []
+    for paths, hdf_file in zip(paths_list, hdf_files):
+        embedding_size = get_embedding_size(hdf_file)
+        model_class, model_kwargs = model_spec(args, embedding_size, paths.train_file)
+        model = model_class(**model_kwargs)
+        if args.compile:
+            model.compile()
+        models.append(model)
+
+        hparams_to_log = training_hparams(args, paths, embedding_size)
+        hparams_to_log["multi_embedding"] = names
+        save_local_hparams(paths.experiment_dir, hparams_to_log)
+
+    actual_patience = _patience_in_checks(
+        args.early_stopping_patience, args.val_check_interval
+    )
+    checkpoint_callback = PerModelCheckpoint(
+        [paths.checkpoints_dir for paths in paths_list], patience=actual_patience
+    )
+    # Metrics of all models go to one log next to their experiment directories
+    log_paths = replace(
+        paths_list[0],
+        experiment_dir=paths_list[0].experiment_dir.parent / "multi_embedding_logs",
+    )
+    log_paths.experiment_dir.mkdir(exist_ok=True)
+    logger = create_logger(
+        log_paths,
+        {
+            key: value
+            for key, value in hparams_to_log.items()
+            if key not in ["embedding_file", "embedding_size"]
+        },
+        args.logger,
+    )
+    trainer = pl.Trainer(
+        callbacks=[checkpoint_callback],
+        logger=logger if logger is not None else False,
+        enable_checkpointing=False,
+        enable_progress_bar=True,
+        val_check_interval=args.val_check_interval,
+        max_epochs=args.max_epochs,
+        accelerator="auto",
+        devices="auto",
+        precision=resolve_precision(args.bf16),
+    )
+
+    print("Starting training...")
+    trainer.fit(MultiEmbeddingPredictor(models, names), train_loader, val_loader)
+
+    for name, exp_manager, paths, best_model_path, best_model_score in zip(
+        names,
+        exp_managers,
+        paths_list,
+        checkpoint_callback.best_model_paths,
+        checkpoint_callback.best_scores,
+    ):
+        if not best_model_path:
+            print(f"Warning: No checkpoint was saved for {name}.")
+            continue
+        exp_manager.create_completion_marker(
+            paths.experiment_dir, best_model_path, best_model_score
+        )
+        print(
+            f"{name}: best validation loss {best_model_score:.6f} ({best_model_path})"
+        )
+
+    if logger is not None:
+        print(f"\nMetrics logged to: {logger.log_dir}")
+    # Print the experiment dir paths for the runner script
+    for paths in paths_list:
+        print(str(paths.experiment_dir.resolve()))
+
+
 def main(args):
     """Main workflow orchestrator for training or Euclidean baseline setup."""
     setup_environment(args.seed)
 
-    # Initialize wandb for all model types except euclidean baseline
-    if args.model_type != "euclidean":
-        print("Initializing Weights & Biases...")
-        try:
-            wandb.login()
-            print("Successfully logged into Weights & Biases")
-        except Exception as e:
-            print(f"Warning: Could not log into wandb automatically: {e}")
-            print(
-                "Please run 'wandb login' manually or set WANDB_API_KEY environment variable"
-            )
-
-    # Create experiment manager
     # Determine dataset directory - if data_dir is 'sets', get parent; otherwise use data_dir
     if args.data_dir.name == "sets":
         dataset_dir = args.data_dir.parent
     else:
         dataset_dir = args.data_dir
+    # Go up 4 levels: embedding/param/model/dataset -> models
+    models_base_dir = args.output_base_dir.parents[3]
 
+    if len(args.embedding_file) > 1:
+        train_multi_embedding(args, dataset_dir, models_base_dir)
+        return
+    args.embedding_file = args.embedding_file[0]
+
+    # Create experiment manager
     exp_manager = ExperimentManager(
         dataset_dir=dataset_dir,
         embedding_name=args.embedding_file.stem,
         model_type=args.model_type,
         param_name=args.param_name,
-        models_base_dir=args.output_base_dir.parents[
-            3
-        ],  # Go up 4 levels: embedding/param/model/dataset -> models
+        models_base_dir=models_base_dir,
     )
 
     # Create experiment paths
@@ -255,37 +830,37 @@ def main(args):
         project_root=Path(__file__).parent.parent.parent
     )
 
-    # --- Euclidean Baseline Setup Only ---
+    # --- Distance Baseline: no training, test predictions computed directly ---
     if args.model_type == "euclidean":
         print("Setting up directory for Euclidean Distance Baseline...")
 
         # Euclidean baseline doesn't use wandb, so save hparams locally
-        try:
-            embedding_size = get_embedding_size(str(paths.embedding_file))
-        except Exception as e:
-            print(f"Warning: Could not get embedding size: {e}")
-            embedding_size = -1
-
-        hparams_to_log = {
-            "model_type": args.model_type,
-            "param_name": args.param_name,
-            "embedding_file": str(paths.embedding_file),
-            "data_dir": str(paths.data_dir),
-            "embedding_size": embedding_size,
-            "batch_size": args.batch_size,
-            "seed": args.seed,
-            "wandb_project": args.wandb_project,
-            "wandb_entity": args.wandb_entity,
-        }
+        hparams_to_log = distance_baseline_hparams(
+            paths,
+            args.param_name,
+            args.distance_metrics,
+            args.batch_size,
+            cache_pair_index=args.cache_pair_index,
+            seed=args.seed,
+            wandb_project=args.wandb_project,
+            wandb_entity=args.wandb_entity,
+        )
 
-        hparams_path = paths.experiment_dir / "hparams.yaml"
         try:
-            with open(hparams_path, "w") as f:
-                yaml.dump(hparams_to_log, f)
-            print(f"Saved hyperparameters to {hparams_path} (euclidean baseline)")
+            save_local_hparams(paths.experiment_dir, hparams_to_log)
         except Exception as e:
             print(f"Warning: Could not save hyperparameters: {e}")
 
+        if paths.test_file is not None:
+            compute_distance_baselines(
+                paths.embedding_file,
+                paths.test_file,
+                [(args.param_name, paths.experiment_dir)],
+                args.distance_metrics,
+                use_cache=args.cache_pair_index,
+                mmap_embeddings=args.mmap_embeddings,
+            )
+
         print("\nEuclidean baseline setup complete.")
         print(f"Experiment directory: {paths.experiment_dir}")
 
@@ -299,70 +874,114 @@ def main(args):
 
     # --- Standard Model Training ---
     else:
-        embedding_size, train_loader, val_loader = prepare_data(
+        if args.solver == "exact" and args.model_type not in EXACT_MODEL_TYPES:
+            raise ValueError(
+                f"--solver exact is only supported for model types {EXACT_MODEL_TYPES}."
+            )
+        if args.solver == "exact" and args.param_name == MULTI_PARAM:
+            raise ValueError("--solver exact does not support --param_name multi.")
+        if args.protein_batch_size > 0 and (
+            args.solver == "exact" or args.precompute_features
+        ):
+            raise ValueError(
+                "--protein_batch_size does not support --solver exact or "
+                "--precompute_features."
+            )
+        if args.strategy == "ddp_cpu" and (
+            args.solver == "exact"
+            or args.precompute_features
+            or args.protein_batch_size > 0
+            or args.val_subset_size > 0
+            or args.loader_mode == "device"
+        ):
+            raise ValueError(
+                "--strategy ddp_cpu does not support --solver exact, --precompute_features, "
+                "--protein_batch_size, --val_subset_size or --loader_mode device."
+            )
+        if args.num_processes < 1:
+            raise ValueError("--num_processes must be at least 1.")
+        if args.precompute_features and args.model_type != "linear_distance":
+            raise ValueError(
+                "--precompute_features is only supported for model_type 'linear_distance'."
+            )
+        embedding_size, train_loader, val_loader, val_subset_loader = prepare_data(
             param_name=args.param_name,
             batch_size=args.batch_size,
             embeddings_file=paths.embedding_file,
             train_file=paths.train_file,
             val_file=paths.val_file,
             num_workers=args.num_workers,
+            loader_mode=args.loader_mode,
+            mmap_embeddings=args.mmap_embeddings,
+            cache_pair_index=args.cache_pair_index,
+            precompute_features=args.precompute_features,
+            feature_dtype=args.feature_dtype,
+            embedding_dtype=args.embedding_dtype,
+            locality_order=args.locality_order,
+            embedding_cache_size=args.embedding_cache_size,
+            protein_batch_size=args.protein_batch_size,
+            val_subset_size=args.val_subset_size,
+            # All DDP processes must draw the same shuffled order before sharding it
+            shuffle_seed=args.seed if args.strategy == "ddp_cpu" else None,
         )
 
         # Prepare model arguments
-        model_kwargs = {
-            "embedding_size": embedding_size,
-            "learning_rate": args.learning_rate,
-        }
-        if args.model_type == "fnn":
-            model_class = FNNPredictor
-            model_kwargs["hidden_size"] = args.hidden_size
-        elif args.model_type == "linear":
-            model_class = LinearRegressionPredictor
-        elif args.model_type == "linear_distance":
-            model_class = LinearDistancePredictor
-        else:
-            raise ValueError(f"Unknown trainable model_type: {args.model_type}")
+        model_class, model_kwargs = model_spec(args, embedding_size, paths.train_file)
 
         # Prepare trainer arguments
         trainer_kwargs = {
             "max_epochs": args.max_epochs,
-            "accelerator": "auto",
-            "devices": "auto",
+            **device_trainer_kwargs(args.strategy, args.num_processes),
+            "precision": resolve_precision(args.bf16),
+            "accumulate_grad_batches": args.accumulate_grad_batches,
         }
+        if args.lr_scaling != "none":
+            print(
+                f"Scaled learning rate ({args.lr_scaling}): {args.learning_rate:g} -> "
+                f"{model_kwargs['learning_rate']:g} for an effective batch size of "
+                f"{effective_batch_size(args)}"
+            )
 
-        # Prepare hyperparameters to log (subset of args + derived)
-        hparams_to_log = {
-            "model_type": args.model_type,
-            "param_name": args.param_name,
-            "embedding_file": str(paths.embedding_file),
-            "data_dir": str(paths.data_dir),
-            "embedding_size": embedding_size,
-            "learning_rate": args.learning_rate,
-            "batch_size": args.batch_size,
-            "max_epochs": args.max_epochs,
-            "early_stopping_patience": args.early_stopping_patience,
-            "val_check_interval": args.val_check_interval,
-            "num_workers": args.num_workers,
-            "seed": args.seed,
-            "wandb_project": args.wandb_project,
-            "wandb_entity": args.wandb_entity,
-        }
-        if args.model_type == "fnn":
-            hparams_to_log["hidden_size"] = args.hidden_size
-
-        # Train model
-        best_model_path, _, best_model_score = train_model(
-            model_class=model_class,
-            model_kwargs=model_kwargs,
-            trainer_kwargs=trainer_kwargs,
-            paths=paths,
-            train_loader=train_loader,
-            val_loader=val_loader,
-            hparams=hparams_to_log,
-            wandb_project=args.wandb_project,
-            wandb_entity=args.wandb_entity,
-            resume_from_checkpoint=args.resume_from_checkpoint,
-        )
+        # Prepare hyperparameters to log (subset of args + derived); the local
+        # hparams.yaml lets evaluate.py load them without the metrics logger
+        hparams_to_log = training_hparams(args, paths, embedding_size)
+        save_local_hparams(paths.experiment_dir, hparams_to_log)
+
+        if args.solver == "exact":
+            # One pass over the data instead of gradient-based training
+            best_model_path, _, best_model_score = solve_model(
+                model_class=model_class,
+                model_kwargs=model_kwargs,
+                paths=paths,
+                train_loader=train_loader,
+                val_loader=val_loader,
+                hparams=hparams_to_log,
+                ridge_lambdas=args.ridge_lambdas,
+                logger_type=args.logger,
+                wandb_project=args.wandb_project,
+                wandb_entity=args.wandb_entity,
+            )
+        else:
+            # Train model
+            best_model_path, _, best_model_score = train_model(
+                model_class=model_class,
+                model_kwargs=model_kwargs,
+                trainer_kwargs=trainer_kwargs,
+                paths=paths,
+                train_loader=train_loader,
+                val_loader=val_loader,
+                hparams=hparams_to_log,
+                logger_type=args.logger,
+                wandb_project=args.wandb_project,
+                wandb_entity=args.wandb_entity,
+                resume_from_checkpoint=args.resume_from_checkpoint,
+                compile_model=args.compile,
+                val_subset_loader=val_subset_loader,
+            )
+
+        if rank_zero_only.rank != 0:
+            # Under DDP, only the first process records the finished run
+            return
 
         # Create completion marker using the experiment manager
         exp_manager.create_completion_marker(
@@ -375,7 +994,8 @@ def main(args):
         print(
             f"\nRun completed successfully. Best checkpoint saved to: {best_model_path}"
         )
-        print("View logs and metrics at: https://wandb.ai")
+        if args.logger == "wandb":
+            print("View logs and metrics at: https://wandb.ai")
         print(
             "\nTo evaluate the best model, run evaluate.py using the experiment directory:"
         )
@@ -386,7 +1006,8 @@ def main(args):
         print(str(paths.experiment_dir.resolve()))
 
 
-if __name__ == "__main__":
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parses the train.py command line (``argv`` defaults to sys.argv[1:])."""
     parser = argparse.ArgumentParser(
         description="Train a specified model or calculate Euclidean baseline."
     )
@@ -399,13 +1020,24 @@ if __name__ == "__main__":
         choices=["fnn", "linear", "euclidean", "linear_distance"],
         help="Type of model to train or baseline to set up.",
     )
+    parser.add_argument(
+        "--distance_metrics",
+        type=str,
+        nargs="+",
+        default=["euclidean"],
+        choices=DISTANCE_METRICS,
+        help="Distances between the pair embeddings computed as test predictions of the "
+        "euclidean baseline (default: euclidean).",
+    )
 
     # --- Input Data Paths ---
     parser.add_argument(
         "--embedding_file",
         type=Path,
+        nargs="+",
         required=True,
-        help="Absolute path to the embedding HDF5 file.",
+        help="Absolute path to the embedding HDF5 file. With several files, one model per file "
+        "is trained in this process on the same shuffled pairs (pair tables are loaded once).",
     )
     parser.add_argument(
         "--data_dir",
@@ -417,8 +1049,9 @@ if __name__ == "__main__":
         "--param_name",
         type=str,
         required=True,
-        choices=["fident", "alntmscore", "hfsp"],
-        help="Target parameter name to train the model for.",
+        choices=[*TARGET_PARAMS, MULTI_PARAM],
+        help="Target parameter name to train the model for. 'multi' trains one model with an "
+        "output per parameter (fident, alntmscore, hfsp) in a single pass over the pairs.",
     )
 
     # --- Output Location ---
@@ -439,6 +1072,34 @@ if __name__ == "__main__":
     parser.add_argument(
         "--batch_size", type=int, default=1024, help="Batch size (default: 1024)"
     )
+    parser.add_argument(
+        "--lr_scaling",
+        type=str,
+        default="none",
+        choices=["none", "linear", "sqrt"],
+        help="Scale --learning_rate with the effective batch size (batch_size x "
+        "accumulate_grad_batches x DDP processes) relative to --base_batch_size, linearly or by its square "
+        "root, for large-batch training (default: none).",
+    )
+    parser.add_argument(
+        "--base_batch_size",
+        type=int,
+        default=1024,
+        help="Batch size that --learning_rate was tuned for (default: 1024).",
+    )
+    parser.add_argument(
+        "--warmup_steps",
+        type=int,
+        default=0,
+        help="Linearly warm up the learning rate over this many optimizer steps "
+        "(default: 0 = no warmup).",
+    )
+    parser.add_argument(
+        "--accumulate_grad_batches",
+        type=int,
+        default=1,
+        help="Accumulate gradients over this many batches per optimizer step (default: 1).",
+    )
     parser.add_argument(
         "--max_epochs",
         type=int,
@@ -459,7 +1120,18 @@ if __name__ == "__main__":
         help="How often to run validation during training. Float = fraction of epoch (0.2 = 5 times per epoch), Int = every N steps (default: 0.2)",
     )
     parser.add_argument(
-        "--seed", type=int, default=42, help="Random seed (default: 42)"
+        "--val_subset_size",
+        type=int,
+        default=0,
+        help="Score only a fixed, target-stratified random subset of this many validation pairs "
+        "at intermediate checks; the full validation set is scored at the last check of each "
+        "epoch, which drives early stopping and checkpointing (default: 0 = always full).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=DEFAULT_SEED,
+        help=f"Random seed (default: {DEFAULT_SEED})",
     )
     parser.add_argument(
         "--num_workers",
@@ -467,6 +1139,119 @@ if __name__ == "__main__":
         default=4,
         help="Number of DataLoader workers (default: 4)",
     )
+    parser.add_argument(
+        "--loader_mode",
+        type=str,
+        default="h5",
+        choices=LOADER_MODES,
+        help="How embeddings are served to the DataLoader: 'h5' reads each sample from the HDF5 file, "
+        "'memory' preloads all embeddings into one contiguous matrix, 'batched' additionally gathers "
+        "whole minibatches with one vectorized index, 'device' uploads the matrix and pair indices "
+        "to the training device once and slices batches there without workers (default: h5)",
+    )
+    parser.add_argument(
+        "--mmap_embeddings",
+        action="store_true",
+        help="Memory-map the embedding matrix of a contiguous packed store instead of loading it "
+        "(requires --loader_mode memory, batched or device).",
+    )
+    parser.add_argument(
+        "--cache_pair_index",
+        action="store_true",
+        help="Cache the integer-indexed pair tables as .npz files next to the parquet files and "
+        "reuse them while the parquet and embedding files are unchanged.",
+    )
+
+    parser.add_argument(
+        "--embedding_dtype",
+        type=str,
+        default="float32",
+        choices=TABLE_DTYPES,
+        help="In-memory storage dtype of the embedding table (float16, bfloat16 or per-row-scaled "
+        "int8 reduce memory 2-4x; rows are upcast to float32 per batch). Requires --loader_mode "
+        "memory, batched or device without --mmap_embeddings (default: float32).",
+    )
+    parser.add_argument(
+        "--locality_order",
+        action="store_true",
+        help="Serve validation (and later test) pairs sorted by query and target protein, so "
+        "embeddings are read in file order. Predictions are restored to the parquet row order.",
+    )
+    parser.add_argument(
+        "--embedding_cache_size",
+        type=int,
+        default=0,
+        help="Number of embeddings kept per worker in an LRU cache when reading validation/test "
+        "pairs from HDF5 (--loader_mode h5); most useful with --locality_order (default: 0 = off).",
+    )
+    parser.add_argument(
+        "--protein_batch_size",
+        type=int,
+        default=0,
+        help="Train on protein minibatches: take up to this many proteins per step (random seed "
+        "proteins plus their pair partners), gather (and for fnn encode) each once, and score all "
+        "labelled train pairs among them. An epoch seeds every protein once and covers nearly all "
+        "train pairs in about (proteins + 2 * pairs) / protein_batch_size steps. Validation still "
+        "uses all pairs (default: 0 = pair minibatches).",
+    )
+    parser.add_argument(
+        "--precompute_features",
+        action="store_true",
+        help="Precompute the squared-difference pair features once per split and embedding file "
+        "and stream them from a memory-mapped file (linear_distance only).",
+    )
+    parser.add_argument(
+        "--feature_dtype",
+        type=str,
+        default="float32",
+        choices=FEATURE_DTYPES,
+        help="Storage dtype of precomputed pair features (default: float32).",
+    )
+
+    parser.add_argument(
+        "--solver",
+        type=str,
+        default="adam",
+        choices=["adam", "exact"],
+        help="'adam' trains with Lightning; 'exact' solves the least-squares problem of the linear "
+        "model types in closed form from one pass over the train and val data (default: adam).",
+    )
+    parser.add_argument(
+        "--ridge_lambdas",
+        type=float,
+        nargs="+",
+        default=[0.0],
+        help="Ridge penalties tried by --solver exact; the one with the lowest validation MSE is "
+        "kept (default: 0.0).",
+    )
+
+    parser.add_argument(
+        "--strategy",
+        type=str,
+        default="auto",
+        choices=["auto", "ddp_cpu"],
+        help="'auto' trains in one process on the best available device; 'ddp_cpu' trains "
+        "data-parallel in --num_processes CPU processes, each on its own shard of the pairs "
+        "(default: auto).",
+    )
+    parser.add_argument(
+        "--num_processes",
+        type=int,
+        default=1,
+        help="Number of CPU processes for --strategy ddp_cpu; each uses cpu_count / "
+        "num_processes threads (default: 1).",
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Compile the model's forward pass with torch.compile (also on CPU).",
+    )
+    parser.add_argument(
+        "--bf16",
+        action="store_true",
+        help="Train with bfloat16 autocast (Lightning 'bf16-mixed') where the GPU or CPU "
+        "supports it; falls back to float32 otherwise. Combines with --compile.",
+    )
 
     # --- Model Specific Hyperparameters ---
     # Only relevant for FNN
@@ -477,12 +1262,23 @@ if __name__ == "__main__":
         help="Hidden layer size for FNN model (default: 64) - Ignored for linear model.",
     )
 
+    # --- Logging ---
+    parser.add_argument(
+        "--logger",
+        type=str,
+        default="csv",
+        choices=LOGGER_TYPES,
+        help="Metrics logger: 'csv' and 'tensorboard' write to logs/ in the experiment "
+        "directory without network access ('tensorboard' needs the tensorboard package), "
+        "'wandb' logs to Weights & Biases, 'none' disables logging (default: csv).",
+    )
+
     # --- Weights & Biases Configuration ---
     parser.add_argument(
         "--wandb_project",
         type=str,
-        default="which-plm",
-        help="Weights & Biases project name (default: which-plm).",
+        default=DEFAULT_WANDB_PROJECT,
+        help=f"Weights & Biases project name (default: {DEFAULT_WANDB_PROJECT}).",
     )
     parser.add_argument(
         "--wandb_entity",
@@ -496,6 +1292,8 @@ if __name__ == "__main__":
         help="Resume training from the latest checkpoint in the experiment directory.",
     )
 
-    args = parser.parse_args()
+    return parser.parse_args(argv)
 
-    main(args)
+
+if __name__ == "__main__":
+    main(parse_args())
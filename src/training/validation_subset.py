@@ -0,0 +1,43 @@
+"""
+Validation on a fixed subset for the intermediate checks of an epoch.
+
+With ``val_check_interval=0.2`` the whole validation set is scored five times per
+epoch. ``SubsetValidationLoader`` wraps the full validation loader and a loader
+over a fixed, target-stratified random subset (``create_single_loader(...,
+subset_size=N)``); ``SubsetValidationSwitch`` selects the full set only for the
+last validation check of each epoch. Subset checks are logged as
+``val_loss_subset``, so ``val_loss``, which early stopping and checkpoint
+selection monitor, always refers to the full validation set.
+"""
+
+from pytorch_lightning.callbacks import Callback
+
+
+class SubsetValidationLoader:
+    """Iterates the full or the subset validation loader, as selected by ``full``."""
+
+    def __init__(self, full_loader, subset_loader):
+        self.full_loader = full_loader
+        self.subset_loader = subset_loader
+        self.full = True
+        # Validation outputs are never mapped back to parquet order
+        self.row_order = None
+
+    def __len__(self):
+        return len(self.full_loader)
+
+    def __iter__(self):
+        return iter(self.full_loader if self.full else self.subset_loader)
+
+
+class SubsetValidationSwitch(Callback):
+    """Scores the full validation set only for the last validation check of an epoch."""
+
+    def __init__(self, loader: SubsetValidationLoader):
+        self.loader = loader
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        # Runs before the validation check (if any) that follows this batch
+        full = batch_idx + 1 + trainer.val_check_batch > trainer.num_training_batches
+        self.loader.full = full
+        pl_module.val_metric_suffix = "" if full else "_subset"
@@ -0,0 +1,89 @@
+"""Shared fixtures: toy embedding files and pair tables over PROTEIN_IDS."""
+
+from pathlib import Path
+from typing import Optional, Sequence
+
+import h5py
+import numpy as np
+import polars as pl
+import pytest
+
+EMBEDDING_SIZE = 8
+PROTEIN_IDS = [f"P{i:03d}" for i in range(20)]
+
+
+def write_embeddings(path: Path, dtype=np.float32, seed: int = 0) -> Path:
+    """Writes a one-dataset-per-protein HDF5 file of random embeddings."""
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with h5py.File(path, "w") as f:
+        for protein_id in PROTEIN_IDS:
+            f.create_dataset(
+                protein_id, data=rng.normal(size=(1, EMBEDDING_SIZE)).astype(dtype)
+            )
+    return path
+
+
+def write_pairs(
+    path: Path,
+    columns: Sequence[str] = ("fident",),
+    n_pairs: int = 50,
+    seed: int = 1,
+    with_gaps: bool = False,
+) -> Path:
+    """
+    Writes a pair table of random protein pairs with uniform values per column.
+
+    With ``with_gaps``, the first pair's query has no embedding and the second
+    pair's values are null.
+    """
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(PROTEIN_IDS, size=n_pairs).tolist()
+    targets = rng.choice(PROTEIN_IDS, size=n_pairs).tolist()
+    values = {column: rng.random(n_pairs).tolist() for column in columns}
+    if with_gaps:
+        queries[0] = "MISSING"
+        for column in columns:
+            values[column][1] = None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pl.DataFrame({"query": queries, "target": targets, **values}).write_parquet(path)
+    return path
+
+
+@pytest.fixture
+def embeddings_file(tmp_path):
+    """A small one-dataset-per-protein HDF5 file."""
+    return write_embeddings(tmp_path / "embeddings.h5", dtype=np.float16)
+
+
+@pytest.fixture
+def pairs_file(tmp_path):
+    """A small pair table, including a missing protein and a null target."""
+    return write_pairs(tmp_path / "train.parquet", with_gaps=True)
+
+
+@pytest.fixture
+def toy_dataset(tmp_path):
+    """
+    Returns a factory writing a dataset in the layout the experiment tools expect.
+
+    ``write(splits, columns, n_pairs, sets_dir)`` writes ``embeddings/toy.h5``
+    under ``tmp_path / "data" / "toy"`` and a ``<split>.parquet`` pair table per
+    split to ``sets_dir`` (default: the dataset's ``sets`` directory), and returns
+    ``(embedding_file, sets_dir)``.
+    """
+    dataset_dir = tmp_path / "data" / "toy"
+
+    def write(
+        splits: Sequence[str] = ("train", "val", "test"),
+        columns: Sequence[str] = ("fident",),
+        n_pairs: int = 50,
+        sets_dir: Optional[Path] = None,
+    ):
+        embedding_file = write_embeddings(dataset_dir / "embeddings" / "toy.h5")
+        sets_dir = Path(sets_dir) if sets_dir is not None else dataset_dir / "sets"
+        for seed, split in enumerate(splits, start=1):
+            write_pairs(sets_dir / f"{split}.parquet", columns, n_pairs, seed=seed)
+        return embedding_file, sets_dir
+
+    return write
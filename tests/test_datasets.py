@@ -0,0 +1,632 @@
+import pickle
+
+import h5py
+import numpy as np
+import polars as pl
+import pytest
+from lightning_fabric.utilities.data import _set_sampler_epoch
+from lightning_fabric.utilities.distributed import DistributedSamplerWrapper
+from pytorch_lightning.trainer.connectors.data_connector import (
+    _get_distributed_sampler,
+)
+from pytorch_lightning.utilities.data import _is_dataloader_shuffled, _update_dataloader
+from torch.utils.data import DataLoader, DistributedSampler
+
+from src.shared import datasets
+from src.shared.datasets import (
+    DevicePairLoader,
+    H5PyDataset,
+    PairBatchSampler,
+    ProteinBatchDataset,
+    ProteinNeighbourhoodSampler,
+    create_feature_loader,
+    create_multi_table_loader,
+    create_single_loader,
+    load_indexed_pairs,
+    restore_pair_order,
+    set_pair_sampler_epoch,
+)
+from src.shared.embedding_store import (
+    EmbeddingTable,
+    convert_to_packed,
+    load_embedding_table,
+    open_memmap_table,
+    read_embedding_ids,
+    read_embedding_size,
+)
+from tests.conftest import EMBEDDING_SIZE, PROTEIN_IDS, write_embeddings
+
+
+@pytest.fixture
+def packed_embeddings_file(tmp_path, embeddings_file):
+    """Converts the per-protein HDF5 file into the packed layout."""
+    path = tmp_path / "embeddings_packed.h5"
+    convert_to_packed(embeddings_file, path, chunk_rows=8)
+    return path
+
+
+def _collect(loader):
+    queries, targets, values = [], [], []
+    for query_emb, target_emb, value in loader:
+        queries.append(np.asarray(query_emb))
+        targets.append(np.asarray(target_emb))
+        values.append(np.asarray(value))
+    return np.concatenate(queries), np.concatenate(targets), np.concatenate(values)
+
+
+def test_embedding_table_matches_hdf5(embeddings_file):
+    table = load_embedding_table(str(embeddings_file))
+    assert len(table) == len(PROTEIN_IDS)
+    assert table.embedding_size == EMBEDDING_SIZE
+    assert table.embeddings.dtype == np.float32
+    with h5py.File(embeddings_file, "r") as f:
+        for protein_id in PROTEIN_IDS:
+            expected = f[protein_id][()].reshape(-1).astype(np.float32)
+            np.testing.assert_array_equal(table.get(protein_id), expected)
+
+
+def test_embedding_table_subset(embeddings_file):
+    table = load_embedding_table(str(embeddings_file), ["P001", "P005", "UNKNOWN"])
+    assert sorted(table.ids) == ["P001", "P005"]
+    assert "UNKNOWN" not in table
+
+
+def test_memory_loader_matches_h5_loader(embeddings_file, pairs_file):
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "hdf_file": str(embeddings_file),
+        "param_name": "fident",
+        "batch_size": 16,
+        "num_workers": 0,
+    }
+    h5_loader = create_single_loader(loader_mode="h5", **loader_args)
+    memory_loader = create_single_loader(loader_mode="memory", **loader_args)
+
+    assert isinstance(memory_loader.dataset, H5PyDataset)
+    assert memory_loader.dataset.embedding_table is not None
+    # The null value and the missing protein are filtered out
+    assert len(memory_loader.dataset) == 48
+
+    for expected, actual in zip(_collect(h5_loader), _collect(memory_loader)):
+        np.testing.assert_array_equal(expected, actual)
+
+
+def test_unknown_loader_mode(embeddings_file, pairs_file):
+    with pytest.raises(ValueError):
+        create_single_loader(
+            str(pairs_file), str(embeddings_file), "fident", loader_mode="unknown"
+        )
+
+
+def test_batched_loader_matches_h5_loader(embeddings_file, pairs_file):
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "hdf_file": str(embeddings_file),
+        "param_name": "fident",
+        "batch_size": 16,
+        "num_workers": 0,
+    }
+    h5_loader = create_single_loader(loader_mode="h5", **loader_args)
+    batched_loader = create_single_loader(loader_mode="batched", **loader_args)
+
+    assert len(batched_loader) == len(h5_loader) == 3
+    query_emb, target_emb, values = next(iter(batched_loader))
+    assert query_emb.shape == target_emb.shape == (16, EMBEDDING_SIZE)
+    assert values.shape == (16,)
+
+    for expected, actual in zip(_collect(h5_loader), _collect(batched_loader)):
+        np.testing.assert_array_equal(expected, actual)
+
+
+def test_device_loader_matches_h5_loader(embeddings_file, pairs_file):
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "hdf_file": str(embeddings_file),
+        "param_name": "fident",
+        "batch_size": 16,
+        "num_workers": 0,
+    }
+    h5_loader = create_single_loader(loader_mode="h5", **loader_args)
+    device_loader = create_single_loader(
+        loader_mode="device", device="cpu", **loader_args
+    )
+
+    assert isinstance(device_loader, DevicePairLoader)
+    assert len(device_loader) == len(h5_loader) == 3
+    for expected, actual in zip(_collect(h5_loader), _collect(device_loader)):
+        np.testing.assert_array_equal(expected, actual)
+
+    shuffled = create_single_loader(
+        loader_mode="device", device="cpu", shuffle=True, **loader_args
+    )
+    expected_values = np.sort(_collect(h5_loader)[2])
+    np.testing.assert_array_equal(np.sort(_collect(shuffled)[2]), expected_values)
+
+
+def test_pair_batch_sampler_covers_all_indices():
+    sampler = PairBatchSampler(num_samples=10, batch_size=4, shuffle=True)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 3
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert sorted(np.concatenate(batches).tolist()) == list(range(10))
+
+
+def test_seeded_pair_batch_sampler_reshuffles_across_ddp_epochs(monkeypatch):
+    # Lightning releases that do not forward set_epoch to the wrapped sampler
+    monkeypatch.setattr(
+        DistributedSamplerWrapper, "set_epoch", DistributedSampler.set_epoch
+    )
+
+    def ddp_loader(rank):
+        # How Lightning replaces the sampler of a train loader under DDP
+        loader = DataLoader(
+            list(range(24)),
+            batch_size=None,
+            sampler=PairBatchSampler(
+                num_samples=24, batch_size=4, shuffle=True, seed=7
+            ),
+        )
+        sampler = _get_distributed_sampler(
+            loader,
+            shuffle=_is_dataloader_shuffled(loader),
+            overfit_batches=0,
+            num_replicas=2,
+            rank=rank,
+        )
+        return _update_dataloader(loader, sampler)
+
+    loaders = [ddp_loader(rank) for rank in [0, 1]]
+    assert not loaders[0].sampler.shuffle
+
+    def epoch_batches(loader, epoch):
+        _set_sampler_epoch(loader, epoch)
+        assert set_pair_sampler_epoch(loader, epoch)
+        return np.concatenate(list(loader.sampler))
+
+    shards_per_epoch = []
+    for epoch in [0, 1, 2]:
+        shards = [epoch_batches(loader, epoch) for loader in loaders]
+        assert len(shards[0]) == len(shards[1]) == 12
+        assert sorted(np.concatenate(shards).tolist()) == list(range(24))
+        shards_per_epoch.append(shards[0])
+    assert not np.array_equal(shards_per_epoch[0], shards_per_epoch[1])
+    assert not np.array_equal(shards_per_epoch[1], shards_per_epoch[2])
+
+
+@pytest.mark.parametrize("read_block_bytes", [None, 1])
+def test_packed_store_roundtrip(
+    monkeypatch, embeddings_file, packed_embeddings_file, read_block_bytes
+):
+    if read_block_bytes is not None:
+        # One chunk (of 8 rows) per read block
+        monkeypatch.setattr(
+            "src.shared.embedding_store.READ_BLOCK_BYTES", read_block_bytes
+        )
+    assert list(read_embedding_ids(packed_embeddings_file)) == PROTEIN_IDS
+    assert read_embedding_size(packed_embeddings_file) == EMBEDDING_SIZE
+
+    original = load_embedding_table(str(embeddings_file))
+    packed = load_embedding_table(str(packed_embeddings_file))
+    np.testing.assert_array_equal(original.embeddings, packed.embeddings)
+
+    subset = load_embedding_table(str(packed_embeddings_file), ["P019", "P002"])
+    assert list(subset.ids) == ["P002", "P019"]
+    np.testing.assert_array_equal(subset.get("P019"), original.get("P019"))
+
+
+@pytest.mark.parametrize("loader_mode", ["h5", "memory", "batched", "device"])
+def test_loaders_detect_packed_store(
+    embeddings_file, packed_embeddings_file, pairs_file, loader_mode
+):
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "param_name": "fident",
+        "batch_size": 16,
+        "num_workers": 0,
+    }
+    expected = _collect(
+        create_single_loader(
+            hdf_file=str(embeddings_file), loader_mode="h5", **loader_args
+        )
+    )
+    actual = _collect(
+        create_single_loader(
+            hdf_file=str(packed_embeddings_file), loader_mode=loader_mode, **loader_args
+        )
+    )
+    for expected_array, actual_array in zip(expected, actual):
+        np.testing.assert_array_equal(expected_array, actual_array)
+
+
+def test_memmap_table_requires_contiguous_store(
+    embeddings_file, packed_embeddings_file
+):
+    with pytest.raises(ValueError):
+        open_memmap_table(embeddings_file)
+    with pytest.raises(ValueError):
+        open_memmap_table(packed_embeddings_file)
+
+
+def test_memmap_table_matches_loaded_table(tmp_path, embeddings_file):
+    contiguous_file = tmp_path / "embeddings_contiguous.h5"
+    convert_to_packed(embeddings_file, contiguous_file, contiguous=True)
+
+    table = open_memmap_table(contiguous_file)
+    expected = load_embedding_table(str(embeddings_file))
+    assert isinstance(table.embeddings, np.memmap)
+    np.testing.assert_array_equal(
+        table.gather(np.arange(len(table))), expected.embeddings
+    )
+
+    # Pickling (e.g. for spawned DataLoader workers) drops the mapping, not the data
+    restored = pickle.loads(pickle.dumps(table))
+    assert restored._embeddings is None
+    np.testing.assert_array_equal(restored.get("P007"), expected.get("P007"))
+
+
+def test_batched_loader_with_memmap_workers(tmp_path, embeddings_file, pairs_file):
+    contiguous_file = tmp_path / "embeddings_contiguous.h5"
+    convert_to_packed(embeddings_file, contiguous_file, contiguous=True)
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "param_name": "fident",
+        "batch_size": 16,
+    }
+    expected = _collect(
+        create_single_loader(
+            hdf_file=str(embeddings_file),
+            loader_mode="h5",
+            num_workers=0,
+            **loader_args,
+        )
+    )
+    actual = _collect(
+        create_single_loader(
+            hdf_file=str(contiguous_file),
+            loader_mode="batched",
+            mmap_embeddings=True,
+            num_workers=2,
+            **loader_args,
+        )
+    )
+    for expected_array, actual_array in zip(expected, actual):
+        np.testing.assert_array_equal(expected_array, actual_array)
+
+
+def test_indexed_pairs_match_pair_table(embeddings_file, pairs_file):
+    pairs = load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident")
+    assert pairs.query_rows.dtype == pairs.target_rows.dtype == np.int32
+    assert len(pairs) == 48
+
+    data = pl.read_parquet(pairs_file).drop_nulls().filter(pl.col("query") != "MISSING")
+    assert pairs.protein_ids[pairs.query_rows].tolist() == data["query"].to_list()
+    assert pairs.protein_ids[pairs.target_rows].tolist() == data["target"].to_list()
+
+    subset = load_embedding_table(str(embeddings_file), pairs.used_protein_ids())
+    remapped = pairs.for_table(subset)
+    assert subset.ids[remapped.query_rows].tolist() == data["query"].to_list()
+
+
+def test_pair_index_cache(embeddings_file, pairs_file):
+    pairs = load_indexed_pairs(
+        str(pairs_file), str(embeddings_file), "fident", use_cache=True
+    )
+    cache_files = list(pairs_file.parent.glob("*.pairs.npz"))
+    assert len(cache_files) == 1
+
+    # A new process starts without the in-process memo
+    datasets._PAIR_INDEX_MEMO.clear()
+    cached = load_indexed_pairs(
+        str(pairs_file), str(embeddings_file), "fident", use_cache=True
+    )
+    np.testing.assert_array_equal(cached.query_rows, pairs.query_rows)
+    np.testing.assert_array_equal(cached.values, pairs.values)
+    assert cached.protein_ids.tolist() == pairs.protein_ids.tolist()
+
+    # Rewriting the pair table invalidates the cache
+    pl.read_parquet(pairs_file).head(10).write_parquet(pairs_file)
+    rebuilt = load_indexed_pairs(
+        str(pairs_file), str(embeddings_file), "fident", use_cache=True
+    )
+    assert len(rebuilt) < len(pairs)
+
+
+def test_pair_index_cache_per_embedding_directory(tmp_path, pairs_file):
+    # Two embedding files with the same name get separate cache files
+    embedding_files = [
+        write_embeddings(tmp_path / name / "embeddings.h5", seed=seed)
+        for seed, name in enumerate(["a", "b"])
+    ]
+    for embedding_file in embedding_files:
+        load_indexed_pairs(
+            str(pairs_file), str(embedding_file), "fident", use_cache=True
+        )
+    assert len(list(pairs_file.parent.glob("*.pairs.npz"))) == 2
+
+
+def test_pair_index_is_memoized_in_process(monkeypatch, embeddings_file, pairs_file):
+    pairs = load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("pair table was read again")
+
+    monkeypatch.setattr(datasets, "_load_and_filter_data", fail)
+    assert load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident") is pairs
+    with pytest.raises(AssertionError):
+        load_indexed_pairs(str(pairs_file), str(embeddings_file), "hfsp")
+
+
+@pytest.mark.parametrize("feature_dtype", ["float32", "float16"])
+def test_feature_loader_matches_squared_difference(
+    embeddings_file, pairs_file, feature_dtype
+):
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "hdf_file": str(embeddings_file),
+        "param_name": "fident",
+        "batch_size": 16,
+        "num_workers": 0,
+    }
+    query_emb, target_emb, values = _collect(
+        create_single_loader(loader_mode="h5", **loader_args)
+    )
+    loader = create_feature_loader(feature_dtype=feature_dtype, **loader_args)
+    assert len(loader) == 3
+
+    features = np.concatenate([np.asarray(batch[0]) for batch in loader])
+    assert features.dtype == np.float32
+    expected = (query_emb - target_emb) ** 2
+    tolerance = 1e-6 if feature_dtype == "float32" else 1e-2
+    np.testing.assert_allclose(features, expected, rtol=tolerance, atol=tolerance)
+    np.testing.assert_array_equal(
+        np.concatenate([np.asarray(batch[1]) for batch in loader]), values
+    )
+
+    # The features are computed once and reused by later loaders
+    feature_files = list(pairs_file.parent.glob(f"*.sqdiff.{feature_dtype}.npy"))
+    assert len(feature_files) == 1
+    mtime = feature_files[0].stat().st_mtime_ns
+    create_feature_loader(feature_dtype=feature_dtype, **loader_args)
+    assert feature_files[0].stat().st_mtime_ns == mtime
+
+
+@pytest.mark.parametrize(
+    "dtype, bytes_per_value, tolerance",
+    [("float16", 2, 1e-3), ("bfloat16", 2, 1e-2), ("int8", 1, 2e-2)],
+)
+def test_reduced_precision_table(embeddings_file, dtype, bytes_per_value, tolerance):
+    expected = load_embedding_table(str(embeddings_file))
+    table = load_embedding_table(str(embeddings_file), dtype=dtype)
+    assert table.storage_dtype == dtype
+    assert table.embeddings.itemsize == bytes_per_value
+
+    gathered = table.gather(np.arange(len(table)))
+    assert gathered.dtype == np.float32
+    scale = np.abs(expected.embeddings).max()
+    np.testing.assert_allclose(
+        gathered, expected.embeddings, atol=tolerance * scale, rtol=tolerance
+    )
+    np.testing.assert_array_equal(table.get("P003"), gathered[table.row("P003")])
+
+    converted = expected.astype(dtype)
+    np.testing.assert_array_equal(converted.embeddings, table.embeddings)
+
+
+def test_int8_table_requires_scales():
+    with pytest.raises(ValueError):
+        EmbeddingTable(np.zeros((2, 4), dtype=np.int8), ["A", "B"])
+
+
+@pytest.mark.parametrize("loader_mode", ["memory", "batched", "device"])
+def test_reduced_precision_loaders(embeddings_file, pairs_file, loader_mode):
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "hdf_file": str(embeddings_file),
+        "param_name": "fident",
+        "batch_size": 16,
+        "num_workers": 0,
+        "loader_mode": loader_mode,
+    }
+    table = load_embedding_table(str(embeddings_file), dtype="int8")
+    expected = _collect(create_single_loader(embedding_table=table, **loader_args))
+    actual = _collect(create_single_loader(embedding_dtype="int8", **loader_args))
+    for expected_array, actual_array in zip(expected, actual):
+        np.testing.assert_allclose(expected_array, actual_array, rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        create_single_loader(
+            **{**loader_args, "loader_mode": "h5"}, embedding_dtype="int8"
+        )
+
+
+@pytest.mark.parametrize("loader_mode", ["h5", "batched", "device"])
+def test_locality_order_restores_row_order(embeddings_file, pairs_file, loader_mode):
+    loader_args = {
+        "parquet_file": str(pairs_file),
+        "hdf_file": str(embeddings_file),
+        "param_name": "fident",
+        "batch_size": 16,
+        "num_workers": 0,
+    }
+    expected = _collect(create_single_loader(loader_mode="h5", **loader_args))
+    loader = create_single_loader(
+        loader_mode=loader_mode,
+        locality_order=True,
+        embedding_cache_size=8,
+        **loader_args,
+    )
+    sorted_rows = _collect(loader)
+    assert not np.array_equal(sorted_rows[2], expected[2])
+
+    for expected_array, actual_array in zip(expected, sorted_rows):
+        np.testing.assert_array_equal(
+            restore_pair_order(actual_array, loader), expected_array
+        )
+
+    with pytest.raises(ValueError):
+        create_single_loader(
+            loader_mode=loader_mode, shuffle=True, locality_order=True, **loader_args
+        )
+
+
+def test_h5_embedding_cache_is_bounded(embeddings_file, pairs_file):
+    loader = create_single_loader(
+        str(pairs_file),
+        str(embeddings_file),
+        "fident",
+        batch_size=16,
+        num_workers=0,
+        locality_order=True,
+        embedding_cache_size=4,
+    )
+    _collect(loader)
+    assert len(loader.dataset.embedding_cache) == 4
+
+
+def test_multi_target_loader(tmp_path, embeddings_file):
+    path = tmp_path / "multi.parquet"
+    pl.DataFrame(
+        {
+            "query": ["P000", "P001", "P002", "P003"],
+            "target": ["P004", "P005", "P006", "P007"],
+            "fident": [0.1, None, 0.3, None],
+            "alntmscore": [0.5, 0.6, None, None],
+            "hfsp": [1.0, 2.0, 3.0, None],
+        }
+    ).write_parquet(path)
+
+    loader = create_single_loader(
+        str(path),
+        str(embeddings_file),
+        "multi",
+        batch_size=8,
+        num_workers=0,
+        loader_mode="batched",
+    )
+    _, _, values = _collect(loader)
+    # The pair without any target is dropped, missing targets become NaN
+    np.testing.assert_array_equal(
+        values,
+        np.array(
+            [[0.1, 0.5, 1.0], [np.nan, 0.6, 2.0], [0.3, np.nan, 3.0]],
+            dtype=np.float32,
+        ),
+    )
+
+
+def test_multi_table_loader_serves_common_pairs(embeddings_file, pairs_file):
+    full_table = load_embedding_table(str(embeddings_file))
+    # Second "embedding file" lacks a few proteins, so their pairs are dropped
+    subset_table = load_embedding_table(str(embeddings_file), PROTEIN_IDS[:15])
+    loader = create_multi_table_loader(
+        str(pairs_file),
+        [str(embeddings_file), str(embeddings_file)],
+        [full_table, subset_table],
+        "fident",
+        batch_size=8,
+        num_workers=0,
+    )
+
+    pairs = load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident")
+    query_ids = pairs.protein_ids[pairs.query_rows]
+    target_ids = pairs.protein_ids[pairs.target_rows]
+    keep = np.isin(query_ids, PROTEIN_IDS[:15]) & np.isin(target_ids, PROTEIN_IDS[:15])
+
+    batches = list(loader)
+    values = np.concatenate([np.asarray(batch[2]) for batch in batches])
+    np.testing.assert_array_equal(values, pairs.values[keep])
+    for k, table in enumerate([full_table, subset_table]):
+        queries = np.concatenate([np.asarray(batch[0][k]) for batch in batches])
+        targets = np.concatenate([np.asarray(batch[1][k]) for batch in batches])
+        np.testing.assert_array_equal(
+            queries, table.gather(table.rows(query_ids[keep]))
+        )
+        np.testing.assert_array_equal(
+            targets, table.gather(table.rows(target_ids[keep]))
+        )
+
+
+def test_protein_batch_covers_pairs_among_proteins(embeddings_file, pairs_file):
+    pairs = load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident")
+    table = load_embedding_table(str(embeddings_file))
+    dataset = ProteinBatchDataset(pairs, "fident", table)
+
+    indices = np.arange(0, dataset.num_proteins, 2)
+    batch = dataset[indices]
+    batch_ids = set(dataset.embedding_table.ids[dataset.protein_rows[indices]])
+
+    query_ids = pairs.protein_ids[pairs.query_rows]
+    target_ids = pairs.protein_ids[pairs.target_rows]
+    expected = [
+        (query_id, target_id, value)
+        for query_id, target_id, value in zip(query_ids, target_ids, pairs.values)
+        if query_id in batch_ids and target_id in batch_ids
+    ]
+    assert len(expected) > 0
+    assert len(batch["values"]) == len(expected)
+
+    embeddings = batch["embeddings"].numpy()
+    assert len(embeddings) == len(indices)
+    found = sorted(
+        (
+            embeddings[query_index].tobytes(),
+            embeddings[target_index].tobytes(),
+            float(value),
+        )
+        for query_index, target_index, value in zip(
+            batch["query_index"], batch["target_index"], batch["values"]
+        )
+    )
+    wanted = sorted(
+        (
+            table.get(query_id).tobytes(),
+            table.get(target_id).tobytes(),
+            float(value),
+        )
+        for query_id, target_id, value in expected
+    )
+    assert found == wanted
+
+
+def test_protein_neighbourhood_batches_cover_pairs():
+    rng = np.random.default_rng(0)
+    num_proteins, batch_size = 200, 16
+    query_index = rng.integers(num_proteins, size=300)
+    target_index = rng.integers(num_proteins, size=300)
+    sampler = ProteinNeighbourhoodSampler(
+        query_index, target_index, num_proteins, batch_size
+    )
+
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert all(len(batch) <= batch_size for batch in batches)
+    assert set(np.concatenate(batches)) == set(range(num_proteins))
+
+    # Uniform protein batches would cover only ~batch_size / num_proteins of them
+    pair_batches = {
+        (query, target): False for query, target in zip(query_index, target_index)
+    }
+    for batch in batches:
+        members = set(batch.tolist())
+        for query, target in pair_batches:
+            if query in members and target in members:
+                pair_batches[query, target] = True
+    assert np.mean(list(pair_batches.values())) > 0.9
+
+
+def test_stratified_subset_follows_value_distribution():
+    rng = np.random.default_rng(0)
+    values = rng.random(1000).astype(np.float32)
+    pairs = datasets.IndexedPairs(
+        query_rows=np.zeros(1000, dtype=np.int32),
+        target_rows=np.zeros(1000, dtype=np.int32),
+        values=values,
+        protein_ids=np.array(["P000"], dtype=object),
+    )
+    subset = pairs.stratified_subset(100)
+    assert len(np.unique(subset)) == 100
+    np.testing.assert_array_equal(subset, pairs.stratified_subset(100))
+    # One pair per value decile of 100 pairs
+    deciles = np.searchsorted(np.sort(values), values[subset]) // 100
+    np.testing.assert_array_equal(np.bincount(deciles), np.full(10, 10))
+    np.testing.assert_array_equal(pairs.stratified_subset(5000), np.arange(1000))
@@ -0,0 +1,56 @@
+import numpy as np
+import torch
+
+from src.evaluation.distance_baseline import compute_distance_baselines, pair_distances
+from src.shared.datasets import create_single_loader, load_indexed_pairs
+from src.shared.embedding_store import load_embedding_table
+from src.shared.experiment_manager import ExperimentManager
+
+
+def test_pair_distances_match_per_batch_norms(toy_dataset):
+    embeddings_file, sets_dir = toy_dataset(splits=["test"], n_pairs=60)
+    pairs_file = sets_dir / "test.parquet"
+    loader = create_single_loader(
+        str(pairs_file), str(embeddings_file), "fident", batch_size=16, num_workers=0
+    )
+    queries, targets = [], []
+    for query_embs, target_embs, _ in loader:
+        queries.append(query_embs)
+        targets.append(target_embs)
+    queries, targets = torch.cat(queries), torch.cat(targets)
+
+    pairs = load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident")
+    table = load_embedding_table(str(embeddings_file), pairs.used_protein_ids())
+    expected = {
+        "euclidean": torch.linalg.norm(queries - targets, dim=1),
+        "cosine": 1 - torch.nn.functional.cosine_similarity(queries, targets),
+        "l1": (queries - targets).abs().sum(dim=1),
+    }
+    for metric, expected_distances in expected.items():
+        # A chunk size that does not divide the pair count
+        distances = pair_distances(pairs, table, metric, chunk_size=7)
+        np.testing.assert_allclose(
+            distances, expected_distances.numpy(), rtol=1e-5, atol=1e-6
+        )
+
+
+def test_compute_distance_baselines_writes_predictions(toy_dataset, tmp_path):
+    embeddings_file, sets_dir = toy_dataset(splits=["test"], n_pairs=60)
+    pairs_file = sets_dir / "test.parquet"
+    experiment_dir = tmp_path / "run"
+
+    table = compute_distance_baselines(
+        embeddings_file, pairs_file, [("fident", experiment_dir)], ["euclidean", "l1"]
+    )
+
+    pairs = load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident")
+    for metric in ["euclidean", "l1"]:
+        saved = np.load(
+            ExperimentManager.predictions_targets_path(
+                experiment_dir, "test", f"{metric}_baseline"
+            )
+        )
+        np.testing.assert_array_equal(saved["targets"], pairs.values)
+        np.testing.assert_array_equal(
+            saved["predictions"], pair_distances(pairs, table, metric)
+        )
@@ -0,0 +1,27 @@
+import numpy as np
+import torch
+
+from src.evaluation.evaluate import run_encoded_inference, run_inference
+from src.shared.datasets import create_single_loader, load_indexed_pairs
+from src.shared.embedding_store import load_embedding_table
+from src.training.models import FNNPredictor
+from tests.conftest import EMBEDDING_SIZE
+
+
+def test_encoded_inference_matches_per_pair_inference(toy_dataset):
+    embeddings_file, sets_dir = toy_dataset(splits=["test"], n_pairs=60)
+    pairs_file = sets_dir / "test.parquet"
+
+    torch.manual_seed(0)
+    model = FNNPredictor(embedding_size=EMBEDDING_SIZE, hidden_size=16)
+    loader = create_single_loader(
+        str(pairs_file), str(embeddings_file), "fident", batch_size=16, num_workers=0
+    )
+    expected_predictions, expected_targets = run_inference(model, loader)
+
+    pairs = load_indexed_pairs(str(pairs_file), str(embeddings_file), "fident")
+    table = load_embedding_table(str(embeddings_file), pairs.used_protein_ids())
+    predictions, targets = run_encoded_inference(model, pairs, table, batch_size=16)
+
+    np.testing.assert_allclose(predictions, expected_predictions, rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(targets, expected_targets)
@@ -0,0 +1,68 @@
+import numpy as np
+import torch
+
+from src.training.exact_solver import fit_exact, save_checkpoint
+from src.training.models import LinearDistancePredictor, LinearRegressionPredictor
+
+EMBEDDING_SIZE = 4
+
+
+def _batches(rng, num_batches=5, batch_size=32):
+    batches = []
+    for _ in range(num_batches):
+        query_emb = torch.from_numpy(
+            rng.normal(size=(batch_size, EMBEDDING_SIZE)).astype(np.float32)
+        )
+        target_emb = torch.from_numpy(
+            rng.normal(size=(batch_size, EMBEDDING_SIZE)).astype(np.float32)
+        )
+        values = torch.from_numpy(rng.random(batch_size).astype(np.float32))
+        batches.append((query_emb, target_emb, values))
+    return batches
+
+
+def test_exact_solver_matches_least_squares():
+    rng = np.random.default_rng(0)
+    train_batches, val_batches = _batches(rng), _batches(rng)
+    model = LinearDistancePredictor(embedding_size=EMBEDDING_SIZE)
+    fit_exact(model, train_batches, val_batches, ridge_lambdas=[0.0])
+
+    features = torch.cat([model.pair_features(q, t) for q, t, _ in train_batches])
+    design = np.hstack([features.numpy(), np.ones((len(features), 1))])
+    targets = torch.cat([v for _, _, v in train_batches]).numpy()
+    expected, *_ = np.linalg.lstsq(design, targets, rcond=None)
+    weights = np.append(model.linear.weight.detach().numpy(), model.linear.bias.item())
+    np.testing.assert_allclose(weights, expected, rtol=1e-4, atol=1e-5)
+
+
+def test_exact_solver_selects_lambda_on_val():
+    rng = np.random.default_rng(2)
+    train_batches, val_batches = _batches(rng), _batches(rng)
+    model = LinearDistancePredictor(embedding_size=EMBEDDING_SIZE)
+
+    best_lambda, val_loss, val_losses = fit_exact(
+        model, train_batches, val_batches, ridge_lambdas=[0.0, 0.1, 10.0]
+    )
+    assert set(val_losses) == {0.0, 0.1, 10.0}
+    assert val_loss == val_losses[best_lambda] == min(val_losses.values())
+
+    # The model holds the selected solution
+    with torch.no_grad():
+        predictions = torch.cat([model(q, t) for q, t, _ in val_batches])
+        targets = torch.cat([v for _, _, v in val_batches])
+    np.testing.assert_allclose(
+        float(torch.mean((predictions - targets) ** 2)), val_loss, rtol=1e-4
+    )
+
+
+def test_exact_checkpoint_loads(tmp_path):
+    rng = np.random.default_rng(1)
+    model = LinearRegressionPredictor(embedding_size=EMBEDDING_SIZE)
+    _, val_loss, _ = fit_exact(model, _batches(rng), _batches(rng))
+
+    checkpoint_path = save_checkpoint(model, tmp_path / "checkpoints", val_loss)
+    assert checkpoint_path.name.startswith("best-")
+
+    restored = LinearRegressionPredictor.load_from_checkpoint(str(checkpoint_path))
+    for name, parameter in model.state_dict().items():
+        torch.testing.assert_close(restored.state_dict()[name], parameter)
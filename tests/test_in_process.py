@@ -0,0 +1,49 @@
+from src.shared import datasets
+from src.shared.in_process import EVALUATE_SCRIPT, TRAIN_SCRIPT, run_in_process
+
+
+def test_train_and_evaluate_in_process(tmp_path, toy_dataset):
+    embedding_file, sets_dir = toy_dataset(n_pairs=40)
+    experiment_dir = tmp_path / "models" / "toy" / "euclidean" / "fident" / "toy"
+    train_args = [
+        "--model_type",
+        "euclidean",
+        "--param_name",
+        "fident",
+        "--embedding_file",
+        str(embedding_file),
+        "--data_dir",
+        str(sets_dir),
+        "--output_base_dir",
+        str(experiment_dir),
+    ]
+
+    log_file = tmp_path / "train.log"
+    assert run_in_process(TRAIN_SCRIPT, train_args, log_file=log_file)
+    assert "Euclidean baseline setup complete" in log_file.read_text()
+    assert (experiment_dir / "training_complete.txt").is_file()
+
+    eval_args = ["--run_dir", str(experiment_dir), "--n_bootstrap", "0"]
+    assert run_in_process(EVALUATE_SCRIPT, eval_args, log_file=tmp_path / "eval.log")
+    assert list((experiment_dir / "evaluation_results").glob("*predictions*.npz"))
+
+
+def test_failed_runs_are_reported(tmp_path):
+    log_file = tmp_path / "eval.log"
+    assert not run_in_process(EVALUATE_SCRIPT, ["--unknown_option"], log_file=log_file)
+    missing_run = ["--run_dir", str(tmp_path / "missing"), "--n_bootstrap", "0"]
+    assert not run_in_process(EVALUATE_SCRIPT, missing_run, log_file=log_file)
+    assert "EVALUATION FAILED" in log_file.read_text()
+
+
+def test_runs_start_with_empty_memos(tmp_path, toy_dataset):
+    embedding_file, sets_dir = toy_dataset(splits=["train"])
+    datasets.load_indexed_pairs(
+        str(sets_dir / "train.parquet"), str(embedding_file), "fident"
+    )
+    assert datasets._PAIR_INDEX_MEMO and datasets._EMBEDDING_IDS_MEMO
+
+    run_in_process(
+        EVALUATE_SCRIPT, ["--unknown_option"], log_file=tmp_path / "eval.log"
+    )
+    assert not datasets._PAIR_INDEX_MEMO and not datasets._EMBEDDING_IDS_MEMO
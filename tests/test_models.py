@@ -0,0 +1,99 @@
+import torch
+
+from src.training.models import FNNPredictor, LinearDistancePredictor
+
+
+def test_single_target_output_shape():
+    model = FNNPredictor(embedding_size=8, hidden_size=16)
+    emb = torch.randn(5, 8)
+    assert model(emb, emb).shape == (5,)
+    assert model(emb[:1], emb[:1]).shape == (1,)
+
+
+def test_multi_target_masked_loss():
+    model = LinearDistancePredictor(
+        embedding_size=8, output_size=3, target_names=["fident", "alntmscore", "hfsp"]
+    )
+    query_emb, target_emb = torch.randn(4, 8), torch.randn(4, 8)
+    targets = torch.tensor(
+        [
+            [0.1, 0.5, 1.0],
+            [float("nan"), 0.6, 2.0],
+            [0.3, float("nan"), 3.0],
+            [0.2, 0.4, float("nan")],
+        ]
+    )
+    loss, predictions, _ = model._common_step((query_emb, target_emb, targets), 0)
+    assert predictions.shape == (4, 3)
+
+    # Mean of the per-target MSEs over the pairs that have each target
+    mask = ~torch.isnan(targets)
+    squared_errors = (predictions - torch.nan_to_num(targets)) ** 2
+    expected = torch.stack([squared_errors[mask[:, c], c].mean() for c in range(3)])
+    torch.testing.assert_close(loss, expected.mean())
+    assert not torch.isnan(loss)
+
+
+def test_multi_target_losses_are_standardised():
+    # fident and alntmscore lie in [0, 1], hfsp spans ~0-100
+    torch.manual_seed(0)
+    targets = torch.stack(
+        [torch.rand(256), torch.rand(256), 100 * torch.rand(256)], dim=1
+    )
+    model = LinearDistancePredictor(
+        embedding_size=8,
+        output_size=3,
+        target_names=["fident", "alntmscore", "hfsp"],
+        target_means=targets.mean(dim=0).tolist(),
+        target_stds=targets.std(dim=0).tolist(),
+    )
+    query_emb, target_emb = torch.randn(256, 8), torch.randn(256, 8)
+    with torch.no_grad():
+        predictions = model(query_emb, target_emb)
+        # Predicting every target by its mean gives each head a loss of ~1
+        mean_losses = model.target_losses(model.target_mean.expand_as(targets), targets)
+        losses = model.target_losses(predictions, targets)
+    torch.testing.assert_close(mean_losses, torch.ones(3), atol=0.01, rtol=0)
+    assert losses.max() / losses.min() < 10
+
+    # Outputs are in target units: a zero network output is the train-set mean
+    with torch.no_grad():
+        model.linear.weight.zero_()
+        model.linear.bias.zero_()
+        torch.testing.assert_close(
+            model(query_emb[:2], target_emb[:2]), model.target_mean.expand(2, 3)
+        )
+
+
+def test_fnn_two_stage_matches_forward():
+    model = FNNPredictor(embedding_size=8, hidden_size=16)
+    query_emb, target_emb = torch.randn(5, 8), torch.randn(5, 8)
+    two_stage = model.score(model.encode(query_emb), model.encode(target_emb))
+    torch.testing.assert_close(two_stage, model(query_emb, target_emb))
+
+
+def test_indexed_forward_matches_pair_forward():
+    embeddings = torch.randn(6, 8)
+    query_index = torch.tensor([0, 0, 2, 5, 3])
+    target_index = torch.tensor([1, 4, 2, 0, 3])
+    for model in [
+        FNNPredictor(embedding_size=8, hidden_size=16),
+        LinearDistancePredictor(embedding_size=8),
+    ]:
+        torch.testing.assert_close(
+            model.forward_indexed(embeddings, query_index, target_index),
+            model(embeddings[query_index], embeddings[target_index]),
+        )
+
+
+def test_warmup_scheduler_ramps_learning_rate():
+    model = FNNPredictor(embedding_size=8, hidden_size=16, warmup_steps=4)
+    config = model.configure_optimizers()
+    optimizer, scheduler = config["optimizer"], config["lr_scheduler"]["scheduler"]
+    learning_rates = []
+    for _ in range(6):
+        learning_rates.append(optimizer.param_groups[0]["lr"])
+        optimizer.step()
+        scheduler.step()
+    assert learning_rates == [0.00025, 0.0005, 0.00075, 0.001, 0.001, 0.001]
+    assert not isinstance(FNNPredictor(embedding_size=8).configure_optimizers(), dict)
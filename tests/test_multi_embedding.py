@@ -0,0 +1,105 @@
+import copy
+
+import numpy as np
+import pytorch_lightning as pl
+import torch
+from torch.utils.data import DataLoader
+
+from src.training.models import FNNPredictor, LinearDistancePredictor
+from src.training.multi_embedding import MultiEmbeddingPredictor, PerModelCheckpoint
+
+EMBEDDING_SIZES = [4, 6]
+
+
+def _batches(rng, num_batches=4, batch_size=16):
+    batches = []
+    for _ in range(num_batches):
+        query_embs = tuple(
+            torch.from_numpy(rng.normal(size=(batch_size, d)).astype(np.float32))
+            for d in EMBEDDING_SIZES
+        )
+        target_embs = tuple(
+            torch.from_numpy(rng.normal(size=(batch_size, d)).astype(np.float32))
+            for d in EMBEDDING_SIZES
+        )
+        values = torch.from_numpy(rng.random(batch_size).astype(np.float32))
+        batches.append((query_embs, target_embs, values))
+    return batches
+
+
+def _loader(batches):
+    return DataLoader(batches, batch_size=None)
+
+
+def _models():
+    torch.manual_seed(0)
+    return [
+        FNNPredictor(embedding_size=EMBEDDING_SIZES[0], hidden_size=8),
+        LinearDistancePredictor(embedding_size=EMBEDDING_SIZES[1]),
+    ]
+
+
+def _trainer(callbacks, max_epochs=1):
+    return pl.Trainer(
+        max_epochs=max_epochs,
+        accelerator="cpu",
+        logger=False,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+        num_sanity_val_steps=0,
+        callbacks=callbacks,
+    )
+
+
+def test_models_train_like_separate_runs(tmp_path):
+    rng = np.random.default_rng(0)
+    train_batches, val_batches = _batches(rng), _batches(rng)
+    models = _models()
+    reference = copy.deepcopy(models)
+
+    checkpoint = PerModelCheckpoint([tmp_path / "a", tmp_path / "b"], patience=3)
+    _trainer([checkpoint]).fit(
+        MultiEmbeddingPredictor(models, ["a", "b"]),
+        _loader(train_batches),
+        _loader(val_batches),
+    )
+
+    # Every model must end up where training it alone on its own table would
+    for k, (model, expected) in enumerate(zip(models, reference)):
+        optimizer = expected.configure_optimizers()
+        for query_embs, target_embs, values in train_batches:
+            loss, _, _ = expected._common_step(
+                (query_embs[k], target_embs[k], values), 0
+            )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+        for param, expected_param in zip(model.parameters(), expected.parameters()):
+            torch.testing.assert_close(param, expected_param)
+
+
+def test_per_model_checkpoints_and_early_stopping(tmp_path):
+    rng = np.random.default_rng(1)
+    train_batches, val_batches = _batches(rng), _batches(rng)
+    models = _models()
+    checkpoints_dirs = [tmp_path / "a" / "checkpoints", tmp_path / "b" / "checkpoints"]
+    module = MultiEmbeddingPredictor(models, ["a", "b"])
+    checkpoint = PerModelCheckpoint(checkpoints_dirs, patience=1)
+    # Make model "b" unable to improve so that it is stopped after one check
+    module.models[1].configure_optimizers = lambda: torch.optim.SGD(
+        module.models[1].parameters(), lr=0.0
+    )
+
+    _trainer([checkpoint], max_epochs=3).fit(
+        module, _loader(train_batches), _loader(val_batches)
+    )
+
+    assert module.active == [True, False]
+    for k, checkpoints_dir in enumerate(checkpoints_dirs):
+        saved = list(checkpoints_dir.glob("best-*.ckpt"))
+        assert len(saved) == 1
+        assert str(saved[0]) == checkpoint.best_model_paths[k]
+
+    restored = FNNPredictor.load_from_checkpoint(checkpoint.best_model_paths[0])
+    assert restored.hparams.embedding_size == EMBEDDING_SIZES[0]
@@ -0,0 +1,73 @@
+import io
+import threading
+import time
+from pathlib import Path
+
+from tqdm import tqdm
+
+from src.training import scheduler
+from src.training.scheduler import (
+    EVALUATE_SCRIPT,
+    ExperimentJob,
+    ExperimentScheduler,
+    order_jobs,
+)
+
+
+def test_scheduler_runs_jobs_concurrently(monkeypatch, tmp_path):
+    lock = threading.Lock()
+    running = []
+    max_running = []
+    calls = []
+
+    def fake_run_script(project_root, script, script_args, env=None, log_file=None):
+        with lock:
+            running.append(script_args)
+            max_running.append(len(running))
+            calls.append((script, script_args, env["OMP_NUM_THREADS"]))
+        time.sleep(0.05)
+        with lock:
+            running.remove(script_args)
+        return "fail" not in script_args
+
+    monkeypatch.setattr(scheduler, "run_script", fake_run_script)
+    jobs = [
+        ExperimentJob(f"job{i}", [f"job{i}"], [tmp_path / f"job{i}"]) for i in range(4)
+    ]
+    jobs.append(ExperimentJob("failing", ["fail"], [tmp_path / "a", tmp_path / "b"]))
+
+    with tqdm(total=6, file=io.StringIO()) as pbar:
+        counts = ExperimentScheduler(
+            Path("."), pbar, max_jobs=2, threads_per_job=3, evaluate=True
+        ).run(jobs)
+        assert pbar.n == 6
+
+    assert max(max_running) == 2
+    assert counts["done"] == 4 and counts["failed"] == 1
+    assert counts["eval_ok"] == 4 and counts["queued"] == counts["running"] == 0
+    evaluated = [args[1] for script, args, _ in calls if script == EVALUATE_SCRIPT]
+    assert sorted(evaluated) == [str(tmp_path / f"job{i}") for i in range(4)]
+    assert {threads for _, _, threads in calls} == {"3"}
+
+
+def test_order_jobs_groups_embeddings_longest_first():
+    small, large = Path("small.h5"), Path("large.h5")
+    jobs = [
+        ExperimentJob("small/linear", [], embedding_files=[small], cost=2.0),
+        ExperimentJob("large/euclidean", [], embedding_files=[large], cost=0.0),
+        ExperimentJob("small/fnn", [], embedding_files=[small], cost=128.0),
+        ExperimentJob("large/linear", [], embedding_files=[large], cost=20.0),
+        ExperimentJob("large/fnn", [], embedding_files=[large], cost=1280.0),
+        ExperimentJob("small/euclidean", [], embedding_files=[small], cost=0.0),
+    ]
+
+    names = [job.name for job in order_jobs(jobs)]
+
+    assert names == [
+        "large/fnn",
+        "large/linear",
+        "large/euclidean",
+        "small/fnn",
+        "small/linear",
+        "small/euclidean",
+    ]
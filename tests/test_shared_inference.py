@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import torch
+import yaml
+
+from src.evaluation.evaluate import MODEL_CLASSES, run_inference
+from src.evaluation.shared_inference import precompute_predictions
+from src.shared.datasets import create_single_loader
+from src.shared.experiment_manager import ExperimentManager
+from src.training.exact_solver import save_checkpoint
+from tests.conftest import EMBEDDING_SIZE
+
+
+def _write_run(run_dir, model_type, param_name, embedding_file, sets_dir):
+    run_dir.mkdir(parents=True)
+    hparams = {
+        "model_type": model_type,
+        "param_name": param_name,
+        "embedding_file": str(embedding_file),
+        "data_dir": str(sets_dir),
+        "batch_size": 16,
+    }
+    with open(run_dir / "hparams.yaml", "w") as f:
+        yaml.dump(hparams, f)
+    if model_type == "euclidean":
+        return None
+    torch.manual_seed(len(model_type))
+    model = MODEL_CLASSES[model_type](embedding_size=EMBEDDING_SIZE)
+    return save_checkpoint(model, run_dir / "checkpoints", 0.5)
+
+
+@pytest.mark.parametrize("per_pair_inference", [False, True])
+def test_shared_inference_matches_per_run_inference(
+    tmp_path, toy_dataset, per_pair_inference
+):
+    embedding_file, sets_dir = toy_dataset(splits=["test"], columns=["fident", "hfsp"])
+    runs = {}
+    for model_type in ["fnn", "linear", "linear_distance", "euclidean"]:
+        for param_name in ["fident", "hfsp"]:
+            run_dir = tmp_path / "models" / model_type / param_name
+            ckpt_path = _write_run(
+                run_dir, model_type, param_name, embedding_file, sets_dir
+            )
+            runs[run_dir] = (model_type, param_name, ckpt_path)
+
+    written = precompute_predictions(
+        list(runs), tmp_path / "models", per_pair_inference=per_pair_inference
+    )
+    assert written == len(runs)
+
+    for run_dir, (model_type, param_name, ckpt_path) in runs.items():
+        if model_type == "euclidean":
+            assert ExperimentManager.predictions_targets_path(
+                run_dir, "test", "euclidean_baseline"
+            ).is_file()
+            continue
+        saved = np.load(
+            ExperimentManager.predictions_targets_path(run_dir, "test", ckpt_path.stem)
+        )
+        model = MODEL_CLASSES[model_type].load_from_checkpoint(str(ckpt_path))
+        loader = create_single_loader(
+            str(sets_dir / "test.parquet"),
+            str(embedding_file),
+            param_name,
+            batch_size=16,
+            num_workers=0,
+        )
+        predictions, targets = run_inference(model, loader)
+        np.testing.assert_allclose(saved["predictions"], predictions, atol=1e-5)
+        np.testing.assert_array_equal(saved["targets"], targets)
+
+    # Existing predictions are kept
+    assert precompute_predictions(list(runs), tmp_path / "models") == 0
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.training.train import create_logger, parse_args, train_multi_embedding
+
+HPARAMS = {
+    "model_type": "fnn",
+    "param_name": "fident",
+    "embedding_file": "embeddings/toy.h5",
+    "batch_size": 16,
+}
+
+
+def test_csv_logger_records_local_run_id(tmp_path):
+    paths = SimpleNamespace(experiment_dir=tmp_path)
+
+    logger = create_logger(paths, HPARAMS, "csv")
+    logger.log_metrics({"val_loss": 0.5}, step=0)
+    logger.save()
+
+    run_dir = tmp_path / (tmp_path / "run_id.txt").read_text()
+    assert run_dir == tmp_path / "logs" / "version_0"
+    assert (run_dir / "metrics.csv").is_file()
+    assert not (tmp_path / "wandb").exists()
+
+
+def test_no_logger(tmp_path):
+    paths = SimpleNamespace(experiment_dir=tmp_path)
+    assert create_logger(paths, HPARAMS, "none") is None
+    assert not (tmp_path / "run_id.txt").exists()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--loader_mode", "h5"],
+        ["--loader_mode", "device"],
+        ["--loader_mode", "batched", "--locality_order"],
+        ["--loader_mode", "batched", "--embedding_cache_size", "16"],
+        [
+            "--loader_mode",
+            "batched",
+            "--mmap_embeddings",
+            "--embedding_dtype",
+            "float16",
+        ],
+    ],
+)
+def test_multi_embedding_rejects_unsupported_loader_options(tmp_path, options):
+    args = parse_args(
+        [
+            "--model_type",
+            "fnn",
+            "--param_name",
+            "fident",
+            "--embedding_file",
+            "embeddings/a.h5",
+            "embeddings/b.h5",
+            "--data_dir",
+            "sets",
+            "--output_base_dir",
+            str(tmp_path / "toy" / "fnn" / "fident" / "a"),
+            *options,
+        ]
+    )
+    with pytest.raises(ValueError, match="several embedding files"):
+        train_multi_embedding(args, tmp_path, tmp_path)
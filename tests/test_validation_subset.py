@@ -0,0 +1,58 @@
+import torch
+from torch.utils.data import DataLoader
+
+import pytorch_lightning as pl
+
+from src.training.models import LinearDistancePredictor
+from src.training.validation_subset import (
+    SubsetValidationLoader,
+    SubsetValidationSwitch,
+)
+
+
+class _RecordingLoader:
+    def __init__(self, batches, name, log):
+        self.loader = DataLoader(batches, batch_size=None)
+        self.name = name
+        self.log = log
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self.log.append(self.name)
+        return iter(self.loader)
+
+
+def _batches(num_batches):
+    return [
+        (torch.randn(8, 4), torch.randn(8, 4), torch.rand(8))
+        for _ in range(num_batches)
+    ]
+
+
+def test_full_validation_only_at_last_check_of_epoch():
+    log = []
+    val_loader = SubsetValidationLoader(
+        _RecordingLoader(_batches(4), "full", log),
+        _RecordingLoader(_batches(1), "subset", log),
+    )
+    model = LinearDistancePredictor(embedding_size=4)
+    trainer = pl.Trainer(
+        max_epochs=2,
+        accelerator="cpu",
+        logger=False,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+        num_sanity_val_steps=0,
+        val_check_interval=0.25,
+        callbacks=[SubsetValidationSwitch(val_loader)],
+    )
+    trainer.fit(model, DataLoader(_batches(10), batch_size=None), val_loader)
+
+    # 10 batches, checks every 2 batches: 4 subset checks and 1 full check per epoch
+    # (Lightning calls iter() once up front to check that the loader is iterable)
+    assert log[1:] == (["subset"] * 4 + ["full"]) * 2
+    assert "val_loss" in trainer.callback_metrics
+    assert "val_loss_subset" in trainer.callback_metrics